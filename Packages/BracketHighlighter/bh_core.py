@@ -7,6 +7,7 @@ import ure
 from bh_plugin import BracketPlugin, BracketRegion, ImportModule
 from collections import namedtuple
 import traceback
+from bisect import bisect_left, bisect_right
 
 ure.set_cache_directory(join(sublime.packages_path(), "User"), "bh")
 
@@ -182,6 +183,490 @@ class BhThreadMgr(object):
     restart = False
 
 
+def find_candidates(pattern, bfr, window):
+    """
+    Find all of the bracket candidates in the window of the buffer.
+    Candidates are (start, end, match_type, bracket_id) tuples sorted by start.
+    """
+
+    candidates = []
+    for m in pattern.finditer(bfr, int(window[0]), int(window[1])):
+        g = m.lastindex
+        try:
+            start = m.start(g)
+            end = m.end(g)
+        except:
+            continue
+
+        match_type = int(not bool(g % 2))
+        bracket_id = int((g / 2) - match_type)
+        candidates.append((start, end, match_type, bracket_id))
+    return candidates
+
+
+def common_prefix(a, b, limit):
+    """
+    Length of the common prefix of two strings (up to limit).
+    """
+
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def common_suffix(a, b, limit):
+    """
+    Length of the common suffix of two strings (up to limit).
+    """
+
+    lo, hi = 0, limit
+    len_a, len_b = len(a), len(b)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len_a - mid:len_a - lo] == b[len_b - mid:len_b - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class ScopeMemo(object):
+    """
+    Memo of a view's scope lookups for one match pass.
+    Whether a point matches a selector only depends on the point's scope name,
+    so selectors are matched once per distinct scope name (shared by all passes),
+    and every other point with that scope name is classified without an API call.
+    Counts and times the API calls so a match pass's cost can be logged.
+    """
+
+    selectors = {}
+    max_selectors = 10000
+
+    def __init__(self, view):
+        """
+        Start an empty memo for the view.
+        """
+
+        self.view = view
+        self.names = {}
+        self.extents = {}
+        self.calls = 0
+        self.hits = 0
+        self.elapsed = 0.0
+
+    def scope_name(self, pt):
+        """
+        Get the scope name at pt X.
+        """
+
+        name = self.names.get(pt)
+        if name is None:
+            start = time()
+            name = self.view.scope_name(pt)
+            self.elapsed += time() - start
+            self.calls += 1
+            self.names[pt] = name
+        else:
+            self.hits += 1
+        return name
+
+    def match_selector(self, pt, selector):
+        """
+        Check if the scope at pt X matches the selector.
+        """
+
+        key = (self.scope_name(pt), selector)
+        match = ScopeMemo.selectors.get(key)
+        if match is None:
+            start = time()
+            match = self.view.match_selector(pt, selector)
+            self.elapsed += time() - start
+            self.calls += 1
+            if len(ScopeMemo.selectors) >= ScopeMemo.max_selectors:
+                ScopeMemo.selectors.clear()
+            ScopeMemo.selectors[key] = match
+        else:
+            self.hits += 1
+        return match
+
+    def extract_scope(self, pt):
+        """
+        Get the extent of the scope at pt X.
+        """
+
+        extent = self.extents.get(pt)
+        if extent is None:
+            start = time()
+            extent = self.view.extract_scope(pt)
+            self.elapsed += time() - start
+            self.calls += 1
+            self.extents[pt] = extent
+        else:
+            self.hits += 1
+        return extent
+
+
+def excluded_scope(scopes, bracket, pt):
+    """
+    Check if the bracket at pt X is in one of its excluded scopes.
+    """
+
+    if len(bracket.scope_exclude_exceptions) and scopes.match_selector(pt, ", ".join(bracket.scope_exclude_exceptions)):
+        return False
+    return bool(len(bracket.scope_exclude) and scopes.match_selector(pt, ", ".join(bracket.scope_exclude)))
+
+
+class BracketIndex(object):
+    """
+    Index of all of the matched bracket pairs in a buffer.
+    Pairs are nested, so the buffer splits into segments that share
+    the same innermost pair, and the innermost pair enclosing a point
+    is found with a binary search over the segments.
+    """
+
+    def __init__(self, bfr, candidates, validate, compare):
+        """
+        Match the bracket candidates of the whole buffer and index the pairs.
+        Candidates in excluded scopes must already be filtered out.
+        """
+
+        pairs = []
+        stack = []
+        for start, end, match_type, bracket_id in candidates:
+            b = BracketEntry(start, end, bracket_id)
+            if not validate(b, match_type, bfr):
+                continue
+            if match_type == BracketSearchType.opening:
+                stack.append(b)
+                continue
+            # Match the closest opening bracket, dropping unmatched ones inside
+            for x in reversed(range(0, len(stack))):
+                if compare(stack[x], b, bfr):
+                    pairs.append((stack[x], b))
+                    del stack[x:]
+                    break
+
+        # A point is enclosed by a pair if left.begin < pt < right.end
+        self.positions = []
+        self.pairs = []
+        active = []
+        for pair in sorted(pairs):
+            begin = pair[0].begin + 1
+            while len(active) and active[-1][1].end <= begin:
+                self.add_segment(active.pop()[1].end, active[-1] if len(active) else None)
+            self.add_segment(begin, pair)
+            active.append(pair)
+        while len(active):
+            self.add_segment(active.pop()[1].end, active[-1] if len(active) else None)
+
+    def add_segment(self, begin, pair):
+        """
+        Start a segment with the given innermost pair.
+        """
+
+        self.positions.append(begin)
+        self.pairs.append(pair)
+
+    def find(self, pt):
+        """
+        Find the innermost pair enclosing pt X.
+        """
+
+        x = bisect_right(self.positions, pt) - 1
+        return self.pairs[x] if x >= 0 else None
+
+
+class BracketIndexBuilder(object):
+    """
+    Builds the bracket index of a view with the brackets of the view
+    at the time the build was started.  The scope checks use the view API,
+    so they are done on the main thread in batches; only the pairing of the
+    brackets runs in the background.
+    """
+
+    batch = 2000
+
+    def __init__(self, view, brackets, validate, compare):
+        """
+        Capture the view and its brackets.
+        """
+
+        self.view = view
+        self.brackets = brackets
+        self.validate = validate
+        self.compare = compare
+        self.scopes = ScopeMemo(view)
+        self.start = time()
+
+    def filter_scopes(self, candidates, begin):
+        """
+        Keep the candidates of the next batch that are not in an excluded scope.
+        Returns the kept candidates and where the next batch begins.
+        """
+
+        end = min(begin + self.batch, len(candidates))
+        kept = [
+            c for c in candidates[begin:end]
+            if not excluded_scope(self.scopes, self.brackets[c[3]], c[0])
+        ]
+        return kept, end
+
+    def build(self, bfr, candidates):
+        """
+        Pair the brackets and index them (in a background thread).
+        """
+
+        index = BracketIndex(bfr, candidates, self.validate, self.compare)
+        bh_debug(
+            "Bracket index: %d pairs, %d scope API calls (%d memoized), %.3fs in scope lookups, %.3fs total" % (
+                len(index.pairs), self.scopes.calls, self.scopes.hits, self.scopes.elapsed, time() - self.start
+            )
+        )
+        return index
+
+
+class BhViewCache(object):
+    """
+    Per view cache of the buffer, bracket candidates, scope checks,
+    and the last matched pair.  Everything is keyed on the view's change count
+    so that pure cursor movement reuses prior results, and after an edit
+    only the lines around the edit are searched for brackets again.
+    """
+
+    views = {}
+
+    @classmethod
+    def get(cls, view):
+        """
+        Get the cache of a view, refreshed for the view's current change count.
+        """
+
+        cache = cls.views.get(view.id())
+        if cache is None:
+            cache = cls()
+            cls.views[view.id()] = cache
+        cache.refresh(view)
+        return cache
+
+    @classmethod
+    def discard(cls, view):
+        """
+        Forget the cache of a closed view.
+        """
+
+        cls.views.pop(view.id(), None)
+
+    def __init__(self):
+        """
+        Start with an empty cache.
+        """
+
+        self.change_count = None
+        self.bfr = None
+        self.pattern = None
+        self.window = None
+        self.candidates = []
+        self.starts = []
+        self.max_size = 0
+        self.scope_checks = {}
+        self.pair = None
+        self.index = None
+        # (change count, pattern) of the index being built, or of the last failed build
+        self.index_building = None
+        self.index_failed = None
+
+    def refresh(self, view):
+        """
+        Update the cache if the buffer has changed.
+        """
+
+        change_count = view.change_count()
+        if change_count == self.change_count:
+            return
+
+        bfr = view.substr(sublime.Region(0, view.size()))
+        if self.window is not None and self.bfr is not None and not self.apply_edit(self.bfr, bfr):
+            self.window = None
+        self.change_count = change_count
+        self.bfr = bfr
+        self.scope_checks = {}
+        self.pair = None
+
+    def set_candidates(self, candidates):
+        """
+        Store the bracket candidates, and index them by start.
+        """
+
+        self.candidates = candidates
+        self.starts = [c[0] for c in candidates]
+        self.max_size = max([c[1] - c[0] for c in candidates]) if candidates else 0
+
+    def apply_edit(self, old, new):
+        """
+        Shift the bracket candidates around the edit between the old
+        and new buffer, and search the lines around the edit again.
+        Return False if the candidates must be searched for from scratch.
+        """
+
+        size = min(len(old), len(new))
+        prefix = common_prefix(old, new, size)
+        suffix = common_suffix(old, new, size - prefix)
+        delta = len(new) - len(old)
+
+        # Search from the line before the edit to the line after it
+        begin = new.rfind('\n', 0, max(new.rfind('\n', 0, prefix), 0)) + 1
+        end = len(new) - suffix
+        for x in range(2):
+            end = new.find('\n', end) + 1 or len(new)
+
+        w0, w1 = self.window
+        if end - delta <= w0:
+            self.set_candidates([(c[0] + delta, c[1] + delta, c[2], c[3]) for c in self.candidates])
+            self.window = (w0 + delta, w1 + delta)
+            return True
+        elif begin >= w1:
+            return True
+        elif begin < w0 or end - delta > w1:
+            return False
+
+        # Candidates crossing the edges of the search are searched again too
+        for c in self.candidates:
+            if c[0] < end - delta and c[1] > begin:
+                begin = min(begin, c[0])
+                end = max(end, c[1] + delta)
+        before = [c for c in self.candidates if c[1] <= begin]
+        after = [
+            (c[0] + delta, c[1] + delta, c[2], c[3])
+            for c in self.candidates if c[0] >= end - delta
+        ]
+        self.set_candidates(before + find_candidates(self.pattern, new, (begin, end)) + after)
+        self.window = (w0, w1 + delta)
+        return True
+
+    def covers(self, window):
+        """
+        Check if the bracket candidates have been found for the window.
+        """
+
+        return self.window is not None and self.window[0] <= window[0] and window[1] <= self.window[1]
+
+    def get_candidates(self, pattern, window, pad):
+        """
+        Get the bracket candidates in the window.  If the window is not covered,
+        search it, padded on either side so that nearby cursor movement can
+        reuse the candidates.
+        """
+
+        if pattern is not self.pattern or not self.covers(window):
+            self.pattern = pattern
+            self.window = (max(0, int(window[0] - pad)), min(len(self.bfr), int(window[1] + pad)))
+            self.set_candidates(find_candidates(pattern, self.bfr, self.window))
+            self.scope_checks = {}
+            self.pair = None
+
+        return [
+            c for c in self.candidates[bisect_left(self.starts, window[0]):bisect_left(self.starts, window[1])]
+            if c[1] <= window[1]
+        ]
+
+    def get_index(self, pattern, make_builder):
+        """
+        Get the bracket index of the current buffer.  If there is none,
+        start building it and return None for now.  A build that failed
+        is not tried again until the buffer or the brackets change.
+        """
+
+        index = self.index
+        if index is not None and index.change_count == self.change_count and index.pattern is pattern:
+            return index
+
+        key = (self.change_count, pattern)
+        if self.index_building is None and self.index_failed != key:
+            self.index_building = key
+            try:
+                builder = make_builder()
+                candidates = find_candidates(pattern, self.bfr, (0, len(self.bfr)))
+            except:
+                self.fail_index(key)
+                return None
+            self.filter_index_scopes(key, self.bfr, candidates, builder, [], 0)
+        return None
+
+    def filter_index_scopes(self, key, bfr, candidates, builder, kept, begin):
+        """
+        Check the scopes of the candidates a batch at a time (on the main thread),
+        then build the index in the background.
+        """
+
+        if builder.view.change_count() != key[0]:
+            # The buffer changed, the next match starts over
+            self.index_building = None
+            return
+
+        try:
+            batch, begin = builder.filter_scopes(candidates, begin)
+        except:
+            self.fail_index(key)
+            return
+        kept.extend(batch)
+
+        if begin < len(candidates):
+            sublime.set_timeout(
+                lambda: self.filter_index_scopes(key, bfr, candidates, builder, kept, begin), 0
+            )
+        else:
+            thread.start_new_thread(self.build_index, (key, bfr, kept, builder))
+
+    def build_index(self, key, bfr, candidates, builder):
+        """
+        Build the bracket index (in a background thread).
+        """
+
+        try:
+            index = builder.build(bfr, candidates)
+            index.change_count, index.pattern = key
+        except:
+            bh_logging("Bracket Index Error:\n%s" % str(traceback.format_exc()))
+            index = None
+        sublime.set_timeout(lambda: self.finish_index(key, index), 0)
+
+    def fail_index(self, key):
+        """
+        Remember that the index could not be built for the buffer and brackets.
+        """
+
+        bh_logging("Bracket Index Error:\n%s" % str(traceback.format_exc()))
+        self.finish_index(key, None)
+
+    def finish_index(self, key, index):
+        """
+        Store the built bracket index and match the brackets again.
+        """
+
+        self.index_building = None
+        if index is None:
+            self.index_failed = key
+        else:
+            self.index = index
+            BhEventMgr.type = BH_MATCH_TYPE_EDIT
+            BhEventMgr.modified = True
+
+    def touches(self, lo, hi):
+        """
+        Check if any bracket candidate touches the range lo to hi.
+        """
+
+        for c in self.candidates[bisect_left(self.starts, lo - self.max_size):bisect_right(self.starts, hi)]:
+            if c[1] >= lo:
+                return True
+        return False
+
+
 class BhEntry(object):
     """
     Generic object for bracket regions.
@@ -248,7 +733,7 @@ class BracketSearch(object):
     Object that performs regex search on the view's buffer and finds brackets.
     """
 
-    def __init__(self, bfr, window, center, pattern, outside_adj, scope_check, scope):
+    def __init__(self, bfr, window, center, pattern, outside_adj, scope_check, scope, candidates=None):
         """
         Prepare the search object
         """
@@ -267,7 +752,7 @@ class BracketSearch(object):
         self.bracket_sort = self.sort_brackets if not outside_adj else self.sort_brackets_adj
         self.touch_left = False
         self.touch_right = False
-        self.findall(window)
+        self.findall(window, candidates)
 
     def reset_end_state(self):
         """
@@ -327,23 +812,16 @@ class BracketSearch(object):
             # Sort bracket to right
             self.right[match_type].append(BracketEntry(start, end, bracket_id))
 
-    def findall(self, window):
+    def findall(self, window, candidates=None):
         """
         Find all of the brackets and sort them
         to "left of the cursor" and "right of the cursor"
         """
 
-        for m in self.pattern.finditer(self.bfr, int(window[0]), int(window[1])):
-            g = m.lastindex
-            try:
-                start = m.start(g)
-                end = m.end(g)
-            except:
-                continue
-
-            match_type = int(not bool(g % 2))
-            bracket_id = int((g / 2) - match_type)
+        if candidates is None:
+            candidates = find_candidates(self.pattern, self.bfr, window)
 
+        for start, end, match_type, bracket_id in candidates:
             if not self.scope_check(start, bracket_id, self.scope):
                 self.bracket_sort(start, end, match_type, bracket_id)
 
@@ -599,6 +1077,7 @@ class BhCore(object):
         # Init selection params
         self.use_selection_threshold = True
         self.selection_threshold = int(self.settings.get("search_threshold", 5000))
+        self.bracket_index = bool(self.settings.get("bracket_index", False))
         self.new_select = False
         self.loaded_modules = set([])
 
@@ -881,7 +1360,7 @@ class BhCore(object):
             self.search_window = (0, view_max)
 
         # Search Buffer
-        return self.view.substr(sublime.Region(0, view_max))
+        return self.view_cache.bfr
 
     def match(self, view, force_match=True):
         """
@@ -915,6 +1394,9 @@ class BhCore(object):
         if self.unique() or force_match:
             # Initialize
             self.init_match()
+            self.view_cache = BhViewCache.get(view)
+            self.scope_memo = ScopeMemo(view)
+            start = time()
 
             # Nothing to search for
             if not self.enabled:
@@ -941,6 +1423,12 @@ class BhCore(object):
                     self.find_matches(bfr, sel)
                 multi_select_count += 1
 
+            bh_debug(
+                "Match: %d scope API calls (%d memoized), %.3fs in scope lookups, %.3fs total" % (
+                    self.scope_memo.calls, self.scope_memo.hits, self.scope_memo.elapsed, time() - start
+                )
+            )
+
         # Highlight, focus, and display lines etc.
         self.change_sel()
         self.highlight(view)
@@ -1057,9 +1545,17 @@ class BhCore(object):
         """
 
         bracket = None
-        left, right, adj_scope = self.match_brackets(bfr, self.search_window, sel)
-        if adj_scope:
-            return
+        indexed = self.match_indexed(bfr, sel)
+        cached = self.get_cached_pair(sel) if indexed is None else None
+        if indexed is not None:
+            left, right = indexed
+        elif cached is not None:
+            left, right, self.bracket_style = cached
+        else:
+            left, right, adj_scope = self.match_brackets(bfr, self.search_window, sel)
+            if adj_scope:
+                return
+            self.cache_pair(sel, left, right)
 
         regions = [sublime.Region(sel.a, sel.b)]
 
@@ -1078,6 +1574,78 @@ class BhCore(object):
         else:
             self.store_sel(regions)
 
+    def match_indexed(self, bfr, sel):
+        """
+        Match the innermost pair enclosing the cursor with the bracket index.
+        Returns None if the index is not ready, or no pair encloses
+        the cursor, so that the search window is used instead.
+        """
+
+        if not self.bracket_index or self.bracket_out_adj:
+            return None
+
+        index = self.view_cache.get_index(self.pattern, self.make_index_builder)
+        pair = index.find(sel.a) if index is not None else None
+        if pair is None:
+            return None
+
+        center = sel.a
+        left, right = pair
+        self.search_window = (0, len(bfr))
+        if self.adj_only:
+            left, right = self.adjacent_check(left, right, center)
+        return self.post_match(left, right, center, bfr)
+
+    def make_index_builder(self):
+        """
+        Create the builder of the bracket index.  It uses the current view
+        and brackets, not whatever they are when the index is built.
+        """
+
+        brackets = self.brackets
+        return BracketIndexBuilder(
+            self.view, brackets,
+            lambda b, match_type, bfr: self.validate(b, match_type, bfr, brackets=brackets),
+            lambda first, second, bfr: self.compare(first, second, bfr, brackets=brackets)
+        )
+
+    def get_cached_pair(self, sel):
+        """
+        Reuse the last matched pair if the cursor has only moved
+        within it, without touching any bracket on the way.
+        """
+
+        cache = self.view_cache
+        if (
+            cache.pair is None or self.multi_select or self.adj_only or
+            self.bracket_out_adj or cache.pattern is not self.pattern or
+            not cache.covers(self.search_window)
+        ):
+            return None
+
+        center, left, right, style = cache.pair
+        if (
+            left.begin < self.search_window[0] or right.end > self.search_window[1] or
+            cache.touches(min(center, sel.a), max(center, sel.a))
+        ):
+            return None
+        return left, right, style
+
+    def cache_pair(self, sel, left, right):
+        """
+        Remember a matched pair for cursor movement within it.
+        Pairs adjusted by post match plugins depend on more than the
+        bracket positions, so they are not cached.
+        """
+
+        self.view_cache.pair = None
+        if (
+            left is not None and right is not None and not self.multi_select and
+            self.brackets[left.type].post_match is None and
+            self.view_cache.pattern is self.pattern
+        ):
+            self.view_cache.pair = (sel.a, left, right, self.bracket_style)
+
     def escaped(self, pt, ignore_string_escape, scope):
         """
         Check if sub bracket in string scope is escaped.
@@ -1122,24 +1690,34 @@ class BhCore(object):
             if self.escaped(pt, bracket.ignore_string_escape, scope):
                 illegal_scope = True
             return illegal_scope
-        # for exception in bracket.scope_exclude_exceptions:
-        elif len(bracket.scope_exclude_exceptions) and self.view.match_selector(pt, ", ".join(bracket.scope_exclude_exceptions)):
-            pass
-        elif len(bracket.scope_exclude) and self.view.match_selector(pt, ", ".join(bracket.scope_exclude)):
-            illegal_scope = True
-        return illegal_scope
+        return excluded_scope(self.scope_memo, bracket, pt)
 
-    def validate(self, b, bracket_type, bfr, scope_bracket=False):
+    def is_illegal_scope_cached(self, pt, bracket_id, scope=None):
         """
-        Validate bracket.
+        Check if scope at pt X should be ignored,
+        remembering the answer until the buffer changes.
+        """
+
+        key = (pt, bracket_id)
+        checks = self.view_cache.scope_checks
+        if key not in checks:
+            checks[key] = self.is_illegal_scope(pt, bracket_id, scope)
+        return checks[key]
+
+    def validate(self, b, bracket_type, bfr, scope_bracket=False, brackets=None):
+        """
+        Validate bracket.  The brackets can be given, for when they
+        may have changed since the bracket was found.
         """
 
         match = True
 
-        if not self.check_validate:
-            return match
+        if brackets is None:
+            if not self.check_validate:
+                return match
+            brackets = self.brackets
 
-        bracket = self.scopes[b.scope]["brackets"][b.type] if scope_bracket else self.brackets[b.type]
+        bracket = self.scopes[b.scope]["brackets"][b.type] if scope_bracket else brackets[b.type]
         if bracket.validate is not None:
             try:
                 match = bracket.validate(
@@ -1152,9 +1730,10 @@ class BhCore(object):
                 bh_logging("Plugin Bracket Find Error:\n%s" % str(traceback.format_exc()))
         return match
 
-    def compare(self, first, second, bfr, scope_bracket=False):
+    def compare(self, first, second, bfr, scope_bracket=False, brackets=None):
         """
         Compare brackets.  This function allows bracket plugins to add aditional logic.
+        The brackets can be given, as for validate.
         """
 
         if scope_bracket:
@@ -1162,11 +1741,13 @@ class BhCore(object):
         else:
             match = first.type == second.type
 
-        if not self.check_compare:
-            return match
+        if brackets is None:
+            if not self.check_compare:
+                return match
+            brackets = self.brackets
 
         if match:
-            bracket = self.scopes[first.scope]["brackets"][first.type] if scope_bracket else self.brackets[first.type]
+            bracket = self.scopes[first.scope]["brackets"][first.type] if scope_bracket else brackets[first.type]
             try:
                 if bracket.compare is not None and match:
                     match = bracket.compare(
@@ -1272,17 +1853,17 @@ class BhCore(object):
             match = False
             if before_center > 0:
                 match = (
-                    self.view.match_selector(center, scope) and
-                    self.view.match_selector(before_center, scope)
+                    self.scope_memo.match_selector(center, scope) and
+                    self.scope_memo.match_selector(before_center, scope)
                 )
             if not match and self.bracket_out_adj:
                 if adj_dir < 0:
                     if before_center > 0:
-                        match = self.view.match_selector(before_center, scope)
+                        match = self.scope_memo.match_selector(before_center, scope)
                         if match:
                             self.adjusted_center = before_center
                 else:
-                    match = self.view.match_selector(center, scope)
+                    match = self.scope_memo.match_selector(center, scope)
                     if match:
                         self.adjusted_center += 1
             return match
@@ -1298,18 +1879,18 @@ class BhCore(object):
             extent = None
             exceed_limit = False
             if is_scope(center, before_center, scope):
-                extent = self.view.extract_scope(self.adjusted_center)
+                extent = self.scope_memo.extract_scope(self.adjusted_center)
                 while extent is not None and not exceed_limit and extent.begin() != 0:
-                    if self.view.match_selector(extent.begin() - 1, scope):
-                        extent = extent.cover(self.view.extract_scope(extent.begin() - 1))
+                    if self.scope_memo.match_selector(extent.begin() - 1, scope):
+                        extent = extent.cover(self.scope_memo.extract_scope(extent.begin() - 1))
                         if extent.begin() < self.search_window[0] or extent.end() > self.search_window[1]:
                             extent = None
                             exceed_limit = True
                     else:
                         break
                 while extent is not None and not exceed_limit and extent.end() != max_size:
-                    if self.view.match_selector(extent.end(), scope):
-                        extent = extent.cover(self.view.extract_scope(extent.end()))
+                    if self.scope_memo.match_selector(extent.end(), scope):
+                        extent = extent.cover(self.scope_memo.extract_scope(extent.end()))
                         if extent.begin() < self.search_window[0] or extent.end() > self.search_window[1]:
                             extent = None
                             exceed_limit = True
@@ -1387,12 +1968,21 @@ class BhCore(object):
         left = None
         right = None
         stack = []
-        pattern = self.pattern if not self.sub_search_mode else self.sub_pattern
-        bsearch = BracketSearch(
-            bfr, window, center,
-            pattern, self.bracket_out_adj,
-            self.is_illegal_scope, scope
-        )
+        if not self.sub_search_mode and scope is None:
+            # Search the cached bracket candidates
+            bsearch = BracketSearch(
+                bfr, window, center,
+                self.pattern, self.bracket_out_adj,
+                self.is_illegal_scope_cached, scope,
+                self.view_cache.get_candidates(self.pattern, window, self.selection_threshold / 2)
+            )
+        else:
+            pattern = self.pattern if not self.sub_search_mode else self.sub_pattern
+            bsearch = BracketSearch(
+                bfr, window, center,
+                pattern, self.bracket_out_adj,
+                self.is_illegal_scope, scope
+            )
         if not bsearch.touch_left and self.bracket_out_adj and not self.recursive_guard:
             if self.find_scopes(bfr, sel, 1):
                 return None, None, True
@@ -1488,6 +2078,13 @@ class BhListenerCommand(sublime_plugin.EventListener):
         BhEventMgr.type = BH_MATCH_TYPE_SELECTION
         sublime.set_timeout(bh_run, 0)
 
+    def on_close(self, view):
+        """
+        Forget cached brackets of closed views.
+        """
+
+        BhViewCache.discard(view)
+
     def on_modified(self, view):
         """
         Update highlighted brackets when the text changes.
@@ -20,11 +20,10 @@ except:
     from os.path import dirname
     sys.path.append(dirname(sys.executable))
     import unicodedata
-try:
-    import cpickle as pickle
-except:
-    import pickle
-from os import unlink
+from array import array
+import mmap
+import struct
+from os import unlink, rename
 PY3 = sys.version_info[0] >= 3
 uchr = chr if PY3 else unichr  # noqa
 
@@ -44,6 +43,12 @@ VERBOSE = re.VERBOSE
 escape = re.escape
 purge = re.purge
 
+# Bump when the layout of the cache changes
+CACHE_FORMAT = 1
+CACHE_MAGIC = b"URE\0"
+RANGE_TYPE = "I" if array("I").itemsize == 4 else "L"
+MAX_UNICODE = min(0x10FFFF, sys.maxunicode)
+
 _unicode_properties = None
 _unicode_key_pattern = None
 _loaded = False
@@ -63,28 +68,44 @@ def set_cache_directory(pth, prefix=""):
         _cache_prefix = prefix
 
 
+def _cache_version():
+    """
+    Version of the cache, which changes with the
+    cache format and the python build's unicode data.
+    """
+    return ("%d:%s:%d:%s:%d" % (
+        CACHE_FORMAT, unicodedata.unidata_version, MAX_UNICODE,
+        sys.byteorder, array(RANGE_TYPE).itemsize
+    )).encode("ascii")
+
+
 def _build_unicode_property_table(unicode_range):
     """
     Build property table for unicode range.
+    Each category maps to an array of inclusive (first, last) code point ranges.
     """
     table = {}
     p = None
+    first = None
+    last = None
     for i in range(*unicode_range):
         try:
             c = uchr(i)
-            p = unicodedata.category(c)
+            cat = unicodedata.category(c)
         except:
             continue
-        if p[0] not in table:
-            table[p[0]] = {}
-        if p[1] not in table[p[0]]:
-            table[p[0]][p[1]] = []
-        table[p[0]][p[1]].append(c)
-
-    # Join as one string
-    for k1, v1 in table.items():
-        for k2, v2 in v1.items():
-            v1[k2] = ''.join(v2)
+        if cat == p and i == last + 1:
+            last = i
+            continue
+        if p is not None:
+            table[p[0]][p[1]].extend((first, last))
+        if cat[0] not in table:
+            table[cat[0]] = {}
+        if cat[1] not in table[cat[0]]:
+            table[cat[0]][cat[1]] = array(RANGE_TYPE)
+        p, first, last = cat, i, i
+    if p is not None:
+        table[p[0]][p[1]].extend((first, last))
 
     return table
 
@@ -100,6 +121,71 @@ def _build_unicode_key_pattern():
     return re.compile(unicode_prop % "|".join(unicode_keys), re.UNICODE)
 
 
+def _write_unicode_cache(path, table):
+    """
+    Write the property table to a binary cache.
+
+    Layout: magic, version, category count, then a (name, range count)
+    entry per category, followed by the ranges of every category as one array.
+    """
+    version = _cache_version()
+    cats = sorted([k1 + k2 for k1, v1 in table.items() for k2 in v1.keys()])
+    ranges = array(RANGE_TYPE)
+    header = [CACHE_MAGIC, struct.pack("<H", len(version)), version, struct.pack("<I", len(cats))]
+    for cat in cats:
+        r = table[cat[0]][cat[1]]
+        header.append(struct.pack("<2sI", cat.encode("ascii"), len(r)))
+        ranges.extend(r)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"".join(header))
+        f.write(ranges.tobytes() if PY3 else ranges.tostring())
+    if exists(path):
+        unlink(path)
+    rename(tmp, path)
+
+
+def _read_unicode_cache(path):
+    """
+    Memory map the binary cache and load the property table from it.
+    Returns None if the cache is from another version.
+    """
+    with open(path, "rb") as f:
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if m[0:4] != CACHE_MAGIC:
+                return None
+            size = struct.unpack_from("<H", m, 4)[0]
+            if m[6:6 + size] != _cache_version():
+                return None
+            pos = 6 + size
+            count = struct.unpack_from("<I", m, pos)[0]
+            pos += 4
+            cats = []
+            for x in range(count):
+                cats.append(struct.unpack_from("<2sI", m, pos))
+                pos += 6
+            table = {}
+            itemsize = array(RANGE_TYPE).itemsize
+            for cat, length in cats:
+                cat = cat.decode("ascii")
+                r = array(RANGE_TYPE)
+                end = pos + length * itemsize
+                if end > len(m):
+                    return None
+                if PY3:
+                    r.frombytes(m[pos:end])
+                else:
+                    r.fromstring(m[pos:end])
+                pos = end
+                if cat[0] not in table:
+                    table[cat[0]] = {}
+                table[cat[0]][cat[1]] = r
+            return table
+        finally:
+            m.close()
+
+
 def _init_unicode():
     """
     Prepare unicode property tables and key pattern
@@ -107,32 +193,31 @@ def _init_unicode():
     global _loaded
     global _unicode_properties
     global _unicode_key_pattern
+    _unicode_properties = None
     if _use_cache is not None:
-        props = join(_use_cache, "%s_unicode_properties.cache" % _cache_prefix)
-        if (not exists(join(_use_cache, "%s_unicode_properties.cache" % _cache_prefix))):
-            _unicode_properties = _build_unicode_property_table((0x0000, 0x10FFFF))
-            _unicode_key_pattern = _build_unicode_key_pattern()
-
+        props = join(_use_cache, "%s_unicode_properties.bin" % _cache_prefix)
+        if exists(props):
             try:
-                with open(props, 'wb') as f:
-                    pickle.dump(_unicode_key_pattern, f)
-                    pickle.dump(_unicode_properties, f)
+                _unicode_properties = _read_unicode_cache(props)
             except:
-                if exists(props):
-                    unlink(props)
-        else:
+                pass
+        if _unicode_properties is None:
+            _unicode_properties = _build_unicode_property_table((0x0000, MAX_UNICODE + 1))
             try:
-                with open(props, 'rb') as f:
-                    _unicode_key_pattern = pickle.load(f)
-                    _unicode_properties = pickle.load(f)
+                _write_unicode_cache(props, _unicode_properties)
             except:
                 if exists(props):
                     unlink(props)
-                _unicode_properties = _build_unicode_property_table((0x0000, 0x10FFFF))
-                _unicode_key_pattern = _build_unicode_key_pattern()
+        # Remove the pickled cache of older versions
+        old_props = join(_use_cache, "%s_unicode_properties.cache" % _cache_prefix)
+        if exists(old_props):
+            try:
+                unlink(old_props)
+            except:
+                pass
     else:
-        _unicode_properties = _build_unicode_property_table((0x0000, 0x10FFFF))
-        _unicode_key_pattern = _build_unicode_key_pattern()
+        _unicode_properties = _build_unicode_property_table((0x0000, MAX_UNICODE + 1))
+    _unicode_key_pattern = _build_unicode_key_pattern()
 
     _loaded = True
 
@@ -160,12 +245,36 @@ def find_char_groups(s):
     return groups
 
 
+def _escape_class_char(c):
+    """
+    Escape a character for use in a character class
+    """
+    return "\\" + c if c in "\\[]^-" else c
+
+
+def _ranges_to_class(ranges):
+    """
+    Convert code point ranges to the contents of a character class
+    """
+    parts = []
+    for x in range(0, len(ranges), 2):
+        first, last = ranges[x], ranges[x + 1]
+        parts.append(_escape_class_char(uchr(first)))
+        if last > first + 1:
+            parts.append("-")
+        if last > first:
+            parts.append(_escape_class_char(uchr(last)))
+    return ''.join(parts)
+
+
 def get_unicode_category(prop):
     """
     Retrieve the unicode category from the table
     """
     p1, p2 = (prop[0], prop[1]) if len(prop) > 1 else (prop[0], None)
-    return ''.join([x for x in _unicode_properties[p1].values()]) if p2 is None else _unicode_properties[p1][p2]
+    if p2 is None:
+        return ''.join([_ranges_to_class(x) for x in _unicode_properties[p1].values()])
+    return _ranges_to_class(_unicode_properties[p1][p2])
 
 
 def parse_unicode_properties(re_pattern):
@@ -253,9 +362,41 @@ def subn(pattern, repl, string, count=0, flags=0):
 
 # _init_unicode()
 
+def _benchmark():
+    """
+    Report the cold (no cache) and warm (cached) time to import ure
+    and compile a pattern with unicode properties.  Each run is a new process.
+    """
+    import shutil
+    import subprocess
+    import tempfile
+    from os.path import dirname, abspath
+
+    script = (
+        "import sys, time\n"
+        "start = time.time()\n"
+        "sys.path.insert(0, %r)\n"
+        "import ure\n"
+        "ure.set_cache_directory(sys.argv[1], 'bench')\n"
+        "ure.compile(r'\\p{Ll}\\p{Lu}')\n"
+        "print(time.time() - start)\n"
+    ) % dirname(abspath(__file__))
+    cache = tempfile.mkdtemp()
+    try:
+        for label in ("cold", "warm"):
+            out = subprocess.Popen(
+                [sys.executable, "-c", script, cache], stdout=subprocess.PIPE
+            ).communicate()[0]
+            print("%s import: %.3fs" % (label, float(out.strip())))
+    finally:
+        shutil.rmtree(cache)
+
+
 if __name__ == "__main__":
     from os.path import dirname, abspath
     print(__file__)
     set_cache_directory(dirname(abspath(__file__)), "test")
     print("Testing ure's unicode properties replacement")
     print(parse_unicode_properties(r"\p{Ll}"))
+    print("Benchmarking ure's startup")
+    _benchmark()
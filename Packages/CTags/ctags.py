@@ -8,7 +8,12 @@ import os
 import sys
 import subprocess
 import bisect
+import heapq
+import json
 import mmap
+import tempfile
+
+from itertools import islice
 
 if sys.version_info<(2,7,0):
     from helpers.check_output import check_output
@@ -42,6 +47,9 @@ PATH_IGNORE_FIELDS = ('file', 'access', 'signature',
 
 TAG_PATH_SPLITTERS = ('/', '.', '::', ':')
 
+# approximate number of characters held in memory by each sorting run
+SORT_BUFFER_SIZE = 16 * 1024 * 1024
+
 
 """
 Functions
@@ -68,6 +76,31 @@ def splits(string, *splitters):
             yield string
 
 
+def get_filename(line):
+    """Get the filename column of a tag line.
+
+    :param line: line from a tag file
+
+    :returns: filename the tag belongs to, or an empty string if the line is
+        not a valid tag
+    """
+    split = line.split('\t', FILENAME + 2)
+    return split[FILENAME] if len(split) > FILENAME else ''
+
+
+def strip_filename(line):
+    """Remove the prepending ``.\\`` from the filename column of a tag line.
+
+    :param line: line from a tag file
+
+    :returns: line with the stripped filename
+    """
+    split = line.split('\t')
+    if len(split) > FILENAME:
+        split[FILENAME] = split[FILENAME].lstrip('.\\')
+    return '\t'.join(split)
+
+
 """Tag processing functions"""
 
 
@@ -330,10 +363,115 @@ def build_ctags(path, tag_file=None, recursive=False, opts=None, cmd=None,
     # re-sort ctag file in filename order to improve search performance
     resort_ctags(tag_file)
 
+    # build case-insensitive symbol index to speed up autocompletion
+    build_symbol_index(tag_file)
+
+    # record file modification times to allow for incremental updates
+    build_manifest(tag_file)
+
     return tag_file
 
 
-def resort_ctags(tag_file):
+def update_ctags(paths, tag_file, opts=None, cmd=None, env=None):
+    """Update the tags for a number of files in an existing tag file.
+
+    Executes the ``ctags`` command for the given files only, then splices the
+    resulting tags into the tag file and its ``sorted_by_file`` and
+    ``sorted_by_file_reversed`` companions using a merge, rather than
+    rebuilding and re-sorting them. Tags belonging to files which no longer
+    exist are removed.
+
+    :param paths: paths to the files to update tags for
+    :param tag_file: path to an existing tag file, as built by
+        ``build_ctags``
+    :param opts: list of additional options to pass to the ctags executable
+    :param cmd: path to the ctags executable
+    :param env: environment variables to be used when executing ``ctags``
+
+    :returns: original ``tag_file`` filename
+    """
+    tag_dir = os.path.dirname(tag_file)
+
+    # tag files store filenames relative to the directory of the tag file
+    names = set(os.path.normpath(os.path.relpath(path, tag_dir))
+                for path in paths)
+    existing = sorted(name for name in names
+                      if os.path.isfile(os.path.join(tag_dir, name)))
+
+    lines = []
+
+    if existing:
+        update_file = tag_file + '_update'
+
+        # build the CTags command
+        if cmd:
+            cmd = [cmd]
+        else:
+            cmd = ['ctags']
+
+        cmd.append('-f {0}'.format(update_file))
+
+        if opts:
+            if type(opts) == list:
+                cmd.extend(opts)
+            else:  # *should* be a list, but better safe than sorry
+                cmd.append(opts)
+
+        cmd.extend(existing)
+
+        # workaround for the issue described here:
+        #   http://bugs.python.org/issue6689
+        if os.name == 'posix':
+            cmd = ' '.join(cmd)
+
+        # execute the command
+        check_output(cmd, cwd=tag_dir, shell=True, env=env,
+                     stdin=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+        try:
+            with codecs.open(update_file, encoding='utf-8', errors='ignore') as fh:
+                lines = sorted(line.rstrip('\r\n') + '\n' for line in fh
+                               if not line.startswith('!_'))
+        finally:
+            os.remove(update_file)
+
+    def is_updated(line):
+        filename = get_filename(line)
+        return bool(filename) and os.path.normpath(filename) in names
+
+    by_file = [strip_filename(line) for line in lines]
+    by_file.sort(key=get_filename)  # stable, so tags stay in symbol order
+
+    splice_lines(tag_file, lines, remove=is_updated)
+    splice_lines(tag_file+'_sorted_by_file', by_file, key=get_filename,
+                 remove=is_updated)
+
+    if os.path.exists(tag_file+'_sorted_by_file_reversed'):
+        def reversed_key(line):
+            return line.split('\t', 1)[0]
+
+        reversed_lines = sorted(
+            ('{0}\t{1}'.format(get_filename(line)[::-1], line)
+             for line in by_file), key=reversed_key)
+        splice_lines(tag_file+'_sorted_by_file_reversed', reversed_lines,
+                     key=reversed_key,
+                     remove=lambda line: is_updated(line.split('\t', 1)[-1]))
+
+    # record the new modification times of the updated files
+    manifest = read_manifest(tag_file)
+
+    for name in names:
+        if name in existing:
+            manifest[name] = os.path.getmtime(os.path.join(tag_dir, name))
+        else:
+            manifest.pop(name, None)
+
+    write_manifest(tag_file, manifest)
+
+    return tag_file
+
+
+def resort_ctags(tag_file, buffer_size=SORT_BUFFER_SIZE):
     """Rearrange ctags file for speed.
 
     Resorts (re-sort) a CTag file in order of file. This improves searching
@@ -342,34 +480,328 @@ def resort_ctags(tag_file):
     The algorithm works as so:
 
         For each line in the tag file
-            Read the file name (``file_name``) the tag belongs to
-            If not exists, create an empty array and store in the
-                dictionary with the file name as key
-            Save the line to this list
-        Create a new ``[tagfile]_sorted_by_file`` file
-        For each key in the sorted dictionary
-            For each line in the list indicated by the key
-                Split the line on tab character
-                Remove the prepending ``.\`` from the ``file_name`` part of
-                    the                   tag
-                Join the line again and write the ``sorted_by_file`` file
+            Split the line on tab character
+            Remove the prepending ``.\`` from the ``file_name`` part of the
+                tag
+            Join the line again
+        Sort the lines by ``file_name``, preserving the original order of
+            lines with the same ``file_name``
+        Write the lines to a new ``[tagfile]_sorted_by_file`` file
+        For each line in the ``sorted_by_file`` file
+            Prepend the reversed ``file_name`` and a tab character
+        Sort the lines by the reversed ``file_name``
+        Write the lines to a new ``[tagfile]_sorted_by_file_reversed`` file
+
+    The ``reversed`` file allows ``TagFile.search_by_suffix`` to find tags by
+    file suffix (i.e. extension) using a binary search.
+
+    Sorting is done using ``sort_lines``, so memory usage is bounded by
+    ``buffer_size`` rather than by the size of the tag file.
 
     :param tag_file: The location of the tagfile to be sorted
+    :param buffer_size: approximate number of characters to sort in memory
+        at a time, or None to sort the entire file in memory
 
     :returns: None
     """
-    keys = {}
+    def reversed_key(line):
+        return line.split('\t', 1)[0]
 
     with codecs.open(tag_file, encoding='utf-8', errors='ignore') as fh:
+        with codecs.open(tag_file+'_sorted_by_file', 'w', encoding='utf-8', errors='ignore') as fw:
+            lines = (strip_filename(line.rstrip('\r\n')) + '\n'
+                     for line in fh)
+            for line in sort_lines(lines, get_filename, buffer_size):
+                fw.write(line)
+
+    with codecs.open(tag_file+'_sorted_by_file', encoding='utf-8', errors='ignore') as fh:
+        with codecs.open(tag_file+'_sorted_by_file_reversed', 'w', encoding='utf-8', errors='ignore') as fw:
+            lines = ('{0}\t{1}'.format(get_filename(line)[::-1], line)
+                     for line in fh)
+            for line in sort_lines(lines, reversed_key, buffer_size):
+                fw.write(line)
+
+
+def sort_lines(lines, key=None, buffer_size=SORT_BUFFER_SIZE):
+    """Sort lines using a bounded amount of memory.
+
+    Performs an external merge sort: lines are read into memory until
+    ``buffer_size`` characters have been read, sorted, and written to a
+    temporary file (a 'run'). Once all lines have been read, the runs are
+    merged using a heap. If all lines fit in the buffer, no temporary files
+    are used. The sort is stable.
+
+    :param lines: iterable of newline-terminated lines to sort
+    :param key: function used to extract the value to sort lines on, or None
+        to sort on the lines themselves
+    :param buffer_size: approximate number of characters to sort in memory
+        at a time, or None to sort all lines in memory
+
+    :returns: generator of sorted lines
+    """
+    runs = []
+    chunk = []
+    chunk_size = 0
+
+    def write_run(chunk):
+        handle, path = tempfile.mkstemp(suffix='.ctags_run')
+        os.close(handle)
+        runs.append(path)
+
+        with codecs.open(path, 'w', encoding='utf-8') as fw:
+            for line in sorted(chunk, key=key):
+                fw.write(line)
+
+    try:
+        for line in lines:
+            chunk.append(line)
+            chunk_size += len(line)
+
+            if buffer_size and chunk_size >= buffer_size:
+                write_run(chunk)
+                chunk = []
+                chunk_size = 0
+
+        if not runs:  # everything fit in memory - no need to merge
+            chunk.sort(key=key)
+            for line in chunk:
+                yield line
+            return
+
+        if chunk:
+            write_run(chunk)
+            chunk = []
+
+        files = [codecs.open(path, encoding='utf-8') for path in runs]
+
+        try:
+            for line in merge_lines(key, *files):
+                yield line
+        finally:
+            for fh in files:
+                fh.close()
+    finally:
+        for path in runs:
+            os.remove(path)
+
+
+def merge_lines(key=None, *iterables):
+    """Merge a number of sorted iterables of lines.
+
+    A stable equivalent of ``heapq.merge`` which allows a ``key`` function to
+    be given. Lines with equal keys are returned in the order of the
+    iterables they came from.
+
+    :param key: function used to extract the value lines are sorted on, or
+        None to sort on the lines themselves
+    :param iterables: iterables of lines, each sorted on ``key``
+
+    :returns: generator of merged lines
+    """
+    def decorate(lines, index):
+        for count, line in enumerate(lines):
+            yield (key(line) if key else line), index, count, line
+
+    decorated = [decorate(lines, index)
+                 for index, lines in enumerate(iterables)]
+
+    for item in heapq.merge(*decorated):
+        yield item[-1]
+
+
+def splice_lines(path, lines, key=None, remove=None):
+    """Splice sorted lines into a sorted file.
+
+    Merges ``lines`` into the file given by ``path``, dropping any existing
+    lines in the file for which ``remove`` returns True. The file is rewritten
+    in one pass and atomically replaced.
+
+    :param path: path to a file, sorted on ``key``
+    :param lines: list of lines to add, sorted on ``key``
+    :param key: function used to extract the value lines are sorted on, or
+        None to sort on the lines themselves
+    :param remove: function called for each existing line, returning True if
+        that line should be dropped
+
+    :returns: None
+    """
+    temp_path = path + '.tmp'
+
+    with codecs.open(path, encoding='utf-8', errors='ignore') as fh:
+        with codecs.open(temp_path, 'w', encoding='utf-8', errors='ignore') as fw:
+            if remove:
+                existing = (line for line in fh if not remove(line))
+            else:
+                existing = fh
+
+            for line in merge_lines(key, existing, lines):
+                fw.write(line)
+
+    if os.name != 'posix':  # rename doesn't replace existing files on Windows
+        os.remove(path)
+
+    os.rename(temp_path, path)
+
+
+def build_manifest(tag_file):
+    """Build a manifest of the files in a ctags file.
+
+    Creates a ``[tagfile]_manifest`` companion file, recording the
+    modification time of each file that has tags in the tag file. This is used
+    to find files whose tags are out of date.
+
+    :param tag_file: The location of the tagfile, as sorted by
+        ``resort_ctags``
+
+    :returns: None
+    """
+    tag_dir = os.path.dirname(tag_file)
+    manifest = {}
+
+    with codecs.open(tag_file+'_sorted_by_file', encoding='utf-8', errors='ignore') as fh:
         for line in fh:
-            keys.setdefault(line.split('\t')[FILENAME], []).append(line)
+            if line.startswith('!_'):  # skip the pseudo-tag headers
+                continue
+
+            split = line.split('\t', FILENAME + 2)
+
+            if len(split) <= FILENAME:
+                continue
+
+            name = os.path.normpath(split[FILENAME])
+
+            if name not in manifest:
+                path = os.path.join(tag_dir, name)
+                if os.path.exists(path):
+                    manifest[name] = os.path.getmtime(path)
+
+    write_manifest(tag_file, manifest)
 
-    with codecs.open(tag_file+'_sorted_by_file', 'w', encoding='utf-8', errors='ignore') as fw:
-        for k in sorted(keys):
-            for line in keys[k]:
-                split = line.split('\t')
-                split[FILENAME] = split[FILENAME].lstrip('.\\')
-                fw.write('\t'.join(split))
+
+def read_manifest(tag_file):
+    """Read the manifest of a ctags file.
+
+    :param tag_file: The location of the tagfile
+
+    :returns: dict of filenames, relative to the tagfile, and the modification
+        times of those files when their tags were last built
+    """
+    try:
+        with codecs.open(tag_file+'_manifest', encoding='utf-8') as fh:
+            return json.load(fh)
+    except (IOError, ValueError):  # missing or corrupt, so rebuild
+        return {}
+
+
+def write_manifest(tag_file, manifest):
+    """Write the manifest of a ctags file.
+
+    :param tag_file: The location of the tagfile
+    :param manifest: dict of filenames and modification times
+
+    :returns: None
+    """
+    with codecs.open(tag_file+'_manifest', 'w', encoding='utf-8') as fw:
+        json.dump(manifest, fw)
+
+
+def get_stale_files(tag_file):
+    """Get the files whose tags are out of date in a ctags file.
+
+    :param tag_file: The location of the tagfile
+
+    :returns: paths to files which have been modified or removed since their
+        tags were last built
+    """
+    tag_dir = os.path.dirname(tag_file)
+    stale = []
+
+    for name, mtime in read_manifest(tag_file).items():
+        path = os.path.join(tag_dir, name)
+        if not os.path.exists(path) or os.path.getmtime(path) != mtime:
+            stale.append(path)
+
+    return stale
+
+
+def build_symbol_index(tag_file, buffer_size=SORT_BUFFER_SIZE):
+    """Build a case-insensitive symbol index for a ctags file.
+
+    Creates a ``[tagfile]_symbols`` companion file containing one line per
+    unique symbol in the tag file, in the format::
+
+        lowercased_symbol<TAB>symbol
+
+    The file is sorted on the lowercased symbol, meaning it can be opened as
+    a ``TagFile`` and searched for a case-insensitive prefix using a binary
+    search rather than a scan of the entire tag file.
+
+    :param tag_file: The location of the tagfile to be indexed
+    :param buffer_size: approximate number of characters to sort in memory
+        at a time, or None to sort the entire index in memory
+
+    :returns: None
+    """
+    def symbols(fh):
+        previous = None
+
+        for line in fh:
+            if line.startswith('!_'):  # skip the pseudo-tag headers
+                continue
+
+            symbol = line.split('\t', 1)[SYMBOL].rstrip('\r\n')
+
+            # the tag file is sorted by symbol, so duplicates are adjacent
+            if symbol and symbol != previous:
+                yield '{0}\t{1}\n'.format(symbol.lower(), symbol)
+                previous = symbol
+
+    with codecs.open(tag_file, encoding='utf-8', errors='ignore') as fh:
+        with codecs.open(tag_file+'_symbols', 'w', encoding='utf-8', errors='ignore') as fw:
+            previous = None
+
+            for line in sort_lines(symbols(fh), buffer_size=buffer_size):
+                if line != previous:
+                    fw.write(line)
+                    previous = line
+
+
+def symbol_index_is_stale(tag_file):
+    """Check if the symbol index for a ctags file needs to be rebuilt.
+
+    :param tag_file: The location of the tagfile
+
+    :returns: True if the index does not exist or is older than the tagfile
+    """
+    index_file = tag_file + '_symbols'
+
+    if not os.path.exists(index_file):
+        return True
+
+    return os.path.getmtime(index_file) < os.path.getmtime(tag_file)
+
+
+def search_symbol_index(tag_file, prefix, limit=None):
+    """Search the symbol index of a ctags file for a prefix.
+
+    The search is case-insensitive and uses a binary search, meaning it runs
+    in ``O(log n + k)`` time, where ``k`` is the number of results returned.
+
+    :param tag_file: The location of the tagfile, as built by
+        ``build_symbol_index``
+    :param prefix: symbol prefix to search for
+    :param limit: maximum number of symbols to return, or None for no limit
+
+    :returns: list of matching symbols, ordered case-insensitively
+    """
+    index_file = tag_file + '_symbols'
+
+    if not os.path.getsize(index_file):  # mmap can't map an empty file
+        return []
+
+    with TagFile(index_file, SYMBOL) as index:
+        matches = index.search(False, prefix.lower())
+        return [tag[1] for tag in islice(matches, limit)]
 
 
 """
@@ -388,22 +820,41 @@ class TagElements(dict):
 class Tag(object):
     """Model a tag.
 
-    This exists mainly to enable different types of sorting.
+    This exists mainly to enable different types of sorting. The sort key and
+    the split line are cached, as a matching tag's key is compared and its
+    columns then read while parsing it. Finding the key only splits up to the
+    sort column.
     """
+    __slots__ = ('line', 'column', '_key', '_columns')
+
     def __init__(self, line, column=0):
         if isinstance(line, bytes):  # python 3 compatibility
             line = line.decode('utf-8', 'replace')
         self.line = line
         self.column = column
+        self._key = None
+        self._columns = None
+
+    @property
+    def key(self):
+        """Get value of the column the tag is sorted on"""
+        if self._key is None:
+            if self._columns is not None:
+                self._key = self._columns[self.column]
+            else:
+                self._key = self.line.split('\t', self.column + 1)[self.column]
+        return self._key
 
     def __lt__(self, other):
-        return self.line.split('\t')[self.column] < other
+        return self.key < other
 
     def __gt__(self, other):
-        return self.line.split('\t')[self.column] > other
+        return self.key > other
 
     def __getitem__(self, index):
-        return self.line.split('\t')[index]
+        if self._columns is None:
+            self._columns = self.line.split('\t')
+        return self._columns[index]
 
 
 class TagFile(object):
@@ -430,16 +881,28 @@ class TagFile(object):
         self.column = column
 
     def __getitem__(self, index):
-        """Provide sequence-type interface to tag file."""
+        """Provide sequence-type interface to tag file.
+
+        Returns the raw bytes of the sort column of the line at ``index``, so
+        a binary search compares byte slices rather than decoding each line
+        it probes into a ``Tag``.
+        """
+        columns = self.line(index).split(b'\t', self.column + 1)
+
+        if len(columns) <= self.column:  # past the end, or a short line
+            return b''
+
+        return columns[self.column]
+
+    def line(self, index):
+        """Get the first complete line at or after byte offset ``index``"""
         self.mapped.seek(index)
         result = self.mapped.readline()
 
         if index != 0:  # handle first line
             result = self.mapped.readline()  # get a complete line
 
-        result = result.strip()
-
-        return Tag(result, self.column)
+        return result.strip()
 
     def __len__(self):
         """Get size of tag file in bytes"""
@@ -486,29 +949,43 @@ class TagFile(object):
             return
 
         for key in tags:
-            leftIndex = bisect.bisect_left(self, key)
+            raw_key = key if isinstance(key, bytes) else key.encode('utf-8')
+            leftIndex = bisect.bisect_left(self, raw_key)
             if exact_match:
-                result = self[leftIndex]
-                while result.line and result[result.column] == key:
+                result = Tag(self.line(leftIndex), self.column)
+                while result.line and result.key == key:
                     yield(result)
                     result = Tag(self.mapped.readline().strip(), self.column)
             else:
-                result = self[leftIndex]
-                while result.line and result[result.column].startswith(key):
+                result = Tag(self.line(leftIndex), self.column)
+                while result.line and result.key.startswith(key):
                     yield(result)
                     result = Tag(self.mapped.readline().strip(), self.column)
 
     def search_by_suffix(self, suffix):
         """Search for one or more tags with the given suffix in the tag file.
 
-        Search a tag file for given tags with the given suffix, using a linear
-        search. Note that this linear search requires the entire file be
-        searched making it slow. Hence, it should be avoided if possible.
+        Search a tag file for given tags with the given suffix. If a
+        ``[path]_reversed`` companion file - containing the reversed values
+        of the column and the original lines, sorted on the former, as
+        generated by ``resort_ctags`` - exists and is up to date, this uses a
+        binary search. Otherwise it falls back to a linear search. Note that
+        this linear search requires the entire file be searched making it
+        slow. Hence, it should be avoided if possible.
 
         :param suffix: suffix to search for
 
         :returns: matching tags
         """
+        index_path = self.path + '_reversed'
+
+        if (os.path.exists(index_path) and os.path.getsize(index_path) and
+                os.path.getmtime(index_path) >= os.path.getmtime(self.path)):
+            with TagFile(index_path, 0) as index:
+                for result in index.search(False, suffix[::-1]):
+                    yield Tag(result.line.split('\t', 1)[1], self.column)
+            return
+
         for line in self.file_o:
             if line.split('\t')[self.column].endswith(suffix):
                 yield Tag(line)
@@ -11,11 +11,17 @@ import re
 import string
 import threading
 import subprocess
+import traceback
 
 from itertools import chain
 from operator import itemgetter as iget
 from collections import defaultdict, deque
 
+try:
+    import queue
+except ImportError:  # python 2
+    import Queue as queue
+
 try:
     import sublime
     import sublime_plugin
@@ -59,6 +65,10 @@ ON_LOAD = sublime_plugin.all_callbacks['on_load']
 RE_SPECIAL_CHARS = re.compile(
     '(\\\\|\\*|\\+|\\?|\\||\\{|\\}|\\[|\\]|\\(|\\)|\\^|\\$|\\.|\\#|\\ )')
 
+TAG_SEARCH_WORKERS = 4  # threads used to search tag files in parallel
+
+TAG_FILE_CACHE_SIZE = 8  # number of tag files to keep open
+
 
 """
 Functions
@@ -612,10 +622,13 @@ def ctags_goto_command(jump_directly=False):
 
 
 def check_if_building(self, **args):
-    """Check if ctags are currently being built"""
+    """Check if ctags are currently being built or updated"""
     if RebuildTags.build_ctags.func.running:
         error_message('Please wait while tags are built')
         return False
+    if tag_update_queue.running:
+        status_message('Please wait while tags are updated')
+        return False
     return True
 
 
@@ -637,6 +650,164 @@ def compile_definition_filters(view):
     return filters
 
 
+"""Tag search helpers"""
+
+
+class TagFileCache(object):
+    """Cache of open tag files, shared between threads.
+
+    Keeps up to ``size`` tag files open (and hence mapped into memory), so
+    repeated searches don't need to re-open them. The least recently used tag
+    file is closed when the cache is full. Tag files are re-opened if they
+    have been modified since they were opened.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.entries = {}  # path -> [stat, lock, TagFile, evicted]
+        self.order = []  # paths, least recently used first
+
+    def get_tags_dict(self, path, *tags, **kw):
+        """Return the tags from a cached tag file as a dict
+
+        See ``TagFile.get_tags_dict``
+        """
+        stat = os.stat(path)
+        stat = (stat.st_mtime, stat.st_size)
+        stale = None
+
+        with self.lock:
+            entry = self.entries.get(path)
+
+            if entry and entry[0] != stat:  # modified, so re-open
+                stale = entry
+                stale[3] = True
+                entry = None
+                self.order.remove(path)
+                del self.entries[path]
+
+            if not entry:
+                tagfile = TagFile(path, SYMBOL)
+                tagfile.open()
+                entry = [stat, threading.Lock(), tagfile, False]
+                self.entries[path] = entry
+            else:
+                self.order.remove(path)
+
+            self.order.append(path)
+            evicted = [self.entries.pop(p) for p in self.order[:-self.size]]
+            del self.order[:-self.size]
+            for old_entry in evicted:
+                old_entry[3] = True
+
+        for old_entry in evicted + ([stale] if stale else []):
+            self.close_entry(old_entry)
+
+        # a tag file can only be searched by one thread at a time
+        with entry[1]:
+            if entry[3]:  # evicted by another thread
+                return self.get_tags_dict(path, *tags, **kw)
+            return entry[2].get_tags_dict(*tags, **kw)
+
+    @staticmethod
+    def close_entry(entry):
+        """Close a tag file once any search of it has finished"""
+        with entry[1]:
+            entry[2].close()
+
+    def clear(self):
+        """Close all cached tag files, i.e. before they are rebuilt"""
+        with self.lock:
+            entries = list(self.entries.values())
+            self.entries.clear()
+            del self.order[:]
+            for entry in entries:
+                entry[3] = True
+
+        for entry in entries:
+            self.close_entry(entry)
+
+
+class TagSearchPool(object):
+    """Pool of worker threads used to search tag files in parallel"""
+    def __init__(self, workers):
+        self.workers = workers
+        self.tasks = queue.Queue()
+        self.threads = []
+
+    def submit(self, results, key, func, *args, **kw):
+        """Call ``func`` on a worker and put ``(key, result)`` in ``results``
+
+        If ``func`` raises an exception, the exception is the result.
+        """
+        if not self.threads:  # start workers on first use
+            for i in range(self.workers):
+                t = threading.Thread(target=self.work)
+                t.setDaemon(True)
+                t.start()
+                self.threads.append(t)
+
+        self.tasks.put((results, key, func, args, kw))
+
+    def work(self):
+        while True:
+            results, key, func, args, kw = self.tasks.get()
+            try:
+                result = func(*args, **kw)
+            except Exception as e:
+                result = e
+            results.put((key, result))
+
+
+tag_file_cache = TagFileCache(TAG_FILE_CACHE_SIZE)
+
+# tag files are rebuilt, updated and indexed by one thread at a time
+tag_file_lock = threading.Lock()
+
+tag_search_pool = TagSearchPool(TAG_SEARCH_WORKERS)
+
+
+def search_tag_files(tag_files, symbol, filters):
+    """Search a number of tag files for a symbol in parallel.
+
+    Tag files are searched in parallel on the tag search pool. The first tag
+    file in ``tag_files`` with a match takes precedence, but the result is
+    returned as soon as that tag file and all those before it have been
+    searched, without waiting for the remaining tag files.
+
+    :param tag_files: list of paths to tag files, in order of precedence
+    :param symbol: symbol to search for
+    :param filters: filters to apply to the tags found
+
+    :returns: dict containing the tags from the first matching tag file, or
+        an empty dict if there are no matches
+    """
+    results = queue.Queue()
+
+    for index, tag_file in enumerate(tag_files):
+        tag_search_pool.submit(results, index, tag_file_cache.get_tags_dict,
+                               tag_file, symbol, filters=filters)
+
+    found = [None] * len(tag_files)
+
+    for i in range(len(tag_files)):
+        index, tags = results.get()
+
+        if isinstance(tags, Exception):
+            print(('Failed searching %s: %s' % (tag_files[index], tags)))
+            tags = {}
+
+        found[index] = tags
+
+        for tags in found:
+            if tags is None:  # still searching a tag file with precedence
+                break
+            if tags:
+                return tags
+
+    return {}
+
+
 """Goto definition under cursor commands"""
 
 
@@ -644,13 +815,8 @@ class JumpToDefinition:
     """Provider for NavigateToDefinition and SearchForDefinition commands"""
     @staticmethod
     def run(symbol, view, tags_file):
-        tags = {}
-        for tags_file in get_alternate_tags_paths(view, tags_file):
-            with TagFile(tags_file, SYMBOL) as tagfile:
-                tags = tagfile.get_tags_dict(
-                    symbol, filters=compile_filters(view))
-            if tags:
-                break
+        tags = search_tag_files(get_alternate_tags_paths(view, tags_file),
+                                symbol, compile_filters(view))
 
         if not tags:
             return status_message('Can\'t find "%s"' % symbol)
@@ -885,9 +1051,12 @@ class RebuildTags(sublime_plugin.TextCommand):
             tags_building(path)
 
             try:
-                result = ctags.build_ctags(path=path, tag_file=tag_file,
-                                           recursive=recursive, opts=opts,
-                                           cmd=command)
+                with tag_file_lock:
+                    # don't hold tag files open while building
+                    tag_file_cache.clear()
+                    result = ctags.build_ctags(path=path, tag_file=tag_file,
+                                               recursive=recursive, opts=opts,
+                                               cmd=command)
             except IOError as e:
                 error_message(e.strerror)
                 return
@@ -906,18 +1075,117 @@ class RebuildTags(sublime_plugin.TextCommand):
 
             tags_built(result)
 
-        GetAllCTagsList.ctags_list = []  # clear the cached ctags list
+
+"""Update CTags on save"""
+
+
+def update_tags(paths, tag_file, command, opts):
+    """Update tags for the given files, and any other stale files
+
+    :param paths: paths to files to update tags for
+    :param tag_file: path to the tag file to update
+    :param command: ctags command
+    :param opts: list of additional parameters to pass to the ``ctags``
+        executable
+
+    :returns: None
+    """
+    with tag_file_lock:
+        paths = set(paths)
+        paths.update(ctags.get_stale_files(tag_file))
+
+        print(('Updating %s for %d files' % (tag_file, len(paths))))
+
+        # don't hold tag files open while updating, as they are replaced
+        tag_file_cache.clear()
+
+        try:
+            ctags.update_ctags(paths, tag_file, opts=opts, cmd=command)
+        except subprocess.CalledProcessError as e:
+            print(e.output)
+            in_main(lambda: status_message('Failed updating {0}'
+                                           .format(tag_file)))()
+            return
+
+    in_main(lambda: tags_cache[os.path.dirname(tag_file)].clear())()
+
+
+class TagUpdateQueue(object):
+    """Queue of saved files whose tags need to be updated
+
+    Tag files are updated one at a time by a background thread. Files saved
+    while an update is running are updated once it has finished.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}  # tag file -> [paths, command, opts]
+        self.running = False
+
+    def add(self, path, tag_file, command, opts):
+        """Queue ``path`` to be updated in ``tag_file``"""
+        with self.lock:
+            entry = self.pending.setdefault(tag_file, [set(), None, None])
+            entry[0].add(path)
+            entry[1:] = [command, opts]
+
+            if self.running:  # picked up when the current update finishes
+                return
+            self.running = True
+
+        t = threading.Thread(target=self.work)
+        t.setDaemon(True)
+        t.start()
+
+    def work(self):
+        while True:
+            with self.lock:
+                if not self.pending:
+                    self.running = False
+                    return
+                tag_file, (paths, command, opts) = self.pending.popitem()
+
+            try:
+                update_tags(paths, tag_file, command, opts)
+            except Exception:  # keep going for the other tag files
+                print(traceback.format_exc())
+
+
+tag_update_queue = TagUpdateQueue()
+
+
+class CTagsUpdateOnSave(sublime_plugin.EventListener):
+    """Incrementally update the tag file of a file when it is saved"""
+    def on_post_save(self, view):
+        if not setting('update_on_save'):
+            return
+
+        if RebuildTags.build_ctags.func.running:
+            return
+
+        tag_file = find_tags_relative_to(view.file_name(), setting('tag_file'))
+
+        if not tag_file:
+            return
+
+        tag_update_queue.add(view.file_name(), tag_file, setting('command'),
+                             setting('opts'))
 
 
 """Autocomplete commands"""
 
 
-class GetAllCTagsList():
-    ctags_list = []
+@threaded(msg='Already building CTags symbol index!')
+def build_symbol_index(tag_file):
+    """Build the autocompletion symbol index for a tag file in background
 
-    """cache all the ctags list"""
-    def __init__(self, list):
-        self.ctags_list = list
+    :param tag_file: path to the tag file to index
+
+    :returns: None
+    """
+    print(('Building symbol index for %s' % tag_file))
+
+    with tag_file_lock:
+        ctags.build_symbol_index(tag_file)
 
 
 class CTagsAutoComplete(sublime_plugin.EventListener):
@@ -928,42 +1196,26 @@ class CTagsAutoComplete(sublime_plugin.EventListener):
 
             sub_results = [v.extract_completions(prefix)
                            for v in sublime.active_window().views()]
-            sub_results = [(item, item) for sublist in sub_results
-                           for item in sublist]  # flatten
-
-            if GetAllCTagsList.ctags_list:
-                results = [sublist for sublist in GetAllCTagsList.ctags_list
-                           if sublist[0].lower().startswith(prefix)]
-                results = sorted(set(results).union(set(sub_results)))
-
-                return results
-            else:
-                tags = []
-
-                # check if a project is open and the tags file exists
-                if not (view.window().folders() and os.path.exists(tags_path)):
-                    return tags
-
-                if sublime.platform() == "windows":
-                    prefix = ""
+            results = set((item, item) for sublist in sub_results
+                          for item in sublist)  # flatten
+
+            building = (RebuildTags.build_ctags.func.running or
+                        tag_update_queue.running or
+                        build_symbol_index.func.running)
+
+            # check if a project is open and the tags file exists
+            if (view.window().folders() and os.path.exists(tags_path) and
+                    not building):
+                # rebuild the index if the tags file has changed since it was
+                # built. Don't wait for it - use the open views in the meantime
+                if ctags.symbol_index_is_stale(tags_path):
+                    build_symbol_index(tags_path)
                 else:
-                    prefix = "\\"
-
-                f = os.popen("awk \"{ print "+prefix+"$1 }\" \"" + tags_path + "\"")
-
-                for i in f.readlines():
-                    tags.append([i.strip()])
-
-                tags = [(item, item) for sublist in tags
-                        for item in sublist]  # flatten
-                tags = sorted(set(tags))  # make unique
-                GetAllCTagsList.ctags_list = tags
-                results = [sublist for sublist in GetAllCTagsList.ctags_list
-                           if sublist[0].lower().startswith(prefix)]
-                results = list(set(results).union(set(sub_results)))
-                results.sort()
+                    symbols = ctags.search_symbol_index(
+                        tags_path, prefix, setting('autocomplete_limit'))
+                    results.update((item, item) for item in symbols)
 
-                return results
+            return sorted(results)
 
 
 """Test CTags commands"""
@@ -4,10 +4,23 @@
 
 import os
 import sys
+import bisect
 import tempfile
+import shutil
+import time
 import codecs
+import hashlib
+import subprocess
 from subprocess import CalledProcessError
 
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# the benchmarks take a while and only print timings, so are opt-in
+BENCHMARK = os.environ.get('CTAGS_BENCHMARK')
+
 if sys.version_info < (2, 7):
     import unittest2 as unittest
 else:
@@ -262,6 +275,221 @@ class CTagsTest(unittest.TestCase):
                 os.remove(path)  # clean up
                 os.remove(tag_file)
 
+    """resort_ctags"""
+
+    def test_resort_ctags__search_by_suffix(self):
+        """Test searching the resorted tag file by file suffix"""
+        with tempfile.NamedTemporaryFile(delete=False) as temp:
+            try:
+                tag_file = temp.name  # store name for later use
+                temp.writelines([
+                    b'bar\tb.py\t/^def bar():$/;"\tf\n',
+                    b'baz\tc.java\t/^void baz() {$/;"\tm\n',
+                    b'foo\t.\\a.py\t/^def foo():$/;"\tf\n'])
+            finally:
+                temp.close()
+
+        try:
+            ctags.resort_ctags(tag_file)
+
+            with ctags.TagFile(tag_file + '_sorted_by_file',
+                               ctags.FILENAME) as tagfile:
+                result = tagfile.get_tags_dict_by_suffix('.py')
+
+            self.assertEqual(sorted(result), ['bar', 'foo'])
+            self.assertEqual(result['foo'][0]['filename'], 'a.py')
+        finally:
+            os.remove(tag_file)  # clean up
+            os.remove(tag_file + '_sorted_by_file')
+            os.remove(tag_file + '_sorted_by_file_reversed')
+
+    @unittest.skipUnless(BENCHMARK, 'set CTAGS_BENCHMARK=1 to run')
+    @unittest.skipIf(resource is None, 'resource module not available')
+    def test_resort_ctags__benchmark(self):
+        """Benchmark peak memory and time of in-memory and external sorts"""
+        with tempfile.NamedTemporaryFile(delete=False) as temp:
+            try:
+                tag_file = temp.name  # store name for later use
+                temp.writelines(
+                    'symbol_{0:06d}\tdir_{1}/file_{2}.py\t/^def symbol_{0:06d}'
+                    '(first, second):$/;"\tf\n'.format(
+                        i, i % 7, i % 1000).encode('utf-8')
+                    for i in range(200000))
+            finally:
+                temp.close()
+
+        # run each sort in a new process, so peak memory usage is isolated
+        script = '\n'.join([
+            'import resource, sys, time',
+            'sys.path.insert(0, {0!r})',
+            'import ctags',
+            'start = time.time()',
+            'ctags.resort_ctags({1!r}, buffer_size={2!r})',
+            'rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss',
+            'if sys.platform == "darwin":',
+            '    rss = rss // 1024',
+            'print("{{0:.3f}} {{1}}".format(time.time() - start, rss))'])
+
+        try:
+            results = {}
+
+            for name, buffer_size in (('in-memory', None),
+                                      ('external', 1024 * 1024)):
+                output = subprocess.check_output([
+                    sys.executable, '-c', script.format(
+                        os.path.dirname(os.path.abspath(ctags.__file__)),
+                        tag_file, buffer_size)])
+                elapsed, rss = output.decode('utf-8').split()
+
+                # only keep a hash, so this process stays small when forked
+                with open(tag_file + '_sorted_by_file', 'rb') as output:
+                    md5 = hashlib.md5()
+                    for chunk in iter(lambda: output.read(65536), b''):
+                        md5.update(chunk)
+                    results[name] = md5.hexdigest()
+
+                print('\n{0} sort: {1}s, peak RSS {2} KB'.format(
+                    name, elapsed, rss))
+
+            self.assertEqual(results['in-memory'], results['external'])
+        finally:
+            os.remove(tag_file)  # clean up
+            os.remove(tag_file + '_sorted_by_file')
+            os.remove(tag_file + '_sorted_by_file_reversed')
+
+    """TagFile class"""
+
+    @unittest.skipUnless(BENCHMARK, 'set CTAGS_BENCHMARK=1 to run')
+    def test_tag_file__search_benchmark(self):
+        """Benchmark exact lookups on a large, synthetic tag file
+
+        The baseline is a binary search that decodes each probed line into a
+        ``Tag``, as searches did before comparing on the raw sort column.
+        """
+        class TagProbes(object):
+            def __init__(self, tagfile):
+                self.tagfile = tagfile
+
+            def __len__(self):
+                return len(self.tagfile)
+
+            def __getitem__(self, index):
+                return ctags.Tag(self.tagfile.line(index), ctags.SYMBOL)
+
+        symbols = ['symbol_{0:06d}'.format(i) for i in range(100000)]
+
+        with tempfile.NamedTemporaryFile(delete=False) as temp:
+            try:
+                tag_file = temp.name  # store name for later use
+                temp.writelines(
+                    '{0}\tfile_{1}.py\t/^def {0}():$/;"\tf\n'.format(
+                        symbol, i % 100).encode('utf-8')
+                    for i, symbol in enumerate(symbols))
+            finally:
+                temp.close()
+
+        lookups = symbols[::50]
+
+        try:
+            with ctags.TagFile(tag_file, ctags.SYMBOL) as tagfile:
+                start = time.time()
+
+                for symbol in lookups:
+                    result = list(tagfile.search(True, symbol))
+                    self.assertEqual(len(result), 1)
+                    self.assertEqual(result[0][ctags.SYMBOL], symbol)
+
+                elapsed = max(time.time() - start, 1e-6)
+
+                probes = TagProbes(tagfile)
+                start = time.time()
+
+                for symbol in lookups:
+                    index = bisect.bisect_left(probes, symbol)
+                    self.assertEqual(tagfile.line(index).split(b'\t')[0],
+                                     symbol.encode('utf-8'))
+
+                baseline = max(time.time() - start, 1e-6)
+        finally:
+            os.remove(tag_file)  # clean up
+
+        print('\n{0} lookups in {1:.3f}s ({2:.0f} lookups per second), '
+              '{3:.1f}x the baseline of {4:.0f} lookups per second'.format(
+                  len(lookups), elapsed, len(lookups) / elapsed,
+                  baseline / elapsed, len(lookups) / baseline))
+
+    """build_symbol_index"""
+
+    def test_build_symbol_index__prefix_search(self):
+        """Test case-insensitive prefix search of the symbol index"""
+        with tempfile.NamedTemporaryFile(delete=False) as temp:
+            try:
+                tag_file = temp.name  # store name for later use
+                temp.writelines([
+                    b'!_TAG_FILE_SORTED\t1\t/0=unsorted, 1=sorted/\n',
+                    b'MyClass\ta.py\t/^class MyClass(object):$/;"\tc\n',
+                    b'my_function\ta.py\t/^def my_function():$/;"\tf\n',
+                    b'my_function\tb.py\t/^def my_function():$/;"\tf\n',
+                    b'other\ta.py\t/^def other():$/;"\tf\n'])
+            finally:
+                temp.close()
+
+        try:
+            ctags.build_symbol_index(tag_file)
+
+            self.assertFalse(ctags.symbol_index_is_stale(tag_file))
+            self.assertEqual(
+                ctags.search_symbol_index(tag_file, 'MY'),
+                ['my_function', 'MyClass'])
+            self.assertEqual(
+                ctags.search_symbol_index(tag_file, 'myc', limit=1),
+                ['MyClass'])
+            self.assertEqual(
+                ctags.search_symbol_index(tag_file, 'z'), [])
+        finally:
+            os.remove(tag_file)  # clean up
+            os.remove(tag_file + '_symbols')
+
+    """update_ctags"""
+
+    def test_update_ctags__modified_file(self):
+        """Test updating the tags of a modified file in a tag file"""
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, 'a.py')
+        other_path = os.path.join(tmp_dir, 'b.py')
+
+        with open(path, 'w') as fh:
+            fh.write('def my_definition():\n\tpass\n')
+        with open(other_path, 'w') as fh:
+            fh.write('def other_definition():\n\tpass\n')
+
+        try:
+            tag_file = ctags.build_ctags(path=tmp_dir, recursive=True)
+
+            with open(path, 'w') as fh:
+                fh.write('def new_definition():\n\tpass\n')
+            os.utime(path, (0, 0))  # guarantee a change in mtime
+
+            self.assertEqual(ctags.get_stale_files(tag_file), [path])
+
+            ctags.update_ctags([path], tag_file)
+
+            self.assertEqual(ctags.get_stale_files(tag_file), [])
+
+            with ctags.TagFile(tag_file, ctags.SYMBOL) as tagfile:
+                result = tagfile.get_tags_dict()
+
+            self.assertEqual(sorted(result),
+                             ['new_definition', 'other_definition'])
+
+            with ctags.TagFile(tag_file + '_sorted_by_file',
+                               ctags.FILENAME) as tagfile:
+                result = tagfile.get_tags_dict('a.py')
+
+            self.assertEqual(list(result), ['new_definition'])
+        finally:
+            shutil.rmtree(tmp_dir)  # clean up
+
     """post_process_tag"""
 
     def test_post_process_tag__line_numbers(self):
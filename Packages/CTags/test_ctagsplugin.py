@@ -6,6 +6,7 @@ import os
 import sys
 import tempfile
 import shutil
+import threading
 
 if sys.version_info < (2, 7):
     import unittest2 as unittest
@@ -232,6 +233,66 @@ class CTagsPluginTest(unittest.TestCase):
         #self.assertEquals([relative_path], result)
         self.assertIn(result[0], relative_paths)
 
+    """search_tag_files"""
+
+    def test_search_tag_files__first_matching_tag_file_takes_precedence(self):
+        tmp_dir = self.make_tmp_directory()
+        tag_files = []
+
+        for name, lines in [
+                ('empty', [b'other\tother.py\t/^def other():$/;"\tf\n']),
+                ('first', [b'foo\tfirst.py\t/^def foo():$/;"\tf\n']),
+                ('second', [b'foo\tsecond.py\t/^def foo():$/;"\tf\n'])]:
+            path = os.path.join(tmp_dir, name)
+            with open(path, 'wb') as tag_file:
+                tag_file.write(b'!_TAG_FILE_SORTED\t1\t/0=unsorted/\n')
+                tag_file.writelines(lines)
+            tag_files.append(path)
+
+        try:
+            tags = ctagsplugin.search_tag_files(tag_files, 'foo', [])
+            self.assertEqual(['first.py'],
+                             [tag['filename'] for tag in tags['foo']])
+
+            tags = ctagsplugin.search_tag_files(tag_files, 'bar', [])
+            self.assertEqual({}, tags)
+        finally:
+            ctagsplugin.tag_file_cache.clear()
+            shutil.rmtree(tmp_dir)
+
+    """TagUpdateQueue"""
+
+    def test_tag_update_queue__files_saved_during_update_are_updated(self):
+        started = threading.Event()
+        release = threading.Event()
+        finished = threading.Event()
+        updates = []
+
+        def update_tags(paths, tag_file, command, opts):
+            updates.append((sorted(paths), tag_file))
+            started.set()
+            release.wait(5)
+            if len(updates) == 2:
+                finished.set()
+
+        update_queue = ctagsplugin.TagUpdateQueue()
+        original = ctagsplugin.update_tags
+        ctagsplugin.update_tags = update_tags
+
+        try:
+            update_queue.add('a.py', 'tags', 'ctags', [])
+            started.wait(5)
+            update_queue.add('b.py', 'tags', 'ctags', [])
+            update_queue.add('c.py', 'tags', 'ctags', [])
+            self.assertTrue(update_queue.running)
+            release.set()
+            finished.wait(5)
+        finally:
+            ctagsplugin.update_tags = original
+
+        self.assertEqual([(['a.py'], 'tags'), (['b.py', 'c.py'], 'tags')],
+                         updates)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,6 +2,7 @@ import sublime
 from sublime import *
 from sublime_plugin import *
 import difflib
+import os
 
 
 def diff_view_with_disk(view):
@@ -10,6 +11,162 @@ def diff_view_with_disk(view):
   return diff(old_s, new_s)
 
 
+# view id -> EditLog of the edits made since the file was loaded or saved
+_logs = {}
+
+def track_view(view):
+  "Start a new edit log for a view whose contents match the file on disk."
+  _logs[view.id()] = EditLog(view_text(view), disk_mtime(view))
+
+def view_saved(view):
+  # only views that have asked for completions are logged, since the log
+  # copies the text of the view on every edit
+  if view.id() in _logs:
+    track_view(view)
+
+def forget_view(view):
+  _logs.pop(view.id(), None)
+
+def view_modified(view):
+  log = _logs.get(view.id())
+  if log is None:
+    return
+  if not view.is_dirty():
+    # reverted or reloaded from disk
+    track_view(view)
+  else:
+    log.update(view_text(view))
+
+def view_edits(view):
+  """Returns operations that transform the file on disk into the contents
+  of the view, from the edit log of the view. If there is no log, or the
+  file changed on disk since, falls back to diffing the view with the file
+  and starts a new log from the result."""
+  if view.line_endings() == "Windows":
+    # the offsets of the log don't count the \r of the file
+    return diff_view_with_disk(view)
+  log = _logs.get(view.id())
+  if log is not None and log.mtime == disk_mtime(view):
+    return log.operations()
+  mtime = disk_mtime(view)
+  ops = diff_view_with_disk(view)
+  log = EditLog(view_text(view), mtime)
+  log.seed(ops)
+  _logs[view.id()] = log
+  return ops
+
+def view_text(view):
+  return view.substr(Region(0, view.size()))
+
+def disk_mtime(view):
+  try:
+    return os.path.getmtime(view.file_name())
+  except (OSError, TypeError):
+    return None
+
+
+class EditLog(object):
+  """The parts of a text that changed since it matched the file on disk.
+  Each region is [base_start, base_end, start, end], where base_start and
+  base_end are offsets in the file and start and end are offsets in the
+  current text. The regions are disjoint and sorted, and everything outside
+  of them is unchanged, so the operations for patch_source are built
+  without looking at the rest of the text."""
+
+  def __init__(self, text, mtime = None):
+    self.text = text
+    self.mtime = mtime
+    self.regions = []
+
+  def update(self, text):
+    "Record the edit that turned the previous text into `text`."
+    limit = min(len(self.text), len(text))
+    prefix = common_prefix_length(self.text, text, limit)
+    if prefix == len(self.text) == len(text):
+      return
+    suffix = common_suffix_length(self.text, text, limit - prefix)
+    self.record(prefix, len(self.text) - suffix, len(text) - suffix)
+    self.text = text
+
+  def record(self, start, old_end, new_end):
+    "Record that text[start:old_end] was replaced by text now at [start:new_end]."
+    delta = new_end - old_end
+    before = []
+    merged = []
+    after = []
+    shift = 0
+    for region in self.regions:
+      if region[3] < start:
+        before.append(region)
+        shift += (region[3] - region[2]) - (region[1] - region[0])
+      elif region[2] > old_end:
+        after.append([region[0], region[1], region[2] + delta, region[3] + delta])
+      else:
+        merged.append(region)
+
+    base_start = start - shift
+    end = old_end
+    for region in merged:
+      shift += (region[3] - region[2]) - (region[1] - region[0])
+    base_end = old_end - shift
+    if merged:
+      if merged[0][2] <= start:
+        base_start, start = merged[0][0], merged[0][2]
+      if merged[-1][3] >= old_end:
+        base_end, end = merged[-1][1], merged[-1][3]
+    self.regions = before + [[base_start, base_end, start, end + delta]] + after
+
+  def seed(self, ops):
+    "Start from the operations that turn the file on disk into the text."
+    shift = 0
+    for op in ops:
+      if op[0] == '+':
+        base_start, base_end, length = op[1], op[1], len(op[2])
+      elif op[0] == '-':
+        base_start, base_end, length = op[1], op[2], 0
+      else:
+        base_start, base_end, length = op[1], op[2], len(op[3])
+      start = base_start + shift
+      self.regions.append([base_start, base_end, start, start + length])
+      shift += length - (base_end - base_start)
+
+  def operations(self):
+    ops = []
+    for base_start, base_end, start, end in self.regions:
+      if start == end:
+        if base_start != base_end:
+          ops.append(['-', base_start, base_end])
+      elif base_start == base_end:
+        ops.append(['+', base_start, self.text[start:end]])
+      else:
+        ops.append(['*', base_start, base_end, self.text[start:end]])
+    return ops
+
+
+def common_prefix_length(a, b, limit):
+  # compares halves of the remaining range at a time, so the comparisons
+  # run over slices instead of single characters
+  lo, hi = 0, limit
+  while lo < hi:
+    mid = (lo + hi + 1) // 2
+    if a[lo:mid] == b[lo:mid]:
+      lo = mid
+    else:
+      hi = mid - 1
+  return lo
+
+def common_suffix_length(a, b, limit):
+  lo, hi = 0, limit
+  len_a, len_b = len(a), len(b)
+  while lo < hi:
+    mid = (lo + hi + 1) // 2
+    if a[len_a - mid:len_a - lo] == b[len_b - mid:len_b - lo]:
+      lo = mid
+    else:
+      hi = mid - 1
+  return lo
+
+
 def diff(old_s, new_s):
   """Returns operations necessary to transform old_s into new_s.
   Note: We optimize for the (hypothetically)common case where edits will
@@ -106,6 +263,12 @@ def net_length_change(ops):
 def _check(old, new):
   assert apply_operations(old, diff(old, new)) == new
 
+def _check_log(old, *texts):
+  log = EditLog(old)
+  for text in texts:
+    log.update(text)
+  assert apply_operations(old, log.operations()) == texts[-1]
+
 if __name__ == "__main__":
   _check("abc", "abc")
   _check("abc", "qbc")
@@ -120,4 +283,7 @@ if __name__ == "__main__":
   _check("abcdef", "abcdefabcabcdef")
   _check("abcdef", "abc")
   _check("abcde", "abcabcde")
-
+  _check_log("abc", "abcd", "abcde")
+  _check_log("abcdef", "qabcdef", "qabcdefq", "qabdefq")
+  _check_log("abcdef", "abef", "abcdef")
+  _check_log("abc\n   def", "abc\n   ", "")
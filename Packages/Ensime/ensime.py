@@ -3,7 +3,7 @@ from sublime import *
 from sublime_plugin import *
 import os, threading, thread, socket, getpass, signal, glob
 import subprocess, tempfile, datetime, time, json, zipfile
-import functools, inspect, traceback, random, re, sys
+import functools, inspect, traceback, random, re, sys, codecs
 from functools import partial as bind
 from string import strip
 from types import *
@@ -63,9 +63,21 @@ class EnsimeCommon(object):
     sublime.set_timeout(bind(self.log_on_ui_thread, "server", data), 0)
 
   def log_on_ui_thread(self, flavor, data):
-    if flavor in self.env.settings.get("log_to_console", {}):
+    # data can be a function of the maximum length that builds the message,
+    # so that big messages are only formatted if they are going to be logged
+    # and then only up to the maximum length
+    to_console = flavor in self.env.settings.get("log_to_console", {})
+    to_file = flavor in self.env.settings.get("log_to_file", {})
+    if not to_console and not to_file:
+      return
+    max_length = self.env.settings.get("log_max_message_length", 65536)
+    if callable(data):
+      data = data(max_length)
+    else:
+      data = truncate_message("", data, max_length)
+    if to_console:
       print data.strip()
-    if flavor in self.env.settings.get("log_to_file", {}):
+    if to_file:
       try:
         if not os.path.exists(self.env.log_root):
           os.mkdir(self.env.log_root)
@@ -364,6 +376,7 @@ class ClientSocket(EnsimeCommon):
     self._lock = threading.RLock()
     self._connect_lock = threading.RLock()
     self._receiver = None
+    self._recv_buf = bytearray(65536)
     self.socket = None
 
   def notify_async_data(self, data):
@@ -374,30 +387,17 @@ class ClientSocket(EnsimeCommon):
   def receive_loop(self):
     while self.connected:
       try:
-        msglen = self.socket.recv(6)
-        if msglen:
-          msglen = int(msglen, 16)
-          # self.log_client("RECV: incoming message of " + str(msglen) + " bytes")
-
-          buf = ""
-          while len(buf) < msglen:
-            chunk = self.socket.recv(msglen - len(buf))
-            if chunk:
-              # self.log_client("RECV: received a chunk of " + str(len(chunk)) + " bytes")
-              buf += chunk
-            else:
-              raise Exception("fatal error: recv returned None")
-          self.log_client("RECV: " + buf)
-
-          try:
-            s = buf.decode('utf-8')
-            form = sexp.read(s)
-            self.notify_async_data(form)
-          except:
-            self.log_client("failed to parse incoming message")
-            raise
-        else:
-          raise Exception("fatal error: recv returned None")
+        msglen = int(self.received_text(self.recv_exactly(6)), 16)
+        # self.log_client("RECV: incoming message of " + str(msglen) + " bytes")
+        size = self.recv_exactly(msglen)
+        try:
+          s = self.received_text(size)
+          self.log_client(bind(truncate_message, "RECV: ", s))
+          form = sexp.read(s)
+          self.notify_async_data(form)
+        except:
+          self.log_client("failed to parse incoming message")
+          raise
       except Exception:
         self.log_client("*****    ERROR     *****")
         self.log_client(traceback.format_exc())
@@ -407,6 +407,42 @@ class ClientSocket(EnsimeCommon):
         if self.env.session_id == self.session_id:
           self.env.controller.shutdown()
 
+  def received_text(self, size):
+    """Decode the first size bytes of the receive buffer from UTF-8,
+    straight out of the buffer rather than from a copy of them."""
+    try:
+      data = memoryview(self._recv_buf)[:size]
+    except NameError:
+      # Python 2.6 has no memoryview
+      data = buffer(self._recv_buf, 0, size)
+    return codecs.utf_8_decode(data, None, True)[0]
+
+  def recv_exactly(self, size):
+    """Receive exactly size bytes into the start of the receive buffer,
+    which is reused for every message and only grows when a bigger message
+    arrives. Returns the number of bytes received."""
+    if size > len(self._recv_buf):
+      self._recv_buf = bytearray(max(size, 2 * len(self._recv_buf)))
+    buf = self._recv_buf
+    received = 0
+    try:
+      view = memoryview(buf)
+    except NameError:
+      # Python 2.6 has no memoryview, so chunks are copied in
+      view = None
+    while received < size:
+      if view is not None:
+        count = self.socket.recv_into(view[received:size], size - received)
+      else:
+        chunk = self.socket.recv(size - received)
+        count = len(chunk)
+        buf[received:received + count] = chunk
+      if not count:
+        raise Exception("fatal error: recv returned None")
+      # self.log_client("RECV: received a chunk of " + str(count) + " bytes")
+      received += count
+    return size
+
   def start_receiving(self):
     t = threading.Thread(name = "ensime-client-" + str(self.w.id()) + "-" + str(self.port), target = self.receive_loop)
     t.setDaemon(True)
@@ -449,12 +485,42 @@ class ClientSocket(EnsimeCommon):
       self.connected = False
       self._connect_lock.release()
 
+class LatencyHistogram(object):
+  # upper bounds of the buckets, in seconds
+  bounds = [0.01, 0.03, 0.1, 0.3, 1, 3, 10]
+
+  def __init__(self, method):
+    self.method = method
+    self.counts = [0] * (len(self.bounds) + 1)
+    self.total = 0
+    self.max = 0
+
+  def add(self, elapsed):
+    i = 0
+    while i < len(self.bounds) and elapsed >= self.bounds[i]:
+      i += 1
+    self.counts[i] += 1
+    self.total += elapsed
+    self.max = max(self.max, elapsed)
+
+  def __str__(self):
+    count = sum(self.counts)
+    buckets = []
+    for i, bound in enumerate(self.bounds + [None]):
+      if self.counts[i]:
+        label = ("<" + str(int(bound * 1000)) + "ms") if bound else (">=" + str(self.bounds[-1]) + "s")
+        buckets.append(label + ": " + str(self.counts[i]))
+    return (self.method + ": " + str(count) + " requests, avg " +
+            ("%.3f" % (self.total / count)) + "s, max " + ("%.3f" % self.max) + "s (" +
+            ", ".join(buckets) + ")")
+
 class Client(ClientListener, EnsimeCommon):
   def __init__(self, owner, port_file, timeout):
     super(Client, self).__init__(owner)
     with open(port_file) as f: self.port = int(f.read())
     self.timeout = timeout
     self.init_counters()
+    self.init_pipeline()
     methods = filter(lambda m: m[0].startswith("message_"), inspect.getmembers(self, predicate=inspect.ismethod))
     self.log_client("reflectively found " + str(len(methods)) + " message handlers: " + str(methods))
     self.handlers = dict((":" + m[0][len("message_"):].replace("_", "-"), (m[1], None, None)) for m in methods)
@@ -469,32 +535,57 @@ class Client(ClientListener, EnsimeCommon):
     if self.socket.connected: self.rpc.shutdown_server()
     self.socket.close()
     self.socket = None
-
-  def async_req(self, to_send, on_complete = None, call_back_into_ui_thread = None):
+    self.log_latencies()
+
+  def init_pipeline(self):
+    self._pipeline_lock = threading.RLock()
+    # msg_id -> (method, dedupe key, supersede key) of requests in flight
+    self.requests = {}
+    # msg_id -> handlers of identical requests that joined the one in flight
+    self.waiters = {}
+    # dedupe key -> msg_id
+    self.inflight = {}
+    # supersede key -> msg_id
+    self.superseding = {}
+    # coalesced requests that haven't been sent yet, oldest first
+    self.pending_keys = []
+    self.pending = {}
+    self.latencies = {}
+    self.replies = 0
+
+  def async_req(self, to_send, on_complete = None, call_back_into_ui_thread = None,
+                dedupe = False, supersede = False, coalesce = False):
+    """Send a request, calling on_complete with the reply.
+    If `dedupe` is set, a request identical to one in flight isn't sent, it
+    gets the reply of that one. If `supersede` is set, the requests in flight
+    with the same method and first argument are cancelled. If `coalesce` is
+    set, the request is sent a bit later, and only the last one with the same
+    method and first argument is sent."""
     if on_complete is not None and call_back_into_ui_thread is None:
       raise Exception("must specify a threading policy when providing a non-empty callback")
     if not self.socket:
       raise Exception("socket is either not yet initialized or is already destroyed")
 
-    msg_id = self.next_message_id()
-    self.handlers[msg_id] = (on_complete, call_back_into_ui_thread, time.time())
-    msg_str = sexp.to_string([key(":swank-rpc"), to_send, msg_id])
-    msg_str = "%06x" % len(msg_str) + msg_str
+    if coalesce:
+      req_key = (str(to_send[0]), to_send[1])
+      self._pipeline_lock.acquire()
+      try:
+        if req_key not in self.pending:
+          self.pending_keys.append(req_key)
+          if len(self.pending_keys) == 1:
+            sublime.set_timeout(self.flush_pending, 0)
+        self.pending[req_key] = (to_send, on_complete, call_back_into_ui_thread)
+      finally:
+        self._pipeline_lock.release()
+      return
 
-    self.feedback(msg_str)
-    self.log_client("SEND ASYNC REQ: " + msg_str)
-    self.socket.send(encode_if_unicode(msg_str))
+    self.flush_pending()
+    self._send_req("ASYNC", to_send, on_complete, call_back_into_ui_thread, dedupe, supersede)
 
-  def sync_req(self, to_send, timeout=0):
-    msg_id = self.next_message_id()
+  def sync_req(self, to_send, timeout=0, dedupe = False, supersede = False):
+    self.flush_pending()
     event = threading.Event()
-    self.handlers[msg_id] = (event, None, time.time())
-    msg_str = sexp.to_string([key(":swank-rpc"), to_send, msg_id])
-    msg_str = "%06x" % len(msg_str) + msg_str
-
-    self.feedback(msg_str)
-    self.log_client("SEND SYNC REQ: " + msg_str)
-    self.socket.send(msg_str)
+    msg_id = self._send_req("SYNC", to_send, event, None, dedupe, supersede)
 
     max_wait = timeout or self.timeout
     event.wait(max_wait)
@@ -506,6 +597,81 @@ class Client(ClientListener, EnsimeCommon):
                       str(max_wait) + " seconds)")
       return None
 
+  def flush_pending(self):
+    self._pipeline_lock.acquire()
+    try:
+      pending = [self.pending[req_key] for req_key in self.pending_keys]
+      self.pending_keys = []
+      self.pending = {}
+    finally:
+      self._pipeline_lock.release()
+    for to_send, on_complete, call_back_into_ui_thread in pending:
+      if self.socket:
+        self._send_req("ASYNC", to_send, on_complete, call_back_into_ui_thread)
+
+  def _send_req(self, flavor, to_send, handler, call_back_into_ui_thread, dedupe = False, supersede = False):
+    method = str(to_send[0])
+    dedupe_key = sexp.to_string(to_send) if dedupe else None
+    supersede_key = (method, to_send[1]) if supersede else None
+    self._pipeline_lock.acquire()
+    try:
+      if dedupe_key in self.inflight:
+        msg_id = self.inflight[dedupe_key]
+        self.waiters.setdefault(msg_id, []).append((handler, call_back_into_ui_thread))
+        self.log_client("SEND " + flavor + " REQ: joined request #" + str(msg_id))
+        return msg_id
+      msg_id = self.next_message_id()
+      self.handlers[msg_id] = (handler, call_back_into_ui_thread, time.time())
+      self.requests[msg_id] = (method, dedupe_key, supersede_key)
+      if dedupe_key:
+        self.inflight[dedupe_key] = msg_id
+      if supersede_key:
+        superseded = self.superseding.get(supersede_key)
+        if superseded is not None:
+          self.cancel_req(superseded)
+        self.superseding[supersede_key] = msg_id
+    finally:
+      self._pipeline_lock.release()
+
+    msg_str = sexp.to_string([key(":swank-rpc"), to_send, msg_id])
+    msg_str = "%06x" % len(msg_str) + msg_str
+
+    self.feedback(msg_str)
+    self.log_client("SEND " + flavor + " REQ: " + msg_str)
+    self.socket.send(encode_if_unicode(msg_str))
+    return msg_id
+
+  def _finish_req(self, msg_id):
+    """Forget a request, returning its handlers as a list of
+    (handler, call_back_into_ui_thread) and its method and start time."""
+    self._pipeline_lock.acquire()
+    try:
+      handler, call_back_into_ui_thread, req_time = self.handlers.pop(msg_id, (None, None, None))
+      method, dedupe_key, supersede_key = self.requests.pop(msg_id, (None, None, None))
+      if self.inflight.get(dedupe_key) == msg_id:
+        del self.inflight[dedupe_key]
+      if self.superseding.get(supersede_key) == msg_id:
+        del self.superseding[supersede_key]
+      handlers = [(handler, call_back_into_ui_thread)] if handler else []
+      handlers += self.waiters.pop(msg_id, [])
+      return handlers, method, req_time
+    finally:
+      self._pipeline_lock.release()
+
+  def cancel_req(self, msg_id):
+    """Stop waiting for the reply to a request, the reply is dropped when
+    it arrives. Synchronous callers get None right away."""
+    handlers, _, _ = self._finish_req(msg_id)
+    self.log_client("request #" + str(msg_id) + " has been superseded")
+    for handler, _ in handlers:
+      if not callable(handler):
+        handler.payload = None
+        handler.set()
+
+  def log_latencies(self):
+    for method in sorted(self.latencies):
+      self.log_client(str(self.latencies[method]))
+
   def on_client_async_data(self, data):
     self.log_client("SEND ASYNC RESP: " + str(data))
     self.feedback(str(data))
@@ -533,29 +699,37 @@ class Client(ClientListener, EnsimeCommon):
       self.log_client("unexpected message type: " + msg_type)
 
   def message_return(self, msg_id, payload):
-    handler, call_back_into_ui_thread, req_time = self.handlers.get(msg_id)
-    if handler: del self.handlers[msg_id]
+    handlers, method, req_time = self._finish_req(msg_id)
     def invoke_subscribed_handler(success, payload = None):
-      if callable(handler):
-        # only do async callbacks if the result is a success
-        # however note that we need to ping sync callbacks in any case
-        # in order to prevent freezes upon erroneous responses
-        if call_back_into_ui_thread and success:
-          sublime.set_timeout(bind(handler, payload), 0)
+      for handler, call_back_into_ui_thread in handlers:
+        if callable(handler):
+          # only do async callbacks if the result is a success
+          # however note that we need to ping sync callbacks in any case
+          # in order to prevent freezes upon erroneous responses
+          if call_back_into_ui_thread and success:
+            sublime.set_timeout(bind(handler, payload), 0)
+          else:
+            handler(payload)
         else:
-          handler(payload)
-      else:
-        handler.payload = payload
-        handler.set()
+          handler.payload = payload
+          handler.set()
+
+    if req_time is None:
+      self.log_client("dropping the reply to request #" + str(msg_id) + ", it has been superseded")
+      return
 
     resp_time = time.time()
-    self.log_client("request #" + str(msg_id) + " took " + str(resp_time - req_time) + " seconds")
+    self.log_client("request #" + str(msg_id) + " (" + method + ") took " + str(resp_time - req_time) + " seconds")
+    self.latencies.setdefault(method, LatencyHistogram(method)).add(resp_time - req_time)
+    self.replies += 1
+    if self.replies % 100 == 0:
+      self.log_latencies()
 
     reply_type = str(payload[0])
     # (:return (:ok (:project-name nil :source-roots ("D:\\Dropbox\\Scratchpad\\Scala"))) 2)
     if reply_type == ":ok":
       payload = payload[1]
-      if handler:
+      if handlers:
         invoke_subscribed_handler(success = True, payload = payload)
       else:
         self.log_client("warning: no handler registered for message #" + str(msg_id) + " with payload " + str(payload))
@@ -913,8 +1087,12 @@ class Daemon(EnsimeEventListener):
     if self.is_running() and self.in_project():
       self.rpc.typecheck_file(self.v.file_name())
 
+  def on_close(self):
+    diff.forget_view(self.v)
+
   def on_post_save(self):
     # print "on_post_save"
+    diff.view_saved(self.v)
     if self.is_running() and self.in_project():
       self.rpc.typecheck_file(self.v.file_name())
     if same_paths(self.v.file_name(), self.env.session_file):
@@ -934,6 +1112,8 @@ class Daemon(EnsimeEventListener):
 
   def on_modified(self):
     # print "on_modified"
+    if self.in_project():
+      diff.view_modified(self.v)
     rs = self.v.get_regions(ENSIME_BREAKPOINT_REGION)
     if rs:
       irrelevant_breakpoints = filter(
@@ -1008,11 +1188,8 @@ class Colorer(EnsimeCommon):
     elif self.env and self.env.settings.get("ensime_statusbar_showerrors"):
       if self.v.sel():
         relevant_notes = self.env._notes.for_file(self.v.file_name())
-        bol = self.v.line(self.v.sel()[0].begin()).begin()
-        eol = self.v.line(self.v.sel()[0].begin()).end()
-        msgs = [note.message for note in relevant_notes
-                if (bol <= note.start and note.start <= eol) or
-                (bol <= note.end and note.end <= eol)]
+        line = self.v.line(self.v.sel()[0].begin())
+        msgs = [note.message for note in relevant_notes.overlapping(line.begin(), line.end())]
         self._update_statusbar("; ".join(msgs))
     else:
       self._update_statusbar(None)
@@ -1168,7 +1345,7 @@ class Completer(EnsimeEventListener):
     else:
       self.env.completion_ignore_prefix = None
     if self.v.is_dirty():
-      edits = diff.diff_view_with_disk(self.v)
+      edits = diff.view_edits(self.v)
       self.rpc.patch_source(self.v.file_name(), edits)
     completions = self.rpc.completions(self.v.file_name(), locations[0], 0, False, False)
     if not completions:
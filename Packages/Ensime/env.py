@@ -4,6 +4,8 @@ from uuid import uuid4
 import dotensime, dotsession
 from paths import *
 
+from bisect import bisect_right
+
 envLock = threading.RLock()
 ensime_envs = {}
 
@@ -90,34 +92,31 @@ class EnsimeEnvironment(object):
     # TODO: find a better place for this beast
     class NoteStorage(object):
       def __init__(self):
-        self.data = []
         self.normalized_cache = {}
         self.per_file_cache = {}
+      def _normalize(self, file_name):
+        if not file_name in self.normalized_cache:
+          self.normalized_cache[file_name] = normalize_path(file_name)
+        return self.normalized_cache[file_name]
       def append(self, data):
-        self.data += data
+        per_file = {}
         for datum in data:
-          if not datum.file_name in self.normalized_cache:
-            self.normalized_cache[datum.file_name] = normalize_path(datum.file_name)
-          file_name = self.normalized_cache[datum.file_name]
-          if not file_name in self.per_file_cache:
-            self.per_file_cache[file_name] = []
-          self.per_file_cache[file_name].append(datum)
+          per_file.setdefault(self._normalize(datum.file_name), []).append(datum)
+        for file_name, notes in per_file.items():
+          self.for_file(file_name).add(notes)
       def filter(self, pred):
-        dropouts = set(map(lambda n: self.normalized_cache[n.file_name], filter(lambda n: not pred(n), self.data)))
         # doesn't take into account pathological cases when a "*.scala" file
         # is actually a symlink to something without a ".scala" extension
-        for file_name in self.per_file_cache.keys():
-          if file_name in dropouts:
+        for file_name, index in self.per_file_cache.items():
+          index.retain(pred)
+          if not len(index):
             del self.per_file_cache[file_name]
-        self.data = filter(pred, self.data)
       def clear(self):
-        self.filter(lambda f: False)
+        self.per_file_cache = {}
       def for_file(self, file_name):
-        if not file_name in self.normalized_cache:
-          self.normalized_cache[file_name] = normalize_path(file_name)
-        file_name = self.normalized_cache[file_name]
+        file_name = self._normalize(file_name)
         if not file_name in self.per_file_cache:
-          self.per_file_cache[file_name] = []
+          self.per_file_cache[file_name] = NoteIndex()
         return self.per_file_cache[file_name]
 
     # core stuff (mutable)
@@ -193,3 +192,74 @@ class EnsimeEnvironment(object):
     session = dotsession.load(self) or dotsession.Session(breakpoints = [], launches = [], current_launch = None)
     session.breakpoints = self.breakpoints
     dotsession.save(self, session)
+
+class NoteIndex(object):
+  """The notes of a file, sorted by their start offset. A tree of the
+  maximum end offset over ranges of the notes finds the notes overlapping
+  a region in O(log n + k) time, where k is the number of notes found."""
+
+  def __init__(self):
+    self.notes = []
+    self.starts = []
+    self.tree = None
+
+  def __len__(self):
+    return len(self.notes)
+
+  def __iter__(self):
+    return iter(self.notes)
+
+  def add(self, notes):
+    # the list is mostly sorted already, which sort() handles in linear time
+    self.notes.extend(notes)
+    self.notes.sort(key = note_start)
+    self.starts = map(note_start, self.notes)
+    self.tree = None
+
+  def retain(self, pred):
+    notes = filter(pred, self.notes)
+    if len(notes) != len(self.notes):
+      self.notes = notes
+      self.starts = map(note_start, notes)
+      self.tree = None
+
+  def overlapping(self, begin, end):
+    "The notes that overlap the region from begin to end, in order."
+    count = bisect_right(self.starts, end)
+    if not count:
+      return []
+    if self.tree is None:
+      self.build_tree()
+    tree, size = self.tree, len(self.tree) // 2
+    result = []
+    # nodes cover the notes from lo to hi; a node is only visited if one
+    # of its notes ends at or after begin
+    stack = [(1, 0, size)]
+    while stack:
+      node, lo, hi = stack.pop()
+      if lo >= count or tree[node] < begin:
+        continue
+      if node >= size:
+        result.append(self.notes[lo])
+      else:
+        mid = (lo + hi) // 2
+        stack.append((2 * node + 1, mid, hi))
+        stack.append((2 * node, lo, mid))
+    return result
+
+  def build_tree(self):
+    size = 1
+    while size < len(self.notes):
+      size *= 2
+    tree = [-1] * (2 * size)
+    for i, note in enumerate(self.notes):
+      tree[size + i] = note_end(note)
+    for node in range(size - 1, 0, -1):
+      tree[node] = max(tree[2 * node], tree[2 * node + 1])
+    self.tree = tree
+
+def note_start(note):
+  return note.start or 0
+
+def note_end(note):
+  return max(note.end or 0, note_start(note))
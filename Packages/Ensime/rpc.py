@@ -295,7 +295,12 @@ def _mk_req(func, *args, **kwargs):
     req.extend(argreq)
   return req
 
-def async_rpc(*args):
+# Both decorators take the parser of the reply and the flags of Client.async_req:
+# `dedupe` for queries that can share the reply of an identical request in flight,
+# `supersede` for queries that make older ones for the same file pointless and
+# `coalesce` for updates where only the last one for a file matters.
+
+def async_rpc(*args, **flags):
   parser = args[0] if args else lambda raw: raw
   def wrapper(func):
     def wrapped(*args, **kwargs):
@@ -308,18 +313,18 @@ def async_rpc(*args):
       def callback(payload):
         data = parser(payload)
         if (on_complete): on_complete(data)
-      self.env.controller.client.async_req(req, callback, call_back_into_ui_thread = True)
+      self.env.controller.client.async_req(req, callback, call_back_into_ui_thread = True, **flags)
     return wrapped
   return wrapper
 
-def sync_rpc(*args):
+def sync_rpc(*args, **flags):
   parser = args[0] if args else lambda raw: raw
   def wrapper(func):
     def wrapped(*args, **kwargs):
       self = args[0]
       req = _mk_req(func, *args, **kwargs)
       timeout = self.env.settings.get("timeout_" + func.__name__)
-      raw = self.env.controller.client.sync_req(req, timeout = timeout)
+      raw = self.env.controller.client.sync_req(req, timeout = timeout, **flags)
       return parser(raw)
     return wrapped
   return wrapper
@@ -337,19 +342,19 @@ class Rpc(object):
   @async_rpc()
   def typecheck_file(self, file_name): pass
 
-  @async_rpc()
+  @async_rpc(coalesce = True)
   def patch_source(self, file_name, edits): pass
 
-  @sync_rpc(Completion.parse_list)
+  @sync_rpc(Completion.parse_list, supersede = True)
   def completions(self, file_name, position, max_results, case_sensitive, reload_from_disk): pass
 
-  @async_rpc(Type.parse)
+  @async_rpc(Type.parse, dedupe = True)
   def type_at_point(self, file_name, position): pass
 
-  @async_rpc(Symbol.parse)
+  @async_rpc(Symbol.parse, dedupe = True)
   def symbol_at_point(self, file_name, position): pass
 
-  @async_rpc(SymbolSearchResults.parse_list)
+  @async_rpc(SymbolSearchResults.parse_list, dedupe = True)
   def import_suggestions(self, file_name, position, type_names, max_results): pass
 
   @async_rpc(RefactorResult.parse)
@@ -36,7 +36,11 @@ def sym(s):
 
 def read(s):
   "Read a sexp expression from a string."
-  return read_form(s)[0]
+  reader = Reader()
+  forms = reader.feed(s, True)
+  if not forms:
+    raise SyntaxError('unexpected EOF while reading form')
+  return forms[0]
 
 def read_relaxed(s):
   """Read a sexp expression from a string.
@@ -47,156 +51,132 @@ def read_relaxed(s):
   lines = filter(lambda line: line, lines)
   lines = filter(lambda line: not line.startswith(";"), lines)
   s = '\n'.join(lines)
-  return read_form(s)[0]
-
-def read_form(str):
-  "Read a form."
-  if len(str) == 0:
-    raise SyntaxError('unexpected EOF while reading form')
-  ch = str[0]
-  if ch.isspace():
-    raise SyntaxError('unexpected whitespace while reading form')
-  elif ch == '(':
-    return read_list(str)
-  elif ch == '"':
-    return read_string(str)
-  elif ch == ':':
-    return read_keyword(str)
-  elif ch.isdigit() or ch == "-":
-    return read_int(str)
-  elif ch.isalpha():
-    return read_symbol(str)
-  elif ch == '\'':
-    return read_atom(str)
-  else:
-    raise SyntaxError('unexpected character in read_form: ' + ch)
-
-def read_list(str):
-  "Read a list from a string."
-  if len(str) == 0:
-    raise SyntaxError('unexpected EOF while reading list')
-  if str[0] != '(':
-    raise SyntaxError('expected ( as first char of list: ' + str)
-  str = str[1:]
-  lst = []
-  while(len(str) > 0):
-    ch = str[0]
-    if ch.isspace():
-      str = str[1:]
-      continue
-    elif ch == ')':
-      return (lst,str[1:])
-    else:
-      val,remain = read_form(str)
-      lst.append(val)
-      str = remain
-  raise SyntaxError('EOF while reading list')
-
-def read_string(str):
-  "Read a string."
-  if len(str) == 0:
-    raise SyntaxError('unexpected EOF while reading string')
-  if str[0] != '"':
-    raise SyntaxError('expected ( as first char of string: ' + str)
-  str = str[1:]
-  s = ""
-  escaped = False
-  while(len(str) > 0):
-    ch = str[0]
-    if ch == '"' and not escaped:
-      return (s,str[1:])
-    elif escaped:
-      escaped = False
-      s = s[:-1] # remove the escaping backslash
-    elif ch == "\\":
-      escaped = True
-    s = s + ch
-    str = str[1:]
-  raise SyntaxError('EOF while reading string')
-
-def read_atom(str):
-  "Read an atom."
-  if len(str) == 0:
-    raise SyntaxError('unexpected EOF while reading atom')
-  if str[0] != '\'':
-    raise SyntaxError('expected \' as first char of atom: ' + str)
-  str = str[1:]
-  s = ""
-  while(len(str) > 0):
-    ch = str[0]
-    if ch.isspace():
-      return (s,str[1:])
-    s = s + ch
-    str = str[1:]
-  raise SyntaxError('EOF while reading atom')
-
-
-def read_keyword(str):
-  "Read a keyword."
-  if len(str) == 0:
-    raise SyntaxError('unexpected EOF while reading keyword')
-  if str[0] != ':':
-    raise SyntaxError('expected : as first char of keyword')
-  str = str[1:]
-  s = ""
-  while(len(str) > 0):
-    ch = str[0]
-    if not (ch.isalpha() or ch.isdigit() or ch == '-'):
-      return (Keyword(":" + s),str)
-    else:
-      s = s + ch
-      str = str[1:]
-
-  if len(s) > 1:
-    return (Keyword(":" + s),str)
-  else:
-    raise SyntaxError('EOF while reading keyword')
-
-
-def read_symbol(str):
-  "Read a symbol."
-  if len(str) == 0:
-    raise SyntaxError('unexpected EOF while reading symbol')
-  if not str[0].isalpha():
-    raise SyntaxError('expected alpha char as first char of symbol')
-  s = ""
-  while(len(str) > 0):
-    ch = str[0]
-    if not (ch.isalpha() or ch.isdigit() or ch == '-' or ch == ":"):
-      if s == "t":
-        return (True,str)
-      elif s == "nil":
-        return (False,str)
+  return read(s)
+
+WHITESPACE = re.compile(r"\s+", re.UNICODE)
+ESCAPE = re.compile(r"\\(.)", re.DOTALL)
+KEYWORD = re.compile(r":(?:[^\W_]|-)*", re.UNICODE)
+INT = re.compile(r"[-0-9]+")
+SYMBOL = re.compile(r"[^\W\d_](?:[^\W_]|[-:])*", re.UNICODE)
+ATOM = re.compile(r"'(\S*)\s", re.UNICODE)
+
+class Reader:
+  """Reads sexp forms from a string that can arrive in pieces.
+  The input is scanned once with an index into the buffer, and the lists
+  being read are kept on a stack, so reading takes linear time however
+  the input is split up."""
+
+  def __init__(self):
+    self.buf = ""
+    self.stack = []
+    # how far the string at the start of buf has been searched for its end
+    self.scanned = 0
+
+  def feed(self, s, eof = False):
+    """Add a piece of input and return the list of top level forms it
+    completes. A token cut off at the end of the input is kept until the
+    next piece arrives, unless `eof` is set."""
+    buf = self.buf + s if self.buf else s
+    forms = []
+    pos = 0
+    end = len(buf)
+    while pos < end:
+      ch = buf[pos]
+      if ch.isspace():
+        pos = WHITESPACE.match(buf, pos).end()
+        continue
+      elif ch == '(':
+        self.stack.append([])
+        pos += 1
+        continue
+      elif ch == ')':
+        if not self.stack:
+          raise SyntaxError('unexpected ) while reading form')
+        val = self.stack.pop()
+        pos += 1
+      elif ch == '"':
+        close = self.find_quote(buf, pos)
+        if close < 0:
+          break
+        val = buf[pos + 1:close]
+        if "\\" in val:
+          val = ESCAPE.sub(r"\1", val)
+        pos = close + 1
+      elif ch == '\'':
+        m = ATOM.match(buf, pos)
+        if not m:
+          break
+        val = m.group(1)
+        pos = m.end()
       else:
-        return (Symbol(s),str)
-    else:
-      s = s + ch
-      str = str[1:]
-
-  if len(s) > 0:
-    return (Symbol(s),str)
-  else:
-    raise SyntaxError('EOF while reading symbol')
-
-
-def read_int(str):
-  "Read an integer."
-  if len(str) == 0:
-    raise SyntaxError('unexpected EOF while reading int')
-  s = ""
-  while(len(str) > 0):
-    ch = str[0]
-    if not (ch.isdigit() or ch == '-'):
-      return (int(s),str)
-    else:
-      s = s + ch
-      str = str[1:]
-
-  if len(s) > 0:
-    return (int(s),str)
-  else:
-    raise SyntaxError('EOF while reading int')
-
+        if ch == ':':
+          m = KEYWORD.match(buf, pos)
+        elif ch.isdigit() or ch == '-':
+          m = INT.match(buf, pos)
+        elif ch.isalpha():
+          m = SYMBOL.match(buf, pos)
+        else:
+          raise SyntaxError('unexpected character while reading form: ' + ch)
+        if m.end() == end and not eof:
+          # the next piece might continue the token
+          break
+        token = m.group(0)
+        pos = m.end()
+        if ch == ':':
+          val = Keyword(token)
+        elif ch != '-' and not ch.isdigit():
+          if token == "t":
+            val = True
+          elif token == "nil":
+            val = False
+          else:
+            val = Symbol(token)
+        else:
+          val = int(token)
+      if self.stack:
+        self.stack[-1].append(val)
+      else:
+        forms.append(val)
+    self.buf = buf[pos:]
+    if eof and (self.buf or self.stack) and not forms:
+      raise SyntaxError('unexpected EOF while reading form')
+    return forms
+
+  def find_quote(self, buf, pos):
+    "Find the quote that ends the string starting at pos, or -1."
+    i = pos + 1 + (self.scanned if pos == 0 else 0)
+    while True:
+      i = buf.find('"', i)
+      if i < 0:
+        self.scanned = len(buf) - pos - 1
+        return -1
+      escapes = i
+      while buf[escapes - 1] == "\\":
+        escapes -= 1
+      if (i - escapes) % 2 == 0:
+        self.scanned = 0
+        return i
+      i += 1
+
+def benchmark(notes = 5000):
+  """Print how long it takes to read a :typecheck-result message with
+  the given number of notes, like the ones sent for big projects."""
+  import time
+  note = ('(:file "/home/user/project/src/main/scala/pkg/Module%d.scala" '
+          ':line %d :col 12 :beg 4521 :end 4530 :severity warn '
+          ':msg "value \\"foo\\" in class Bar is never used")')
+  msg = ('(:typecheck-result (:lang :scala :is-full t :notes (' +
+         ' '.join(note % (i, i) for i in xrange(notes)) + ')))')
+  start = time.time()
+  read(msg)
+  elapsed = time.time() - start
+  start = time.time()
+  reader = Reader()
+  for i in xrange(0, len(msg), 4096):
+    reader.feed(msg[i:i + 4096])
+  reader.feed("", True)
+  chunked = time.time() - start
+  print("read %d bytes in %.3fs, %.3fs in 4KB pieces" % (len(msg), elapsed, chunked))
 
 def to_string(exp):
   "Convert a Python object back into a Lisp-readable string."
@@ -7,3 +7,9 @@ def decode_if_str(arg):
   if isinstance(arg,list):
   	return [decode_if_str(elem) for elem in arg]
   return arg.decode("utf-8") if isinstance(arg, str) else arg
+
+def truncate_message(prefix, data, max_length):
+  "prefix followed by data, cut to max_length characters unless it is 0."
+  if max_length and len(data) > max_length:
+    data = data[:max_length] + "... (" + str(len(data) - max_length) + " more characters)"
+  return prefix + data
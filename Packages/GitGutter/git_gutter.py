@@ -33,6 +33,8 @@ class GitGutterCommand(sublime_plugin.WindowCommand):
             sublime.set_timeout(self.run, 1)
             return
         self.clear_all()
+        if force_refresh:
+            ViewCollection.refresh_git_file(self.view)
         if ViewCollection.untracked(self.view):
             self.bind_files('untracked')
         elif ViewCollection.ignored(self.view):
@@ -40,8 +42,6 @@ class GitGutterCommand(sublime_plugin.WindowCommand):
         else:
             # If the file is untracked there is no need to execute the diff
             # update
-            if force_refresh:
-                ViewCollection.clear_git_time(self.view)
             inserted, modified, deleted = ViewCollection.diff(self.view)
             self.lines_removed(deleted)
             self.bind_icons('inserted', inserted)
@@ -0,0 +1,302 @@
+from bisect import bisect_left
+
+
+def split_lines(text):
+    # split text into lines, keeping line endings so that a missing
+    # newline at the end of the file shows up as a change, like in git
+    lines = text.split('\n')
+    last = lines.pop()
+    lines = [line + '\n' for line in lines]
+    if last:
+        lines.append(last)
+    return lines
+
+
+def line_key(line, ignore_whitespace):
+    if ignore_whitespace == 'all':
+        return ''.join(line.split()) + ('\n' if line.endswith('\n') else '')
+    elif ignore_whitespace == 'eol':
+        return line.rstrip() + ('\n' if line.endswith('\n') else '')
+    return line
+
+
+def line_ids(old_lines, new_lines, ignore_whitespace):
+    # map lines to integers, so that lines are compared by id
+    ids = {}
+    old = [ids.setdefault(line_key(line, ignore_whitespace), len(ids))
+           for line in old_lines]
+    new = [ids.setdefault(line_key(line, ignore_whitespace), len(ids))
+           for line in new_lines]
+    return old, new
+
+
+# Edit distance explored by one run of Myers' diff before it settles for
+# the furthest point it reached, like the cost limit of git's xdiff.  This
+# bounds the time and memory of large, dissimilar ranges.
+MAX_COST = 256
+
+
+def myers_matches(a, b, alo, ahi, blo, bhi, matches):
+    # Myers' O(ND) diff of a[alo:ahi] and b[blo:bhi], adding the
+    # matching (i, j) line pairs to matches.  Lines that don't occur in
+    # the other range can't match, so they are left out first.
+    in_b = set(b[blo:bhi])
+    in_a = set(a[alo:ahi])
+    a_index = [i for i in range(alo, ahi) if a[i] in in_b]
+    b_index = [j for j in range(blo, bhi) if b[j] in in_a]
+    a_lines = [a[i] for i in a_index]
+    b_lines = [b[j] for j in b_index]
+
+    x = y = 0
+    while x < len(a_lines) and y < len(b_lines):
+        found, x, y = myers_path(a_lines, b_lines, x, y)
+        matches.extend((a_index[i], b_index[j]) for i, j in found)
+
+
+def myers_path(a, b, alo, blo):
+    # the matches on the shortest edit path from (alo, blo) to the end of
+    # a and b, or if that costs more than MAX_COST, to the furthest point
+    # reached.  Returns the matches and the point.
+    n = len(a) - alo
+    m = len(b) - blo
+    v = {1: 0}
+    trace = []
+    end = None
+    for d in range(min(n + m, MAX_COST) + 1):
+        trace.append(v.copy())
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x == n and y == m:
+                end = (x, y)
+                break
+        if end:
+            break
+    if end is None:
+        # the point that got furthest within the ranges
+        end = max(((v[k], v[k] - k) for k in range(-d, d + 1, 2)
+                   if v[k] <= n and 0 <= v[k] - k <= m), key=sum)
+
+    # walk the edits back from the end
+    found = []
+    x, y = end
+    for d in reversed(range(len(trace))):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            found.append((alo + x, blo + y))
+        x, y = prev_x, prev_y
+    found.reverse()
+    return found, alo + end[0], blo + end[1]
+
+
+def unique_lcs(a, b, alo, ahi, blo, bhi):
+    # longest common subsequence of the lines that occur exactly once
+    # in both a[alo:ahi] and b[blo:bhi]
+    counts = {}
+    for i in range(alo, ahi):
+        count = counts.get(a[i], (0, 0, None))
+        counts[a[i]] = (count[0] + 1, 0, i)
+    for j in range(blo, bhi):
+        count = counts.get(b[j])
+        if count is not None:
+            counts[b[j]] = (count[0], count[1] + 1, j if count[0] == 1 else None)
+    unique = []
+    for i in range(alo, ahi):
+        count = counts[a[i]]
+        if count[0] == 1 and count[1] == 1:
+            unique.append((i, count[2]))
+
+    # patience sort on the positions in b
+    tops = []
+    stacks = []
+    back = {}
+    for i, j in unique:
+        pos = bisect_left(tops, j)
+        if pos == len(tops):
+            tops.append(j)
+            stacks.append((i, j))
+        else:
+            tops[pos] = j
+            stacks[pos] = (i, j)
+        back[(i, j)] = stacks[pos - 1] if pos else None
+    lcs = []
+    pair = stacks[-1] if stacks else None
+    while pair is not None:
+        lcs.append(pair)
+        pair = back[pair]
+    lcs.reverse()
+    return lcs
+
+
+def patience_matches(a, b, alo, ahi, blo, bhi, matches):
+    # patience diff of a[alo:ahi] and b[blo:bhi], falling back to
+    # Myers' diff for ranges without unique common lines
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        matches.append((alo, blo))
+        alo += 1
+        blo += 1
+    suffix = []
+    while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+        ahi -= 1
+        bhi -= 1
+        suffix.append((ahi, bhi))
+
+    if alo < ahi and blo < bhi:
+        anchors = unique_lcs(a, b, alo, ahi, blo, bhi)
+        if anchors:
+            for i, j in anchors:
+                patience_matches(a, b, alo, i, blo, j, matches)
+                matches.append((i, j))
+                alo, blo = i + 1, j + 1
+            patience_matches(a, b, alo, ahi, blo, bhi, matches)
+        else:
+            myers_matches(a, b, alo, ahi, blo, bhi, matches)
+
+    suffix.reverse()
+    matches.extend(suffix)
+
+
+def diff_matches(a, b, patience):
+    matches = []
+    if patience:
+        patience_matches(a, b, 0, len(a), 0, len(b), matches)
+    else:
+        # trim the common ends, which are usually most of the file
+        lo = 0
+        while lo < len(a) and lo < len(b) and a[lo] == b[lo]:
+            lo += 1
+        ahi, bhi = len(a), len(b)
+        while ahi > lo and bhi > lo and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+        matches.extend((i, i) for i in range(lo))
+        myers_matches(a, b, lo, ahi, lo, bhi, matches)
+        matches.extend((ahi + i, bhi + i) for i in range(len(a) - ahi))
+    return matches
+
+
+def hunks(matches, old_size, new_size):
+    # (old_start, old_end, new_start, new_end) ranges of the changed lines,
+    # like the hunks of a diff with 0 lines of context
+    result = []
+    i = j = 0
+    for mi, mj in matches + [(old_size, new_size)]:
+        if mi > i or mj > j:
+            result.append((i, mi, j, mj))
+        i, j = mi + 1, mj + 1
+    return result
+
+
+def diff_hunks(old_lines, new_lines, ignore_whitespace='', patience=False):
+    a, b = line_ids(old_lines, new_lines, ignore_whitespace)
+    return hunks(diff_matches(a, b, patience), len(a), len(b))
+
+
+def common_prefix(a, b, limit):
+    # length of the common prefix of two lists, comparing halves of the
+    # remaining range at a time
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def common_suffix(a, b, limit):
+    lo, hi = 0, limit
+    len_a, len_b = len(a), len(b)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len_a - mid:len_a - lo] == b[len_b - mid:len_b - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+# Update the hunks of a diff of base_lines against old_lines for the
+# change from old_lines to new_lines.  Only the edited lines, widened
+# to the hunks they touch, are diffed against the base again; the other
+# hunks are kept, shifted past the edit.
+def update_hunks(hunk_list, base_lines, old_lines, new_lines,
+                 ignore_whitespace='', patience=False):
+    size = min(len(old_lines), len(new_lines))
+    prefix = common_prefix(old_lines, new_lines, size)
+    suffix = common_suffix(old_lines, new_lines, size - prefix)
+    if prefix == len(old_lines) == len(new_lines):
+        return hunk_list
+    delta = len(new_lines) - len(old_lines)
+    start, end = prefix, len(old_lines) - suffix
+
+    # the hunks touching the edit, from first to last
+    first = 0
+    while first < len(hunk_list) and hunk_list[first][3] < start:
+        first += 1
+    last = first
+    while last < len(hunk_list) and hunk_list[last][2] <= end:
+        last += 1
+
+    # lines between hunks are unchanged, so they map to the base by offset
+    if first > 0:
+        offset = hunk_list[first - 1][1] - hunk_list[first - 1][3]
+    else:
+        offset = 0
+    base_start = start + offset
+    if last > first:
+        start = min(start, hunk_list[first][2])
+        base_start = min(base_start, hunk_list[first][0])
+        offset = hunk_list[last - 1][1] - hunk_list[last - 1][3]
+        end = max(end, hunk_list[last - 1][3])
+    base_end = end + offset
+
+    region = diff_hunks(base_lines[base_start:base_end],
+                        new_lines[start:end + delta],
+                        ignore_whitespace, patience)
+    return (
+        hunk_list[:first] +
+        [(old_start + base_start, old_end + base_start,
+          new_start + start, new_end + start)
+         for old_start, old_end, new_start, new_end in region] +
+        [(old_start, old_end, new_start + delta, new_end + delta)
+         for old_start, old_end, new_start, new_end in hunk_list[last:]])
+
+
+# Line numbers of the inserted, modified and deleted lines, as read
+# from the hunks of `git diff -U0`.  Ambiguous hunks, where lines are
+# both removed and added, are marked as modified.
+def markers(hunk_list):
+    inserted = []
+    modified = []
+    deleted = []
+    for old_start, old_end, new_start, new_end in hunk_list:
+        if old_start == old_end:
+            inserted += range(new_start + 1, new_end + 1)
+        elif new_start == new_end:
+            deleted += [new_start + 1]
+        else:
+            modified += range(new_start + 1, new_end + 1)
+    return (inserted, modified, deleted)
+
+
+def diff(old_lines, new_lines, ignore_whitespace='', patience=False):
+    return markers(diff_hunks(old_lines, new_lines, ignore_whitespace,
+                              patience))
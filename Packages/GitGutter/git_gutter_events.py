@@ -43,6 +43,10 @@ class GitGutterEvents(sublime_plugin.EventListener):
             if not self.non_blocking and self.focus_change_mode:
                 ViewCollection.add(view)
 
+    def on_close(self, view):
+        if view.file_name():
+            ViewCollection.remove(view)
+
     # Asynchronous
 
     def debounce(self, view, event_type, func):
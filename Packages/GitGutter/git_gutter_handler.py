@@ -6,9 +6,13 @@ import re
 
 try:
     from . import git_helper
+    from . import git_gutter_diff
+    from .git_repository import GitRepository
     from .view_collection import ViewCollection
 except (ImportError, ValueError):
     import git_helper
+    import git_gutter_diff
+    from git_repository import GitRepository
     from view_collection import ViewCollection
 
 
@@ -17,11 +21,15 @@ class GitGutterHandler:
     def __init__(self, view):
         self.load_settings()
         self.view = view
-        self.git_temp_file = ViewCollection.git_tmp_file(self.view)
-        self.buf_temp_file = ViewCollection.buf_tmp_file(self.view)
+        self.repository = None
         if self.on_disk():
-            self.git_tree = git_helper.git_tree(self.view)
-            self.git_dir = git_helper.git_dir(self.git_tree)
+            self.repository = GitRepository.for_view(
+                self.view, self.git_binary_path)
+            if self.repository:
+                self.git_tree = self.repository.git_tree
+                self.git_dir = self.repository.git_dir
+            else:
+                self.git_tree = self.git_dir = False
             self.git_path = git_helper.git_file_path(self.view, self.git_tree)
 
     def _get_view_encoding(self):
@@ -49,114 +57,53 @@ class GitGutterHandler:
     def get_git_path(self):
         return self.git_path
 
-    def update_buf_file(self):
+    def buf_lines(self):
         chars = self.view.size()
         region = sublime.Region(0, chars)
+        return git_gutter_diff.split_lines(self.view.substr(region))
 
-        # Try conversion
+    def git_lines(self):
+        # the base file is cached by the repository until its HEAD or
+        # index changes
         try:
-            contents = self.view.substr(
-                region).encode(self._get_view_encoding())
-        except UnicodeError:
-            # Fallback to utf8-encoding
-            contents = self.view.substr(region).encode('utf-8')
-        except LookupError:
-            # May encounter an encoding we don't have a codec for
-            contents = self.view.substr(region).encode('utf-8')
-
-        contents = contents.replace(b'\r\n', b'\n')
-        contents = contents.replace(b'\r', b'\n')
-        f = open(self.buf_temp_file.name, 'wb')
+            contents = self.repository.git_file(
+                ViewCollection.get_compare(), self.git_path)
+        except Exception:
+            contents = b''
+        ViewCollection.update_git_file(self.view, contents)
 
-        f.write(contents)
-        f.close()
-
-    def update_git_file(self):
-        # the git repo won't change that often
-        # so we can easily wait 5 seconds
-        # between updates for performance
-        if ViewCollection.git_time(self.view) > 5:
-            open(self.git_temp_file.name, 'w').close()
-            args = [
-                self.git_binary_path,
-                '--git-dir=' + self.git_dir,
-                '--work-tree=' + self.git_tree,
-                'show',
-                ViewCollection.get_compare() + ':' + self.git_path,
-            ]
-            try:
-                contents = self.run_command(args)
-                contents = contents.replace(b'\r\n', b'\n')
-                contents = contents.replace(b'\r', b'\n')
-                f = open(self.git_temp_file.name, 'wb')
-                f.write(contents)
-                f.close()
-                ViewCollection.update_git_time(self.view)
-            except Exception:
-                pass
+        encoding = self._get_view_encoding()
+        return ViewCollection.git_file_lines(self.view, encoding)
 
     def total_lines(self):
-        chars = self.view.size()
-        region = sublime.Region(0, chars)
-        lines = self.view.lines(region)
-        return len(lines)
-
-    # Parse unified diff with 0 lines of context.
-    # Hunk range info format:
-    #   @@ -3,2 +4,0 @@
-    #     Hunk originally starting at line 3, and occupying 2 lines, now
-    #     starts at line 4, and occupies 0 lines, i.e. it was deleted.
-    #   @@ -9 +10,2 @@
-    #     Hunk size can be omitted, and defaults to one line.
-    # Dealing with ambiguous hunks:
-    #   "A\nB\n" -> "C\n"
-    #   Was 'A' modified, and 'B' deleted? Or 'B' modified, 'A' deleted?
-    #   Or both deleted? To minimize confusion, let's simply mark the
-    #   hunk as modified.
-    def process_diff(self, diff_str):
-        inserted = []
-        modified = []
-        deleted = []
-        hunk_re = '^@@ \-(\d+),?(\d*) \+(\d+),?(\d*) @@'
-        hunks = re.finditer(hunk_re, diff_str, re.MULTILINE)
-        for hunk in hunks:
-            start = int(hunk.group(3))
-            old_size = int(hunk.group(2) or 1)
-            new_size = int(hunk.group(4) or 1)
-            if not old_size:
-                inserted += range(start, start + new_size)
-            elif not new_size:
-                deleted += [start + 1]
-            else:
-                modified += range(start, start + new_size)
-        if len(inserted) == self.total_lines() and not self.show_untracked:
-            # All lines are "inserted"
-            # this means this file is either:
-            # - New and not being tracked *yet*
-            # - Or it is a *gitignored* file
-            return ([], [], [])
-        else:
-            return (inserted, modified, deleted)
+        # the row of the last character, without listing every line
+        return self.view.rowcol(self.view.size())[0] + 1
 
     def diff(self):
         if self.on_disk() and self.git_path:
-            self.update_git_file()
-            self.update_buf_file()
-            args = [
-                self.git_binary_path, 'diff', '-U0', '--no-color',
-                self.ignore_whitespace,
-                self.patience_switch,
-                self.git_temp_file.name,
-                self.buf_temp_file.name,
-            ]
-            args = list(filter(None, args))  # Remove empty args
-            results = self.run_command(args)
-            encoding = self._get_view_encoding()
-            try:
-                decoded_results = results.decode(encoding.replace(' ', ''))
-            except UnicodeError:
-                decoded_results = results.decode("utf-8")
-            return self.process_diff(decoded_results)
+            lines = self.buf_lines()
+            base = self.git_lines()
+            options = (self.ignore_whitespace, self.patience)
+            state = ViewCollection.diff_state(self.view)
+            if (self.incremental_diff and state and state[0] is base and
+                    state[1] == options):
+                # only diff the lines edited since the last diff again
+                hunks = git_gutter_diff.update_hunks(
+                    state[3], base, state[2], lines, *options)
+            else:
+                hunks = git_gutter_diff.diff_hunks(base, lines, *options)
+            ViewCollection.update_diff_state(
+                self.view, (base, options, lines, hunks))
+            inserted, modified, deleted = git_gutter_diff.markers(hunks)
+            if (len(inserted) == self.total_lines() and
+                    not self.show_untracked):
+                # All lines are "inserted"
+                # this means this file is either:
+                # - New and not being tracked *yet*
+                # - Or it is a *gitignored* file
+                return ([], [], [])
+            else:
+                return (inserted, modified, deleted)
         else:
             return ([], [], [])
 
@@ -168,16 +115,9 @@ class GitGutterHandler:
 
     def handle_files(self, additionnal_args):
         if self.show_untracked and self.on_disk() and self.git_path:
-            args = [
-                self.git_binary_path,
-                '--git-dir=' + self.git_dir,
-                '--work-tree=' + self.git_tree,
-                'ls-files', '--other', '--exclude-standard',
-            ] + additionnal_args + [
-                os.path.join(self.git_tree, self.git_path),
-            ]
-            args = list(filter(None, args))  # Remove empty args
-            results = self.run_command(args)
+            results = self.repository.ls_files(
+                ViewCollection.get_compare(), self.git_path,
+                additionnal_args)
             encoding = self._get_view_encoding()
             try:
                 decoded_results = results.decode(encoding.replace(' ', ''))
@@ -247,18 +187,16 @@ class GitGutterHandler:
 
         # Ignore White Space Setting
         self.ignore_whitespace = self.settings.get('ignore_whitespace')
-        if self.ignore_whitespace == 'all':
-            self.ignore_whitespace = '-w'
-        elif self.ignore_whitespace == 'eol':
-            self.ignore_whitespace = '--ignore-space-at-eol'
-        else:
+        if self.ignore_whitespace not in ('all', 'eol'):
             self.ignore_whitespace = ''
 
         # Patience Setting
-        self.patience_switch = ''
-        patience = self.settings.get('patience')
-        if patience:
-            self.patience_switch = '--patience'
+        self.patience = bool(self.settings.get('patience'))
+
+        # Incremental Diff Setting
+        self.incremental_diff = self.settings.get('incremental_diff')
+        if self.incremental_diff is None:
+            self.incremental_diff = True
 
         # Untracked files
         self.show_untracked = self.settings.get(
@@ -0,0 +1,193 @@
+import os
+import subprocess
+import threading
+
+try:
+    from . import git_helper
+except (ImportError, ValueError):
+    import git_helper
+
+
+class GitRepository:
+    # Shared by all the files of a repository: the repository is resolved
+    # once per directory, and the base files and ls-files results are
+    # cached until HEAD, the branch it points to or the index changes.
+    directories = {}
+    repositories = {}
+
+    @staticmethod
+    def for_view(view, git_binary):
+        directory = os.path.realpath(os.path.dirname(view.file_name()))
+        repository = GitRepository.directories.get(directory)
+        if repository is None:
+            git_tree = git_helper.git_root(directory)
+            if not git_tree:
+                return None
+            git_dir = git_helper.git_dir(git_tree)
+            repository = GitRepository.repositories.get(git_dir)
+            if repository is None:
+                repository = GitRepository(git_tree, git_dir)
+                GitRepository.repositories[git_dir] = repository
+            GitRepository.directories[directory] = repository
+        repository.git_binary = git_binary
+        return repository
+
+    @staticmethod
+    def forget_path(repository, path):
+        # drop a file whose view was closed, and the repository with
+        # its cat-file process once none of its files are open
+        if repository.forget(path):
+            for key, value in list(GitRepository.directories.items()):
+                if value is repository:
+                    del GitRepository.directories[key]
+            if GitRepository.repositories.get(repository.git_dir) is repository:
+                del GitRepository.repositories[repository.git_dir]
+            repository.close()
+
+    def __init__(self, git_tree, git_dir):
+        self.git_tree = git_tree
+        self.git_dir = git_dir
+        self.git_binary = 'git'
+        self.lock = threading.Lock()
+        self.state = None
+        self.paths = set()
+        self.files = {}
+        self.ls_files_results = {}
+        self.process = None
+
+    def mtime(self, *path):
+        try:
+            return os.path.getmtime(os.path.join(self.git_dir, *path))
+        except (OSError, IOError):
+            return None
+
+    def current_state(self, rev):
+        # HEAD changes when switching branches, the branch it points
+        # to (loose or packed) when committing, and the index when
+        # files are added
+        head = ''
+        try:
+            with open(os.path.join(self.git_dir, 'HEAD')) as f:
+                head = f.read().strip()
+        except (OSError, IOError):
+            pass
+        ref = head[5:].strip() if head.startswith('ref:') else None
+        return (
+            rev, head,
+            self.mtime(*ref.split('/')) if ref else None,
+            self.mtime('packed-refs'),
+            self.mtime('index'),
+        )
+
+    def check_state(self, rev):
+        state = self.current_state(rev)
+        if state != self.state:
+            self.state = state
+            self.files = {}
+            self.ls_files_results = {}
+
+    def invalidate(self):
+        with self.lock:
+            self.state = None
+
+    def forget(self, path):
+        # returns True if no files of the repository are left
+        with self.lock:
+            self.paths.discard(path)
+            self.files.pop(path, None)
+            for key in list(self.ls_files_results):
+                if key[0] == path:
+                    del self.ls_files_results[key]
+            return not self.paths
+
+    def close(self):
+        with self.lock:
+            process, self.process = self.process, None
+        if process is not None and process.poll() is None:
+            try:
+                process.stdin.close()
+                process.terminate()
+                process.wait()
+            except (OSError, IOError):
+                pass
+
+    def git_file(self, rev, path):
+        # base file contents with normalised line endings, b'' if the
+        # file isn't in rev.  Files of the repository that are missing
+        # are fetched together, over one long lived git process.
+        with self.lock:
+            self.check_state(rev)
+            self.paths.add(path)
+            if path not in self.files:
+                missing = [p for p in self.paths if p not in self.files]
+                self.files.update(self.cat_files(rev, missing))
+            return self.files[path]
+
+    def ls_files(self, rev, path, additional_args):
+        with self.lock:
+            self.check_state(rev)
+            key = (path, tuple(additional_args))
+            if key not in self.ls_files_results:
+                args = [
+                    self.git_binary,
+                    '--git-dir=' + self.git_dir,
+                    '--work-tree=' + self.git_tree,
+                    'ls-files', '--other', '--exclude-standard',
+                ] + additional_args + [
+                    os.path.join(self.git_tree, path),
+                ]
+                args = list(filter(None, args))  # Remove empty args
+                self.ls_files_results[key] = run_command(args)
+            return self.ls_files_results[key]
+
+    def cat_file_process(self):
+        if self.process is None or self.process.poll() is not None:
+            args = [
+                self.git_binary,
+                '--git-dir=' + self.git_dir,
+                '--work-tree=' + self.git_tree,
+                'cat-file', '--batch',
+            ]
+            self.process = subprocess.Popen(
+                args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=open(os.devnull, 'wb'), startupinfo=startupinfo())
+        return self.process
+
+    def cat_files(self, rev, paths):
+        files = dict((path, b'') for path in paths)
+        try:
+            process = self.cat_file_process()
+            for path in paths:
+                request = '%s:%s\n' % (rev, path)
+                process.stdin.write(request.encode('utf-8'))
+                process.stdin.flush()
+                # "<sha> <type> <size>" followed by the contents,
+                # or "<object> missing"
+                header = process.stdout.readline().split()
+                if len(header) != 3:
+                    continue
+                contents = process.stdout.read(int(header[2]))
+                process.stdout.read(1)
+                if header[1] == b'blob':
+                    contents = contents.replace(b'\r\n', b'\n')
+                    files[path] = contents.replace(b'\r', b'\n')
+        except (OSError, IOError, ValueError):
+            # the process died, start a new one next time
+            if self.process is not None and self.process.poll() is None:
+                self.process.kill()
+            self.process = None
+        return files
+
+
+def startupinfo():
+    info = None
+    if os.name == 'nt':
+        info = subprocess.STARTUPINFO()
+        info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return info
+
+
+def run_command(args):
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE,
+                            startupinfo=startupinfo(), stderr=subprocess.PIPE)
+    return proc.stdout.read()
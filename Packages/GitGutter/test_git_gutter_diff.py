@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+"""Unit tests for git_gutter_diff.py"""
+
+import sys
+
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+try:
+    import sublime
+
+    if int(sublime.version()) > 3000:
+        from . import git_gutter_diff
+    else:
+        import git_gutter_diff
+except:
+    import git_gutter_diff
+
+from git_gutter_diff import diff_hunks, markers, split_lines, update_hunks
+
+
+class GitGutterDiffTest(unittest.TestCase):
+
+    """Tests for the line diff used for the gutter markers"""
+
+    def lines(self, text):
+        return split_lines(text)
+
+    def check_matches(self, a, b, matches):
+        """Matches must pair equal lines and be increasing in both files"""
+        for i, j in matches:
+            self.assertEqual(a[i], b[j])
+        for (i, j), (next_i, next_j) in zip(matches, matches[1:]):
+            self.assertTrue(i < next_i and j < next_j)
+
+    """diff_hunks"""
+
+    def test_diff_hunks__identical(self):
+        lines = self.lines('a\nb\nc\n')
+        self.assertEqual(diff_hunks(lines, lines), [])
+
+    def test_diff_hunks__insertion(self):
+        self.assertEqual(
+            diff_hunks(self.lines('a\nc\n'), self.lines('a\nb\nc\n')),
+            [(1, 1, 1, 2)])
+
+    def test_diff_hunks__deletion(self):
+        self.assertEqual(
+            diff_hunks(self.lines('a\nb\nc\n'), self.lines('a\nc\n')),
+            [(1, 2, 1, 1)])
+
+    def test_diff_hunks__modification(self):
+        self.assertEqual(
+            diff_hunks(self.lines('a\nb\nc\n'), self.lines('a\nx\nc\n')),
+            [(1, 2, 1, 2)])
+
+    def test_diff_hunks__missing_newline_at_end(self):
+        self.assertEqual(
+            diff_hunks(self.lines('a\nb\n'), self.lines('a\nb')),
+            [(1, 2, 1, 2)])
+
+    def test_diff_hunks__new_file(self):
+        self.assertEqual(
+            diff_hunks([], self.lines('a\nb\n')), [(0, 0, 0, 2)])
+
+    def test_diff_hunks__ignore_whitespace(self):
+        old = self.lines('a b\nc\n')
+        new = self.lines('a  b \nc\n')
+        self.assertEqual(diff_hunks(old, new), [(0, 1, 0, 1)])
+        self.assertEqual(diff_hunks(old, new, 'all'), [])
+        self.assertEqual(
+            diff_hunks(self.lines('a\n'), self.lines('a \n'), 'eol'), [])
+
+    def test_diff_hunks__patience_anchors_unique_lines(self):
+        old = self.lines('}\nfoo\n}\nbar\n}\n')
+        new = self.lines('}\nbar\n}\nfoo\n}\n')
+        for patience in (False, True):
+            hunks = diff_hunks(old, new, patience=patience)
+            self.assertEqual(len(hunks), 2)
+
+    def test_diff_hunks__matches_are_valid(self):
+        old = [str(i % 7) for i in range(300)]
+        new = [str(i % 5) for i in range(300)]
+        for patience in (False, True):
+            matches = git_gutter_diff.diff_matches(old, new, patience)
+            self.check_matches(old, new, matches)
+
+    def test_diff_hunks__large_dissimilar_files(self):
+        old = ['a%d\n' % i for i in range(4000)]
+        new = ['b%d\n' % i for i in range(4000)]
+        self.assertEqual(diff_hunks(old, new), [(0, 4000, 0, 4000)])
+        self.assertEqual(diff_hunks([], new), [(0, 0, 0, 4000)])
+
+    def test_diff_hunks__beyond_max_cost(self):
+        # more edits than one run of Myers' diff explores
+        count = git_gutter_diff.MAX_COST * 2
+        old = ['x\n'] * count + ['y\n'] * count
+        new = ['y\n'] * count + ['x\n'] * count
+        matches = git_gutter_diff.diff_matches(old, new, False)
+        self.check_matches(old, new, matches)
+        self.assertTrue(matches)
+
+    """update_hunks"""
+
+    def test_update_hunks__same_as_full_diff(self):
+        base = self.lines('a\nb\nc\nd\ne\n')
+        old = self.lines('a\nx\nc\nd\ne\n')
+        new = self.lines('a\nx\nc\nd\ny\ne\n')
+        hunks = update_hunks(diff_hunks(base, old), base, old, new)
+        self.assertEqual(hunks, diff_hunks(base, new))
+
+    """markers"""
+
+    def test_markers__inserted_modified_deleted(self):
+        hunks = [(0, 0, 0, 2), (3, 4, 5, 6), (6, 8, 8, 8)]
+        self.assertEqual(markers(hunks), ([1, 2], [6], [9]))
+
+    def test_markers__empty(self):
+        self.assertEqual(markers([]), ([], [], []))
+
+
+if __name__ == '__main__':
+    unittest.main()
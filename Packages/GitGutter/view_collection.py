@@ -1,12 +1,17 @@
-import tempfile
-import time
+import sublime
+
+try:
+    from .git_gutter_diff import split_lines
+    from .git_repository import GitRepository
+except (ImportError, ValueError):
+    from git_gutter_diff import split_lines
+    from git_repository import GitRepository
 
 
 class ViewCollection:
     views = {} # Todo: these aren't really views but handlers. Refactor/Rename.
-    git_times = {}
     git_files = {}
-    buf_files = {}
+    diff_states = {}
     compare_against = "HEAD"
 
     @staticmethod
@@ -20,6 +25,21 @@ class ViewCollection:
         handler.reset()
         return handler
 
+    @staticmethod
+    def remove(view):
+        # the view was closed, forget its file, base lines and last diff
+        # unless another view of it is still open
+        key = ViewCollection.get_key(view)
+        for window in sublime.windows():
+            for other in window.views():
+                if other.id() != view.id() and ViewCollection.get_key(other) == key:
+                    return
+        handler = ViewCollection.views.pop(key, None)
+        ViewCollection.git_files.pop(key, None)
+        ViewCollection.diff_states.pop(key, None)
+        if handler and handler.repository:
+            GitRepository.forget_path(handler.repository, handler.git_path)
+
     @staticmethod
     def git_path(view):
         key = ViewCollection.get_key(view)
@@ -66,37 +86,47 @@ class ViewCollection:
         return ViewCollection.views[key].total_lines()
 
     @staticmethod
-    def git_time(view):
+    def refresh_git_file(view):
+        # fetch the base file again on the next diff, for changes git
+        # doesn't record in HEAD or the index (e.g. a new .gitignore)
         key = ViewCollection.get_key(view)
-        if not key in ViewCollection.git_times:
-            ViewCollection.git_times[key] = 0
-        return time.time() - ViewCollection.git_times[key]
+        if key in ViewCollection.views:
+            repository = ViewCollection.views[key].repository
+            if repository:
+                repository.invalidate()
 
     @staticmethod
-    def clear_git_time(view):
+    def update_git_file(view, contents):
         key = ViewCollection.get_key(view)
-        ViewCollection.git_times[key] = 0
+        # keep the decoded lines if the file hasn't changed, so the
+        # previous diff against them can be updated incrementally
+        if ViewCollection.git_files.get(key, (None,))[0] != contents:
+            ViewCollection.git_files[key] = (contents, None, None)
 
     @staticmethod
-    def update_git_time(view):
+    def git_file_lines(view, encoding):
+        # the base file is decoded and split into lines once per encoding
         key = ViewCollection.get_key(view)
-        ViewCollection.git_times[key] = time.time()
-
-    @staticmethod
-    def git_tmp_file(view):
+        contents, lines_encoding, lines = ViewCollection.git_files.get(
+            key, (b'', None, None))
+        if lines is None or lines_encoding != encoding:
+            try:
+                text = contents.decode(encoding)
+            except (UnicodeError, LookupError):
+                text = contents.decode('utf-8', 'replace')
+            lines = split_lines(text)
+            ViewCollection.git_files[key] = (contents, encoding, lines)
+        return lines
+
+    @staticmethod
+    def diff_state(view):
         key = ViewCollection.get_key(view)
-        if not key in ViewCollection.git_files:
-            ViewCollection.git_files[key] = tempfile.NamedTemporaryFile()
-            ViewCollection.git_files[key].close()
-        return ViewCollection.git_files[key]
+        return ViewCollection.diff_states.get(key)
 
     @staticmethod
-    def buf_tmp_file(view):
+    def update_diff_state(view, state):
         key = ViewCollection.get_key(view)
-        if not key in ViewCollection.buf_files:
-            ViewCollection.buf_files[key] = tempfile.NamedTemporaryFile()
-            ViewCollection.buf_files[key].close()
-        return ViewCollection.buf_files[key]
+        ViewCollection.diff_states[key] = state
 
     @staticmethod
     def set_compare(commit):
@@ -1,5 +1,5 @@
 import sublime, sublime_plugin
-import subprocess, os
+import subprocess, os, threading, time, functools
 
 class EventListener(sublime_plugin.EventListener):
 
@@ -9,6 +9,8 @@ class EventListener(sublime_plugin.EventListener):
     def on_clone(self, view):
         self.fire()
     def on_post_save(self, view):
+        # saving changes the working tree, which the cache can't see
+        GitStatusWorker.invalidate()
         self.fire()
     def on_post_load(self, view):
         self.fire()
@@ -24,29 +26,142 @@ class GitStatusCommand(sublime_plugin.WindowCommand):
         self.check()
 
     def check(self):
-        clean     = "nothing to commit, working directory clean"
-        dirty     = "o changes added to commit"
-        untracked = "nothing added to commit but untracked files present"
-        notgit    = "ot a git repository"
-
-        base_dir = self.window.folders()[0]
-        os.chdir(base_dir)
-
-        matches = subprocess.check_output(['git', 'status']).strip()
-        matches = matches.decode('utf8', 'ignore').split("\n")
-        status  = matches[-1]
+        folders = self.window.folders()
+        if not folders:
+            return
+        GitStatusWorker.request(folders[0], self.show)
 
+    def show(self, status):
         view = sublime.active_window().active_view()
-        if clean in status:
-            view.set_status('GitStatus', "Git: Clean")
-        elif dirty in status:
-            view.set_status('GitStatus', "Git: Dirty")
-        elif untracked in status:
-            view.set_status('GitStatus', "Git: Untracked")
-        elif notgit in status:
-            view.set_status('GitStatus', "Git: Not git")
-        else:
-            view.set_status('GitStatus', "Git: ?")
+        if view:
+            view.set_status('GitStatus', "Git: " + status)
+
+class GitStatusWorker():
+    # git status runs on a single background thread.  Requests that
+    # arrive while one is waiting are merged, so a burst of events (e.g.
+    # deactivating one view and activating another) runs git once, and
+    # the result is cached until .git/index, HEAD or the branch HEAD
+    # points to changes.
+    delay     = 0.1
+    condition = threading.Condition()
+    thread    = None
+    pending   = None
+    git_dirs  = {}
+    cache     = {}
+
+    # debug counters
+    refreshes = 0
+    hits      = 0
+    elapsed   = 0.0
+
+    @classmethod
+    def request(cls, base_dir, callback):
+        with cls.condition:
+            cls.pending = (base_dir, callback)
+            if cls.thread is None:
+                cls.thread = threading.Thread(target=cls.loop)
+                cls.thread.daemon = True
+                cls.thread.start()
+            cls.condition.notify()
+
+    @classmethod
+    def invalidate(cls):
+        with cls.condition:
+            cls.cache.clear()
+
+    @classmethod
+    def loop(cls):
+        while True:
+            with cls.condition:
+                while cls.pending is None:
+                    cls.condition.wait()
+            # let the rest of the burst arrive
+            time.sleep(cls.delay)
+            with cls.condition:
+                base_dir, callback = cls.pending
+                cls.pending = None
+            try:
+                status = cls.refresh(base_dir)
+            except Exception:
+                status = "?"
+            sublime.set_timeout(functools.partial(callback, status), 0)
+
+    @classmethod
+    def refresh(cls, base_dir):
+        start = time.time()
+        git_dir = cls.git_dir(base_dir)
+        if git_dir is None:
+            return "Not git"
+        key = state(git_dir)
+        with cls.condition:
+            cached = cls.cache.get(base_dir)
+        if cached is not None and cached[0] == key:
+            cls.hits += 1
+            return cached[1]
+
+        status = parse_status(git(base_dir, 'status', '--porcelain'))
+        with cls.condition:
+            cls.cache[base_dir] = (key, status)
+
+        latency = time.time() - start
+        cls.refreshes += 1
+        cls.elapsed += latency
+        if debug():
+            print("GitStatus: refreshed %s in %.1fms "
+                  "(%d refreshes, average %.1fms, %d cached)" % (
+                      base_dir, latency * 1000, cls.refreshes,
+                      cls.elapsed * 1000 / cls.refreshes, cls.hits))
+        return status
+
+    @classmethod
+    def git_dir(cls, base_dir):
+        if base_dir not in cls.git_dirs:
+            try:
+                git_dir = git(base_dir, 'rev-parse', '--git-dir').strip()
+            except (OSError, subprocess.CalledProcessError):
+                # not cached, the folder may become a repository later
+                return None
+            cls.git_dirs[base_dir] = os.path.join(
+                base_dir, git_dir.decode('utf8', 'ignore'))
+        return cls.git_dirs[base_dir]
+
+def git(base_dir, *args):
+    return subprocess.check_output(('git',) + args, cwd=base_dir,
+                                   stderr=subprocess.PIPE)
+
+def mtime(git_dir, name):
+    try:
+        return os.path.getmtime(os.path.join(git_dir, name))
+    except OSError:
+        return None
+
+def state(git_dir):
+    # HEAD changes when switching branches, the branch it points to
+    # (loose or packed) when committing or resetting, and the index
+    # when files are staged
+    head = ''
+    try:
+        with open(os.path.join(git_dir, 'HEAD')) as f:
+            head = f.read().strip()
+    except (OSError, IOError):
+        pass
+    ref = head[5:].strip() if head.startswith('ref:') else None
+    return (head, mtime(git_dir, ref) if ref else None,
+            mtime(git_dir, 'packed-refs'), mtime(git_dir, 'index'))
+
+def parse_status(output):
+    # git status --porcelain prints one "XY path" line per changed file,
+    # with XY "??" for untracked files
+    lines = output.decode('utf8', 'ignore').splitlines()
+    if not lines:
+        return "Clean"
+    elif all(line.startswith('??') for line in lines):
+        return "Untracked"
+    else:
+        return "Dirty"
+
+def debug():
+    return sublime.load_settings('GitStatus.sublime-settings').get('debug')
 
 class Gitter():
     def all(self, window, ftype=None):
@@ -57,8 +172,7 @@ class Gitter():
         self.items = []
 
         base_dir = self.window.folders()[0]
-        os.chdir(base_dir)
-        matches = subprocess.check_output(['git', 'ls-files', '-mdov', '--exclude-standard']).strip()
+        matches = git(base_dir, 'ls-files', '-mdov', '--exclude-standard').strip()
         matches = matches.decode('utf8', 'ignore').split("\n")
         for m in matches:
             if ftype:
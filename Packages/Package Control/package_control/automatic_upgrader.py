@@ -3,6 +3,15 @@ import re
 import os
 import datetime
 import time
+import tempfile
+import shutil
+
+try:
+    # Python 3
+    from urllib.parse import urlparse
+except (ImportError):
+    # Python 2
+    from urlparse import urlparse
 
 import sublime
 
@@ -36,6 +45,7 @@ class AutomaticUpgrader(threading.Thread):
 
         self.auto_upgrade = self.settings.get('auto_upgrade')
         self.auto_upgrade_ignore = self.settings.get('auto_upgrade_ignore')
+        self.parallel_upgrades = self.settings.get('parallel_upgrades', True)
 
         self.load_last_run()
         self.determine_next_run()
@@ -189,6 +199,11 @@ class AutomaticUpgrader(threading.Thread):
             def make_on_complete(name):
                 return lambda: self.installer.reenable_package(name)
 
+            if self.parallel_upgrades:
+                self.upgrade_in_parallel(package_list, disabled_packages,
+                    make_on_complete)
+                return
+
             for info in package_list:
                 if info[0] in disabled_packages:
                     on_complete = make_on_complete(info[0])
@@ -196,13 +211,7 @@ class AutomaticUpgrader(threading.Thread):
                     on_complete = None
 
                 self.installer.manager.install_package(info[0])
-
-                version = re.sub('^.*?(v[\d\.]+).*?$', '\\1', info[2])
-                if version == info[2] and version.find('pull with') != -1:
-                    vcs = re.sub('^pull with (\w+).*?$', '\\1', version)
-                    version = 'latest %s commit' % vcs
-                message_string = u'Upgraded %s to %s' % (info[0], version)
-                console_write(message_string, True)
+                self.print_upgraded(info)
                 if on_complete:
                     sublime.set_timeout(on_complete, 1)
 
@@ -213,3 +222,84 @@ class AutomaticUpgrader(threading.Thread):
             disabled_packages.extend(self.installer.disable_packages([info[0] for info in package_list]))
             threading.Thread(target=do_upgrades).start()
         sublime.set_timeout(disable_packages, 1)
+
+    def print_upgraded(self, info):
+        """
+        Prints a notice in the console that a package was upgraded
+
+        :param info:
+            The package list entry from PackageInstaller.make_package_list()
+        """
+
+        version = re.sub('^.*?(v[\d\.]+).*?$', '\\1', info[2])
+        if version == info[2] and version.find('pull with') != -1:
+            vcs = re.sub('^pull with (\w+).*?$', '\\1', version)
+            version = 'latest %s commit' % vcs
+        message_string = u'Upgraded %s to %s' % (info[0], version)
+        console_write(message_string, True)
+
+    def upgrade_in_parallel(self, package_list, disabled_packages, make_on_complete):
+        """
+        Downloads the package files for all of the upgrades at the same time,
+        using the `download_threads` and `download_threads_per_host` limits,
+        and then installs them one at a time
+
+        :param package_list:
+            The package list entries from PackageInstaller.make_package_list()
+
+        :param disabled_packages:
+            The names of the packages that were disabled for the upgrade
+
+        :param make_on_complete:
+            A function returning the callback to re-enable a disabled package
+        """
+
+        manager = self.installer.manager
+        packages = manager.list_available_packages()
+
+        settings = manager.settings
+        all_slots = threading.Semaphore(max(1, settings.get('download_threads', 8)))
+        max_per_host = max(1, settings.get('download_threads_per_host', 4))
+        host_slots = {}
+
+        tmp_dir = tempfile.mkdtemp()
+        package_files = {}
+
+        def download(name, path, slots):
+            with slots:
+                with all_slots:
+                    if manager.download_package(name, packages, path):
+                        package_files[name] = path
+
+        threads = []
+        for info in package_list:
+            name = info[0]
+            # VCS packages are pulled by install_package() and unavailable
+            # packages are reported by it
+            if name not in packages or manager.is_vcs_package(name):
+                continue
+            host = urlparse(packages[name]['download']['url']).hostname
+            if host not in host_slots:
+                host_slots[host] = threading.Semaphore(max_per_host)
+            path = os.path.join(tmp_dir, '%s.sublime-package' % len(threads))
+            thread = threading.Thread(target=download,
+                args=(name, path, host_slots[host]))
+            thread.start()
+            threads.append((name, thread))
+
+        try:
+            for name, thread in threads:
+                thread.join()
+
+            attempted = [name for name, thread in threads]
+            for info in package_list:
+                name = info[0]
+                # If the download failed, the error was already shown
+                if name in package_files or name not in attempted:
+                    if manager.install_package(name, packages, package_files.get(name)):
+                        self.print_upgraded(info)
+                if name in disabled_packages:
+                    sublime.set_timeout(make_on_complete(name), 1)
+
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -1,4 +1,9 @@
+import os
 import time
+import json
+import zlib
+import tempfile
+import threading
 
 
 # A cache of channel and repository info to allow users to install multiple
@@ -6,13 +11,26 @@ import time
 # than once. The keys are managed locally by the utilizing code.
 _channel_repository_cache = {}
 
+# The parsed channel and repository info is also saved to disk, so that it
+# can be used right away after a restart while it is downloaded again.
+# Entries loaded from disk are marked as stale until they are replaced.
+_persistent_suffixes = ('.repositories', '.packages', '.package_name_map',
+    '.renamed_packages', '.unavailable_packages', '.certs')
+_persistent_version = 1
+_persistent_loaded = False
+_persistent_changed = False
+# Held while a snapshot is taken and written, since the cache is saved from
+# the foreground and from background threads
+_persistent_lock = threading.Lock()
+
 
 def clear_cache():
-    global _channel_repository_cache
+    global _channel_repository_cache, _persistent_changed
     _channel_repository_cache = {}
+    _persistent_changed = True
 
 
-def get_cache(key, default=None):
+def get_cache(key, default=None, fresh=False):
     """
     Gets an in-memory cache value
 
@@ -22,18 +40,126 @@ def get_cache(key, default=None):
     :param default:
         The value to return if the key has not been set, or the ttl expired
 
+    :param fresh:
+        If values loaded from disk by load_cache() should be ignored
+
     :return:
         The cached value, or default
     """
 
     struct = _channel_repository_cache.get(key, {})
+    if fresh and struct.get('stale'):
+        return default
     expires = struct.get('expires')
     if expires and expires > time.time():
         return struct.get('data')
     return default
 
 
-def merge_cache_over_settings(destination, setting, key_prefix):
+def load_cache(path, settings_key, ttl):
+    """
+    Loads the cache values saved by save_cache() into the in-memory cache,
+    the first time it is called. The values are marked as stale and are
+    valid for `ttl` seconds, or until they are set again.
+
+    :param path:
+        The filesystem path of the saved cache
+
+    :param settings_key:
+        A string identifying the settings the values were retrieved with,
+        values saved with other settings are not loaded
+
+    :param ttl:
+        The integer number of seconds to use the loaded values for
+
+    :return:
+        If any stale values were loaded
+    """
+
+    global _persistent_loaded
+
+    if _persistent_loaded:
+        return False
+    _persistent_loaded = True
+
+    try:
+        with open(path, 'rb') as f:
+            snapshot = json.loads(zlib.decompress(f.read()).decode('utf-8'))
+    except (IOError, OSError, ValueError, zlib.error):
+        return False
+
+    if snapshot.get('version') != _persistent_version or \
+            snapshot.get('settings') != settings_key:
+        return False
+
+    loaded = False
+    expires = time.time() + ttl
+    for key, data in snapshot.get('entries', {}).items():
+        if key not in _channel_repository_cache:
+            _channel_repository_cache[key] = {
+                'data': data,
+                'expires': expires,
+                'stale': True
+            }
+            loaded = True
+    return loaded
+
+
+def save_cache(path, settings_key):
+    """
+    Saves the channel and repository info from the in-memory cache to disk,
+    if it changed since it was last saved or loaded
+
+    :param path:
+        The filesystem path to save the cache to
+
+    :param settings_key:
+        A string identifying the settings the values were retrieved with
+    """
+
+    with _persistent_lock:
+        _save_cache(path, settings_key)
+
+
+def _save_cache(path, settings_key):
+    global _persistent_changed
+
+    if not _persistent_changed:
+        return
+    _persistent_changed = False
+
+    now = time.time()
+    entries = {}
+    for key, struct in list(_channel_repository_cache.items()):
+        if key.endswith(_persistent_suffixes) and struct.get('expires', 0) > now:
+            entries[key] = struct.get('data')
+    snapshot = {
+        'version': _persistent_version,
+        'settings': settings_key,
+        'entries': entries
+    }
+    content = zlib.compress(json.dumps(snapshot, separators=(',', ':')).encode('utf-8'))
+
+    # Write to a temp file first so a partial write never replaces a good cache
+    temp_path = None
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(temp_path, path)
+    except (IOError, OSError):
+        # Try again the next time the cache is saved
+        _persistent_changed = True
+        if temp_path and os.path.exists(temp_path):
+            try:
+                os.remove(temp_path)
+            except (IOError, OSError):
+                pass
+
+
+def merge_cache_over_settings(destination, setting, key_prefix, fresh=False):
     """
     Take the cached value of `key` and put it into the key `setting` of
     the destination.settings dict. Merge the values by overlaying the
@@ -47,16 +173,19 @@ def merge_cache_over_settings(destination, setting, key_prefix):
 
     :param key_prefix:
         The string to prefix to `setting` to make the cache key
+
+    :param fresh:
+        If values loaded from disk by load_cache() should be ignored
     """
 
     existing = destination.settings.get(setting, {})
-    value = get_cache(key_prefix + '.' + setting, {})
+    value = get_cache(key_prefix + '.' + setting, {}, fresh)
     if value:
         existing.update(value)
         destination.settings[setting] = existing
 
 
-def merge_cache_under_settings(destination, setting, key_prefix, list_=False):
+def merge_cache_under_settings(destination, setting, key_prefix, list_=False, fresh=False):
     """
     Take the cached value of `key` and put it into the key `setting` of
     the destination.settings dict. Merge the values by overlaying the
@@ -73,11 +202,14 @@ def merge_cache_under_settings(destination, setting, key_prefix, list_=False):
 
     :param list_:
         If a list should be used instead of a dict
+
+    :param fresh:
+        If values loaded from disk by load_cache() should be ignored
     """
 
     default = {} if not list_ else []
     existing = destination.settings.get(setting)
-    value = get_cache(key_prefix + '.' + setting, default)
+    value = get_cache(key_prefix + '.' + setting, default, fresh)
     if value:
         if existing:
             if list_:
@@ -101,10 +233,14 @@ def set_cache(key, data, ttl=300):
         The integer number of second to cache the data for
     """
 
+    global _persistent_changed
+
     _channel_repository_cache[key] = {
         'data': data,
         'expires': time.time() + ttl
     }
+    if key.endswith(_persistent_suffixes):
+        _persistent_changed = True
 
 
 def set_cache_over_settings(destination, setting, key_prefix, value, ttl):
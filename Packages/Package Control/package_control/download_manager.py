@@ -125,12 +125,17 @@ class DownloadManager(object):
         self.settings = settings
         if settings.get('http_cache'):
             cache_length = settings.get('http_cache_length', 604800)
-            self.settings['cache'] = HttpCache(cache_length)
+            cache_size = settings.get('http_cache_size')
+            if cache_size is not None:
+                cache_size = int(cache_size * 1024 * 1024)
+            self.settings['cache'] = HttpCache(cache_length, cache_size)
 
     def close(self):
         if self.downloader:
             self.downloader.close()
             self.downloader = None
+        if self.settings.get('cache'):
+            self.settings['cache'].flush()
 
     def fetch(self, url, error_message, prefer_cached=False):
         """
@@ -152,6 +157,52 @@ class DownloadManager(object):
             The string contents of the URL
         """
 
+        return self.perform(url, lambda url, timeout: self.downloader.download(
+            url, error_message, timeout, 3, prefer_cached))
+
+    def fetch_to_file(self, url, path, error_message):
+        """
+        Downloads a URL and saves the contents to a file, without holding the
+        whole response in memory
+
+        :param url:
+            The string URL to download
+
+        :param path:
+            The filesystem path to save the contents to
+
+        :param error_message:
+            The error message to include if the download fails
+
+        :raises:
+            DownloaderException: if there was an error downloading the URL
+
+        :return:
+            The hex SHA-256 of the contents
+        """
+
+        return self.perform(url, lambda url, timeout: self.downloader.download_to_file(
+            url, path, error_message, timeout, 3))
+
+    def perform(self, url, download):
+        """
+        Picks a downloader and checks the domain of a URL before downloading
+        it, and records domains that hit a rate limit or have no CA certs
+
+        :param url:
+            The string URL to download
+
+        :param download:
+            A callable that performs the download with self.downloader, taking
+            the cleaned up URL and the timeout
+
+        :raises:
+            DownloaderException: if there was an error downloading the URL
+
+        :return:
+            The result of download
+        """
+
         is_ssl = re.search('^https://', url) != None
 
         # Make sure we have a downloader, and it supports SSL if we need it
@@ -206,7 +257,7 @@ class DownloadManager(object):
             raise DownloaderException(error_string)
 
         try:
-            return self.downloader.download(url, error_message, timeout, 3, prefer_cached)
+            return download(url, timeout)
 
         except (RateLimitException) as e:
 
@@ -1,10 +1,27 @@
 import threading
+import time
+import traceback
 
+try:
+    # Python 3
+    from urllib.parse import urlparse
+    import queue
+except (ImportError):
+    # Python 2
+    from urlparse import urlparse
+    import Queue as queue
 
-class BackgroundDownloader(threading.Thread):
+from .downloader_exception import DownloaderException
+from ..console_write import console_write
+from ..clients.client_exception import ClientException
+from ..providers.provider_exception import ProviderException
+
+
+class BackgroundDownloader(object):
     """
-    Downloads information from one or more URLs in the background.
-    Normal usage is to use one BackgroundDownloader per domain name.
+    Downloads information from one or more URLs in the background, using a
+    bounded pool of threads with a limit on the number of concurrent
+    requests to each domain name.
 
     :param settings:
         A dict containing at least the following fields:
@@ -16,6 +33,9 @@ class BackgroundDownloader(threading.Thread):
           `https_proxy`,
           `proxy_username`,
           `proxy_password`
+        Optional fields:
+          `download_threads`,
+          `download_threads_per_host`
 
     :param providers:
         An array of providers that can download the URLs
@@ -25,8 +45,13 @@ class BackgroundDownloader(threading.Thread):
         self.settings = settings
         self.urls = []
         self.providers = providers
-        self.used_providers = {}
-        threading.Thread.__init__(self)
+        self.timings = {}
+        self.max_threads = max(1, settings.get('download_threads', 8))
+        self.max_per_host = max(1, settings.get('download_threads_per_host', 4))
+
+        self.lock = threading.Condition()
+        self.hosts = {}
+        self.finished = queue.Queue()
 
     def add_url(self, url):
         """
@@ -38,25 +63,88 @@ class BackgroundDownloader(threading.Thread):
 
         self.urls.append(url)
 
-    def get_provider(self, url):
+    def start(self):
+        """
+        Starts the threads that download the URLs
         """
-        Returns the provider for the URL specified
 
-        :param url:
-            The URL to return the provider for
+        self.pending = list(self.urls)
+        for i in range(min(self.max_threads, len(self.urls))):
+            thread = threading.Thread(target=self.run)
+            thread.daemon = True
+            thread.start()
+
+    def results(self):
+        """
+        A generator of the download results, in the order they complete
+
+        :return:
+            A generator of (url, provider, exception) tuples. The provider
+            is None if the URL could not be downloaded, in which case
+            exception is the DownloaderException, ClientException or
+            ProviderException that was raised.
+        """
+
+        for i in range(len(self.urls)):
+            yield self.finished.get()
+
+    def next_url(self):
+        """
+        Picks the next URL whose domain is below the concurrency limit,
+        waiting for a request to finish if there is none
 
         :return:
-            The provider object for the URL
+            A (url, hostname) tuple, or None when there is nothing left
         """
 
-        return self.used_providers[url]
+        with self.lock:
+            while self.pending:
+                for url in self.pending:
+                    hostname = urlparse(url).hostname
+                    if self.hosts.get(hostname, 0) < self.max_per_host:
+                        self.pending.remove(url)
+                        self.hosts[hostname] = self.hosts.get(hostname, 0) + 1
+                        return (url, hostname)
+                self.lock.wait()
+            return None
 
     def run(self):
-        for url in self.urls:
-            for provider_class in self.providers:
-                if provider_class.match_url(url):
-                    provider = provider_class(url, self.settings)
-                    break
-
-            provider.prefetch()
-            self.used_providers[url] = provider
+        while True:
+            next_url = self.next_url()
+            if next_url is None:
+                return
+            url, hostname = next_url
+
+            start = time.time()
+            provider = None
+            exception = None
+            try:
+                for provider_class in self.providers:
+                    if provider_class.match_url(url):
+                        provider = provider_class(url, self.settings)
+                        break
+
+                if provider is None:
+                    raise ProviderException(u'No provider was found for the URL %s' % url)
+
+                provider.prefetch()
+
+            except (DownloaderException, ClientException, ProviderException) as e:
+                exception = e
+
+            except (Exception) as e:
+                # Report the error and keep going, since results() waits
+                # for every URL and other URLs are still pending
+                console_write(u'Unexpected error fetching %s' % url, True)
+                console_write(traceback.format_exc())
+                exception = e
+
+            finally:
+                self.timings[url] = time.time() - start
+                with self.lock:
+                    self.hosts[hostname] -= 1
+                    self.lock.notify_all()
+
+                if exception is not None:
+                    provider = None
+                self.finished.put((url, provider, exception))
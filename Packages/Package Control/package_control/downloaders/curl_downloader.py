@@ -11,9 +11,10 @@ from .downloader_exception import DownloaderException
 from .cert_provider import CertProvider
 from .limiting_downloader import LimitingDownloader
 from .caching_downloader import CachingDownloader
+from .streaming_downloader import StreamingDownloader, hash_file
 
 
-class CurlDownloader(CliDownloader, CertProvider, LimitingDownloader, CachingDownloader):
+class CurlDownloader(CliDownloader, CertProvider, LimitingDownloader, CachingDownloader, StreamingDownloader):
     """
     A downloader that uses the command line program curl
 
@@ -71,6 +72,52 @@ class CurlDownloader(CliDownloader, CertProvider, LimitingDownloader, CachingDow
             if cached:
                 return cached
 
+        return self.request(url, error_message, timeout, tries)
+
+    def download_to_file(self, url, path, error_message, timeout, tries):
+        """
+        Downloads a URL and has curl save the contents to a file
+
+        :param url:
+            The URL to download
+
+        :param path:
+            The filesystem path to save the contents to
+
+        :param error_message:
+            A string to include in the console error that is printed
+            when an error occurs
+
+        :param timeout:
+            The int number of seconds to set the timeout to
+
+        :param tries:
+            The int number of times to try and download the URL in the case of
+            a timeout or HTTP 503 error
+
+        :raises:
+            NoCaCertException: when no CA certs can be found for the url
+            RateLimitException: when a rate limit is hit
+            DownloaderException: when any other download error occurs
+
+        :return:
+            The hex SHA-256 of the contents
+        """
+
+        self.request(url, error_message, timeout, tries, path)
+        return hash_file(path)
+
+    def request(self, url, error_message, timeout, tries, path=None):
+        """
+        Performs the request for download() and download_to_file()
+
+        :param path:
+            A filesystem path to save the response to, instead of returning it
+
+        :return:
+            The string contents of the URL, or None if a path was given
+        """
+
         self.tmp_file = tempfile.NamedTemporaryFile().name
         command = [self.curl, '--user-agent', self.settings.get('user_agent'),
             '--connect-timeout', str(int(timeout)), '-sSL',
@@ -82,7 +129,12 @@ class CurlDownloader(CliDownloader, CertProvider, LimitingDownloader, CachingDow
             # We have to capture the headers to check for rate limit info
             '--dump-header', self.tmp_file]
 
-        request_headers = self.add_conditional_headers(url, {})
+        # Responses saved to a file are never cached
+        if path:
+            command.extend(['--output', path])
+            request_headers = {}
+        else:
+            request_headers = self.add_conditional_headers(url, {})
 
         for name, value in request_headers.items():
             command.extend(['--header', "%s: %s" % (name, value)])
@@ -155,6 +207,9 @@ class CurlDownloader(CliDownloader, CertProvider, LimitingDownloader, CachingDow
                     e.stderr = "%s %s" % (status, message)
                     raise e
 
+                if path:
+                    return None
+
                 output = self.cache_result('get', url, status, headers, output)
 
                 return output
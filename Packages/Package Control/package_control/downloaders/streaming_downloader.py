@@ -0,0 +1,128 @@
+import hashlib
+import zlib
+
+from ..open_compat import open_compat
+
+
+# The number of bytes to read and write at a time when saving to a file
+CHUNK_SIZE = 65536
+
+
+class StreamingDownloader(object):
+    """
+    A base for downloaders that can save a response straight to a file.
+    Downloaders that don't override download_to_file() download the whole
+    response first.
+    """
+
+    def download_to_file(self, url, path, error_message, timeout, tries):
+        """
+        Downloads a URL and saves the contents to a file
+
+        :param url:
+            The URL to download
+
+        :param path:
+            The filesystem path to save the contents to
+
+        :param error_message:
+            A string to include in the console error that is printed
+            when an error occurs
+
+        :param timeout:
+            The int number of seconds to set the timeout to
+
+        :param tries:
+            The int number of times to try and download the URL in the case of
+            a timeout or HTTP 503 error
+
+        :raises:
+            NoCaCertException: when no CA certs can be found for the url
+            RateLimitException: when a rate limit is hit
+            DownloaderException: when any other download error occurs
+
+        :return:
+            The hex SHA-256 of the contents
+        """
+
+        content = self.download(url, error_message, timeout, tries)
+        with open_compat(path, 'wb') as f:
+            f.write(content)
+        return hashlib.sha256(content).hexdigest()
+
+
+class FileWriter(object):
+    """
+    Writes a response to a file a chunk at a time, decoding it and hashing
+    the decoded content as it goes
+
+    :param path:
+        The filesystem path to write to
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def start(self, encoding=None):
+        """
+        Starts writing the file from the beginning, for each try
+
+        :param encoding:
+            The content-encoding of the response, if any
+        """
+
+        self.close()
+        self.file = open_compat(self.path, 'wb')
+        self.hash = hashlib.sha256()
+        self.decompressor = None
+        if encoding == 'gzip':
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+
+    def write(self, chunk):
+        if self.decompressor:
+            chunk = self.decompressor.decompress(chunk)
+        self.hash.update(chunk)
+        self.file.write(chunk)
+
+    def finish(self):
+        """
+        Closes the file
+
+        :return:
+            The hex SHA-256 of the decoded content
+        """
+
+        if self.decompressor:
+            chunk = self.decompressor.flush()
+            self.hash.update(chunk)
+            self.file.write(chunk)
+        self.close()
+        return self.hash.hexdigest()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+def hash_file(path):
+    """
+    Calculates the SHA-256 of a file, reading it a chunk at a time
+
+    :param path:
+        The filesystem path of the file
+
+    :return:
+        The hex SHA-256 of the file contents
+    """
+
+    hash_ = hashlib.sha256()
+    with open_compat(path, 'rb') as f:
+        chunk = f.read(CHUNK_SIZE)
+        while chunk:
+            hash_.update(chunk)
+            chunk = f.read(CHUNK_SIZE)
+    return hash_.hexdigest()
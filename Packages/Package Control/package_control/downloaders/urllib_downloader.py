@@ -34,9 +34,10 @@ from .cert_provider import CertProvider
 from .decoding_downloader import DecodingDownloader
 from .limiting_downloader import LimitingDownloader
 from .caching_downloader import CachingDownloader
+from .streaming_downloader import StreamingDownloader, FileWriter, CHUNK_SIZE
 
 
-class UrlLibDownloader(CertProvider, DecodingDownloader, LimitingDownloader, CachingDownloader):
+class UrlLibDownloader(CertProvider, DecodingDownloader, LimitingDownloader, CachingDownloader, StreamingDownloader):
     """
     A downloader that uses the Python urllib module
 
@@ -100,6 +101,56 @@ class UrlLibDownloader(CertProvider, DecodingDownloader, LimitingDownloader, Cac
             if cached:
                 return cached
 
+        return self.request(url, error_message, timeout, tries)
+
+    def download_to_file(self, url, path, error_message, timeout, tries):
+        """
+        Downloads a URL and saves the contents to a file, a chunk at a time
+
+        :param url:
+            The URL to download
+
+        :param path:
+            The filesystem path to save the contents to
+
+        :param error_message:
+            A string to include in the console error that is printed
+            when an error occurs
+
+        :param timeout:
+            The int number of seconds to set the timeout to
+
+        :param tries:
+            The int number of times to try and download the URL in the case of
+            a timeout or HTTP 503 error
+
+        :raises:
+            NoCaCertException: when no CA certs can be found for the url
+            RateLimitException: when a rate limit is hit
+            DownloaderException: when any other download error occurs
+
+        :return:
+            The hex SHA-256 of the contents
+        """
+
+        writer = FileWriter(path)
+        try:
+            return self.request(url, error_message, timeout, tries, writer)
+        finally:
+            writer.close()
+
+    def request(self, url, error_message, timeout, tries, writer=None):
+        """
+        Performs the request for download() and download_to_file()
+
+        :param writer:
+            A FileWriter to save the response with, instead of returning it
+
+        :return:
+            The string contents of the URL, or the hex SHA-256 of the contents
+            if a writer was given
+        """
+
         self.setup_opener(url, timeout)
 
         debug = self.settings.get('debug')
@@ -116,11 +167,22 @@ class UrlLibDownloader(CertProvider, DecodingDownloader, LimitingDownloader, Cac
                     # encoding.
                     "Accept-Encoding": "gzip,deflate"
                 }
-                request_headers = self.add_conditional_headers(url, request_headers)
+                # Responses saved to a file are never cached
+                if not writer:
+                    request_headers = self.add_conditional_headers(url, request_headers)
                 request = Request(url, headers=request_headers)
                 http_file = self.opener.open(request, timeout=timeout)
                 self.handle_rate_limit(http_file.headers, url)
 
+                if writer:
+                    writer.start(http_file.headers.get('content-encoding'))
+                    chunk = http_file.read(CHUNK_SIZE)
+                    while chunk:
+                        writer.write(chunk)
+                        chunk = http_file.read(CHUNK_SIZE)
+                    http_file.close()
+                    return writer.finish()
+
                 result = http_file.read()
                 # Make sure the response is closed so we can re-use the connection
                 http_file.close()
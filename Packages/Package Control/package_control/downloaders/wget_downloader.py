@@ -14,9 +14,10 @@ from .cert_provider import CertProvider
 from .decoding_downloader import DecodingDownloader
 from .limiting_downloader import LimitingDownloader
 from .caching_downloader import CachingDownloader
+from .streaming_downloader import StreamingDownloader, hash_file
 
 
-class WgetDownloader(CliDownloader, CertProvider, DecodingDownloader, LimitingDownloader, CachingDownloader):
+class WgetDownloader(CliDownloader, CertProvider, DecodingDownloader, LimitingDownloader, CachingDownloader, StreamingDownloader):
     """
     A downloader that uses the command line program wget
 
@@ -75,18 +76,69 @@ class WgetDownloader(CliDownloader, CertProvider, DecodingDownloader, LimitingDo
             if cached:
                 return cached
 
+        return self.request(url, error_message, timeout, tries)
+
+    def download_to_file(self, url, path, error_message, timeout, tries):
+        """
+        Downloads a URL and has wget save the contents to a file
+
+        :param url:
+            The URL to download
+
+        :param path:
+            The filesystem path to save the contents to
+
+        :param error_message:
+            A string to include in the console error that is printed
+            when an error occurs
+
+        :param timeout:
+            The int number of seconds to set the timeout to
+
+        :param tries:
+            The int number of times to try and download the URL in the case of
+            a timeout or HTTP 503 error
+
+        :raises:
+            NoCaCertException: when no CA certs can be found for the url
+            RateLimitException: when a rate limit is hit
+            DownloaderException: when any other download error occurs
+
+        :return:
+            The hex SHA-256 of the contents
+        """
+
+        self.request(url, error_message, timeout, tries, path)
+        return hash_file(path)
+
+    def request(self, url, error_message, timeout, tries, path=None):
+        """
+        Performs the request for download() and download_to_file()
+
+        :param path:
+            A filesystem path to save the response to, instead of returning it
+
+        :return:
+            The string contents of the URL, or None if a path was given
+        """
+
         self.tmp_file = tempfile.NamedTemporaryFile().name
         command = [self.wget, '--connect-timeout=' + str(int(timeout)), '-o',
-            self.tmp_file, '-O', '-', '-U', self.settings.get('user_agent')]
-
-        request_headers = {
-            # Don't be alarmed if the response from the server does not select
-            # one of these since the server runs a relatively new version of
-            # OpenSSL which supports compression on the SSL layer, and Apache
-            # will use that instead of HTTP-level encoding.
-            'Accept-Encoding': 'gzip,deflate'
-        }
-        request_headers = self.add_conditional_headers(url, request_headers)
+            self.tmp_file, '-O', path or '-', '-U', self.settings.get('user_agent')]
+
+        # Responses saved to a file are never cached, and aren't requested
+        # compressed since wget can't decode them
+        if path:
+            request_headers = {}
+        else:
+            request_headers = {
+                # Don't be alarmed if the response from the server does not select
+                # one of these since the server runs a relatively new version of
+                # OpenSSL which supports compression on the SSL layer, and Apache
+                # will use that instead of HTTP-level encoding.
+                'Accept-Encoding': 'gzip,deflate'
+            }
+            request_headers = self.add_conditional_headers(url, request_headers)
 
         for name, value in request_headers.items():
             command.extend(['--header', "%s: %s" % (name, value)])
@@ -133,6 +185,9 @@ class WgetDownloader(CliDownloader, CertProvider, DecodingDownloader, LimitingDo
                 result = self.execute(command)
 
                 general, headers = self.parse_output()
+                if path:
+                    return None
+
                 encoding = headers.get('content-encoding')
                 if encoding:
                     result = self.decode_response(encoding, result)
@@ -24,9 +24,10 @@ from .downloader_exception import DownloaderException
 from .decoding_downloader import DecodingDownloader
 from .limiting_downloader import LimitingDownloader
 from .caching_downloader import CachingDownloader
+from .streaming_downloader import StreamingDownloader
 
 
-class WinINetDownloader(DecodingDownloader, LimitingDownloader, CachingDownloader):
+class WinINetDownloader(DecodingDownloader, LimitingDownloader, CachingDownloader, StreamingDownloader):
     """
     A downloader that uses the Windows WinINet DLL to perform downloads. This
     has the benefit of utilizing system-level proxy configuration and CA certs.
@@ -1,21 +1,53 @@
 import os
 import time
+import json
+import hashlib
+import tempfile
+import shutil
+import threading
 
 import sublime
 
-from .open_compat import open_compat, read_compat
+
+# The index of each cache folder is shared by all HttpCache objects using it,
+# since there is one per DownloadManager and they are used from many threads
+_indexes = {}
+_lock = threading.Lock()
 
 
 class HttpCache(object):
     """
     A data store for caching HTTP response data.
+
+    Content is stored in files named by the SHA-1 of the content, and a single
+    index file maps each key to the content, its size and when it was set and
+    last used. The index is read once, so looking up a key doesn't touch the
+    disk. When the content is larger than `max_size`, the least recently used
+    entries are removed.
+
+    :param ttl:
+        The number of seconds a cache entry should be valid for
+
+    :param max_size:
+        The number of bytes of content to keep, or None for no limit
+
+    :param base_path:
+        The folder to store the cache in, defaults to
+        User/Package Control.cache
     """
 
-    def __init__(self, ttl):
-        self.base_path = os.path.join(sublime.packages_path(), 'User', 'Package Control.cache')
-        if not os.path.exists(self.base_path):
-            os.mkdir(self.base_path)
-        self.clear(int(ttl))
+    def __init__(self, ttl, max_size=None, base_path=None):
+        if base_path is None:
+            base_path = os.path.join(sublime.packages_path(), 'User', 'Package Control.cache')
+        self.base_path = base_path
+        self.ttl = int(ttl)
+        self.max_size = max_size
+
+        with _lock:
+            if base_path not in _indexes:
+                _indexes[base_path] = HttpCacheIndex(base_path)
+            self.index = _indexes[base_path]
+        self.clear(self.ttl)
 
     def clear(self, ttl):
         """
@@ -25,17 +57,12 @@ class HttpCache(object):
             The number of seconds a cache entry should be valid for
         """
 
-        ttl = int(ttl)
-
-        for filename in os.listdir(self.base_path):
-            path = os.path.join(self.base_path, filename)
-            # There should not be any folders in the cache dir, but we
-            # ignore to prevent an exception
-            if os.path.isdir(path):
-                continue
-            mtime = os.stat(path).st_mtime
-            if mtime < time.time() - ttl:
-                os.unlink(path)
+        cutoff = time.time() - int(ttl)
+        with _lock:
+            for key, entry in list(self.index.entries.items()):
+                if entry[2] < cutoff:
+                    self.index.remove(key)
+            self.index.save_if_changed()
 
     def get(self, key):
         """
@@ -48,16 +75,28 @@ class HttpCache(object):
             The (binary) cached value, or False
         """
 
-        cache_file = os.path.join(self.base_path, key)
-        if not os.path.exists(cache_file):
-            return False
+        with _lock:
+            entry = self.index.entries.get(key)
+            if not entry or entry[2] < time.time() - self.ttl:
+                return False
+            entry[3] = time.time()
+            self.index.changed = True
+            path = self.index.blob_path(entry[0])
 
-        with open_compat(cache_file, 'rb') as f:
-            return read_compat(f)
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except (IOError, OSError):
+            # The content was removed from outside of Package Control
+            with _lock:
+                if self.index.entries.get(key) is entry:
+                    self.index.remove(key)
+            return False
 
     def has(self, key):
-        cache_file = os.path.join(self.base_path, key)
-        return os.path.exists(cache_file)
+        with _lock:
+            entry = self.index.entries.get(key)
+            return bool(entry) and entry[2] >= time.time() - self.ttl
 
     def set(self, key, content):
         """
@@ -70,6 +109,227 @@ class HttpCache(object):
             The (binary) content to cache
         """
 
-        cache_file = os.path.join(self.base_path, key)
-        with open_compat(cache_file, 'wb') as f:
+        digest = hashlib.sha1(content).hexdigest()
+        path = self.index.blob_path(digest)
+
+        with _lock:
+            exists = digest in self.index.refs
+
+        # Content is written to a temp file and moved into place, so a blob
+        # is never partially written
+        if not exists:
+            try:
+                atomic_write(path, content)
+            except (IOError, OSError):
+                return
+
+        with _lock:
+            now = time.time()
+            self.index.add(key, [digest, len(content), now, now])
+            if self.max_size is not None:
+                self.index.evict(self.max_size)
+            self.index.save_if_changed(delay=5)
+
+    def flush(self):
+        """
+        Writes any pending changes to the index to disk
+        """
+
+        with _lock:
+            self.index.save_if_changed()
+
+
+class HttpCacheIndex(object):
+    """
+    The index of the content in a cache folder, with entries in the format:
+    key: [sha1, size, set time, last used time]
+
+    All methods must be called while holding the module lock.
+
+    :param base_path:
+        The folder the cache is stored in
+    """
+
+    version = 1
+
+    def __init__(self, base_path):
+        self.base_path = base_path
+        self.path = os.path.join(base_path, 'index.json')
+        self.entries = {}
+        self.refs = {}
+        self.size = 0
+        self.changed = False
+        self.saved = 0
+
+        if not os.path.exists(base_path):
+            os.mkdir(base_path)
+
+        try:
+            with open(self.path, 'rb') as f:
+                data = json.loads(f.read().decode('utf-8'))
+            if data.get('version') != self.version:
+                raise ValueError('Unknown cache index version')
+            entries = data['entries']
+        except (IOError, OSError, ValueError, KeyError):
+            entries = None
+
+        if entries is None:
+            # The cache used to be one file per key, with no index
+            self.remove_all_files()
+            self.changed = True
+            return
+
+        for key, entry in entries.items():
+            self.add(key, entry)
+        self.changed = False
+
+    def blob_path(self, digest):
+        return os.path.join(self.base_path, digest)
+
+    def add(self, key, entry):
+        # The new content is referenced before the old is released, in case
+        # they are the same
+        self.refs[entry[0]] = self.refs.get(entry[0], 0) + 1
+        if self.refs[entry[0]] == 1:
+            self.size += entry[1]
+        old_entry = self.entries.get(key)
+        self.entries[key] = entry
+        self.changed = True
+        if old_entry:
+            self.release(old_entry)
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.changed = True
+            self.release(entry)
+
+    def release(self, entry):
+        self.refs[entry[0]] -= 1
+        if self.refs[entry[0]]:
+            return
+        del self.refs[entry[0]]
+        self.size -= entry[1]
+        try:
+            os.unlink(self.blob_path(entry[0]))
+        except (IOError, OSError):
+            pass
+
+    def evict(self, max_size):
+        """
+        Removes the least recently used entries until the content fits in
+        max_size bytes
+        """
+
+        if self.size <= max_size:
+            return
+        by_use = sorted(self.entries.items(), key=lambda item: item[1][3])
+        for key, entry in by_use:
+            if self.size <= max_size:
+                break
+            self.remove(key)
+
+    def save_if_changed(self, delay=0):
+        """
+        Writes the index to disk if it has changed
+
+        :param delay:
+            Skip writing if the index was written less than this many seconds
+            ago, flush() writes it later
+        """
+
+        if not self.changed or time.time() - self.saved < delay:
+            return
+        data = {'version': self.version, 'entries': self.entries}
+        content = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        try:
+            atomic_write(self.path, content)
+        except (IOError, OSError):
+            return
+        self.changed = False
+        self.saved = time.time()
+
+    def remove_all_files(self):
+        for filename in os.listdir(self.base_path):
+            path = os.path.join(self.base_path, filename)
+            # There should not be any folders in the cache dir, but we
+            # ignore to prevent an exception
+            if os.path.isdir(path):
+                continue
+            try:
+                os.unlink(path)
+            except (IOError, OSError):
+                pass
+
+
+def atomic_write(path, content):
+    """
+    Writes a file by writing a temp file in the same folder and renaming it
+
+    :param path:
+        The path of the file to write
+
+    :param content:
+        The (binary) content of the file
+    """
+
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
             f.write(content)
+        if os.name == 'nt' and os.path.exists(path):
+            # Windows can't rename over an existing file
+            os.unlink(path)
+        os.rename(temp_path, path)
+    except (IOError, OSError):
+        try:
+            os.unlink(temp_path)
+        except (IOError, OSError):
+            pass
+        raise
+
+
+def benchmark(entries=10000, size=2048):
+    """
+    Prints how long it takes to open a cache with the given number of
+    entries, for comparing cache implementations. Run it from the Sublime
+    Text console with:
+
+        from package_control.http_cache import benchmark; benchmark()
+
+    :param entries:
+        The number of entries to put in the cache
+
+    :param size:
+        The number of bytes of content for each entry
+    """
+
+    base_path = tempfile.mkdtemp()
+    try:
+        cache = HttpCache(604800, base_path=base_path)
+        start = time.time()
+        for i in range(entries):
+            cache.set('%032x' % i, os.urandom(size))
+        cache.flush()
+        fill_time = time.time() - start
+
+        # Make the next HttpCache read the index from disk
+        with _lock:
+            del _indexes[base_path]
+
+        start = time.time()
+        cache = HttpCache(604800, base_path=base_path)
+        open_time = time.time() - start
+
+        start = time.time()
+        for i in range(entries):
+            cache.has('%032x' % i)
+        has_time = time.time() - start
+
+        print('HttpCache with %d entries: filled in %.3fs, opened in %.3fs, '
+              '%.2fus per has()' % (entries, fill_time, open_time,
+                                     has_time / entries * 1000000))
+    finally:
+        with _lock:
+            _indexes.pop(base_path, None)
+        shutil.rmtree(base_path)
@@ -10,16 +10,18 @@ from fnmatch import fnmatch
 import datetime
 import tempfile
 import locale
+import hashlib
+import threading
+import copy
 
 try:
     # Python 3
-    from urllib.parse import urlencode, urlparse
+    from urllib.parse import urlencode
     import compileall
     str_cls = str
 except (ImportError):
     # Python 2
     from urllib import urlencode
-    from urlparse import urlparse
     str_cls = unicode
 
 import sublime
@@ -30,7 +32,8 @@ from .open_compat import open_compat, read_compat
 from .unicode import unicode_from_os
 from .clear_directory import clear_directory
 from .cache import (clear_cache, set_cache, get_cache, merge_cache_under_settings,
-    merge_cache_over_settings, set_cache_under_settings, set_cache_over_settings)
+    merge_cache_over_settings, set_cache_under_settings, set_cache_over_settings,
+    load_cache, save_cache)
 from .versions import version_comparable, version_sort
 from .downloaders.background_downloader import BackgroundDownloader
 from .downloaders.downloader_exception import DownloaderException
@@ -73,7 +76,9 @@ class PackageManager():
                 'files_to_include', 'files_to_include_binary', 'certs',
                 'ignore_vcs_packages', 'proxy_username', 'proxy_password',
                 'debug', 'user_agent', 'http_cache', 'http_cache_length',
-                'install_prereleases', 'openssl_binary']:
+                'http_cache_size',
+                'install_prereleases', 'openssl_binary', 'download_threads',
+                'download_threads_per_host']:
             if settings.get(setting) == None:
                 continue
             self.settings[setting] = settings.get(setting)
@@ -106,6 +111,18 @@ class PackageManager():
             clear_cache()
         set_cache('filtered_settings', filtered_settings)
 
+        # The channel and repository info saved to disk is only used with
+        # the same settings
+        settings_json = json.dumps(filtered_settings, sort_keys=True)
+        self.settings_key = hashlib.md5(settings_json.encode('utf-8')).hexdigest()
+        self.metadata_path = os.path.join(sublime.packages_path(), 'User',
+            'Package Control.metadata')
+
+        # If values loaded from disk should be ignored, this is set when
+        # they are being downloaded again in the background
+        self.refreshing = False
+        self.initial_settings = copy.deepcopy(self.settings)
+
     def get_metadata(self, package):
         """
         Returns the package metadata for an installed package
@@ -150,11 +167,11 @@ class PackageManager():
 
             # Caches various info from channels for performance
             cache_key = channel + '.repositories'
-            channel_repositories = get_cache(cache_key)
+            channel_repositories = get_cache(cache_key, fresh=self.refreshing)
 
-            merge_cache_under_settings(self, 'package_name_map', channel)
-            merge_cache_under_settings(self, 'renamed_packages', channel)
-            merge_cache_under_settings(self, 'unavailable_packages', channel, list_=True)
+            merge_cache_under_settings(self, 'package_name_map', channel, fresh=self.refreshing)
+            merge_cache_under_settings(self, 'renamed_packages', channel, fresh=self.refreshing)
+            merge_cache_under_settings(self, 'unavailable_packages', channel, list_=True, fresh=self.refreshing)
 
             # If any of the info was not retrieved from the cache, we need to
             # grab the channel to get it
@@ -220,51 +237,45 @@ class PackageManager():
             console_write(u"  Package Control Version: %s" % __version__)
 
         cache_ttl = self.settings.get('cache_length')
+
+        # Use the info saved to disk by the last session right away, and
+        # download it again in the background. The downloads are mostly
+        # conditional requests answered with 304 via the HTTP cache.
+        if load_cache(self.metadata_path, self.settings_key, cache_ttl):
+            self.refresh_in_background()
+
         repositories = self.list_repositories()
-        packages = {}
-        bg_downloaders = {}
-        active = []
-        repos_to_download = []
+        repository_packages = {}
+        bg_downloader = BackgroundDownloader(self.settings, REPOSITORY_PROVIDERS)
         name_map = self.settings.get('package_name_map', {})
 
-        # Repositories are run in reverse order so that the ones first
-        # on the list will overwrite those last on the list
-        for repo in repositories[::-1]:
+        for repo in repositories:
             cache_key = repo + '.packages'
-            repository_packages = get_cache(cache_key)
-
-            if repository_packages != None:
-                packages.update(repository_packages)
+            cached_packages = get_cache(cache_key, fresh=self.refreshing)
 
+            if cached_packages != None:
+                repository_packages[repo] = cached_packages
             else:
-                domain = urlparse(repo).hostname
-                if domain not in bg_downloaders:
-                    bg_downloaders[domain] = BackgroundDownloader(
-                        self.settings, REPOSITORY_PROVIDERS)
-                bg_downloaders[domain].add_url(repo)
-                repos_to_download.append(repo)
-
-        for bg_downloader in list(bg_downloaders.values()):
-            bg_downloader.start()
-            active.append(bg_downloader)
-
-        # Wait for all of the downloaders to finish
-        while active:
-            bg_downloader = active.pop()
-            bg_downloader.join()
-
-        # Grabs the results and stuff it all in the cache
-        for repo in repos_to_download:
-            domain = urlparse(repo).hostname
-            bg_downloader = bg_downloaders[domain]
-            provider = bg_downloader.get_provider(repo)
+                bg_downloader.add_url(repo)
+
+        # Handle each repository as soon as it has been downloaded, while
+        # the others are still in progress
+        bg_downloader.start()
+        for repo, provider, exception in bg_downloader.results():
+            if self.settings.get('debug'):
+                console_write(u"Fetched %s in %.2f seconds" % (repo,
+                    bg_downloader.timings[repo]), True)
+
+            if not provider:
+                console_write(exception, True)
+                continue
 
             # Allow name mapping of packages for schema version < 2.0
-            repository_packages = {}
+            packages = {}
             for name, info in provider.get_packages():
                 name = name_map.get(name, name)
                 info['name'] = name
-                repository_packages[name] = info
+                packages[name] = info
 
             # Display errors we encountered while fetching package info
             for url, exception in provider.get_failed_sources():
@@ -273,8 +284,8 @@ class PackageManager():
                 console_write(exception, True)
 
             cache_key = repo + '.packages'
-            set_cache(cache_key, repository_packages, cache_ttl)
-            packages.update(repository_packages)
+            set_cache(cache_key, packages, cache_ttl)
+            repository_packages[repo] = packages
 
             renamed_packages = provider.get_renamed_packages()
             set_cache_under_settings(self, 'renamed_packages', repo, renamed_packages, cache_ttl)
@@ -282,8 +293,33 @@ class PackageManager():
             unavailable_packages = provider.get_unavailable_packages()
             set_cache_under_settings(self, 'unavailable_packages', repo, unavailable_packages, cache_ttl, list_=True)
 
+        # Repositories are merged in reverse order so that the ones first
+        # on the list will overwrite those last on the list
+        packages = {}
+        for repo in repositories[::-1]:
+            packages.update(repository_packages.get(repo, {}))
+
+        save_cache(self.metadata_path, self.settings_key)
+
         return packages
 
+    def refresh_in_background(self):
+        """
+        Downloads the channel and repository info again in a thread, replacing
+        the stale values that were loaded from disk
+        """
+
+        refresher = copy.copy(self)
+        refresher.settings = copy.deepcopy(self.initial_settings)
+        refresher.refreshing = True
+
+        def refresh():
+            if self.settings.get('debug'):
+                console_write(u'Refreshing channel and repository info saved by the last session', True)
+            refresher.list_available_packages()
+
+        threading.Thread(target=refresh).start()
+
     def list_packages(self, unpacked_only=False):
         """
         :param unpacked_only:
@@ -429,7 +465,55 @@ class PackageManager():
 
         return True
 
-    def install_package(self, package_name):
+    def download_package(self, package_name, packages, path):
+        """
+        Downloads the .sublime-package/.zip file of a package to disk
+
+        :param package_name:
+            The package to download
+
+        :param packages:
+            The dict of available packages, from list_available_packages()
+
+        :param path:
+            The filesystem path to save the file to
+
+        :return: bool if the package file was successfully downloaded
+        """
+
+        url = packages[package_name]['download']['url']
+
+        # Download the sublime-package or zip file straight to disk
+        try:
+            with downloader(url, self.settings) as manager:
+                package_hash = manager.fetch_to_file(url, path,
+                    'Error downloading package.')
+        except (DownloaderException) as e:
+            console_write(e, True)
+            show_error(u'Unable to download %s. Please view the console for more details.' % package_name)
+            return False
+
+        expected_hash = packages[package_name]['download'].get('sha256')
+        if expected_hash and expected_hash.lower() != package_hash:
+            show_error(u'The package file downloaded for %s does not match its SHA-256 hash. Please try installing the package again.' % package_name)
+            return False
+        if self.settings.get('debug'):
+            console_write(u'Downloaded %s, SHA-256 %s' % (url, package_hash), True)
+
+        return True
+
+    def is_vcs_package(self, package_name):
+        """
+        :return:
+            If the package is a git or hg checkout, which is upgraded by
+            pulling instead of downloading a package file
+        """
+
+        package_dir = self.get_package_dir(package_name)
+        return os.path.exists(os.path.join(package_dir, '.git')) or \
+            os.path.exists(os.path.join(package_dir, '.hg'))
+
+    def install_package(self, package_name, packages=None, package_file=None):
         """
         Downloads and installs (or upgrades) a package
 
@@ -448,10 +532,19 @@ class PackageManager():
         :param package_name:
             The package to download and install
 
+        :param packages:
+            The dict of available packages, to use instead of calling
+            list_available_packages() when installing many packages
+
+        :param package_file:
+            The path of the package file, if it was already downloaded with
+            download_package(). The file is moved.
+
         :return: bool if the package was successfully installed
         """
 
-        packages = self.list_available_packages()
+        if packages is None:
+            packages = self.list_available_packages()
 
         is_available = package_name in list(packages.keys())
         is_unavailable = package_name in self.settings.get('unavailable_packages', [])
@@ -464,7 +557,6 @@ class PackageManager():
             show_error(u'The package specified, %s, is not available' % package_name)
             return False
 
-        url = packages[package_name]['download']['url']
         package_filename = package_name + '.sublime-package'
 
         tmp_dir = tempfile.mkdtemp()
@@ -500,18 +592,11 @@ class PackageManager():
             old_version = self.get_metadata(package_name).get('version')
             is_upgrade = old_version != None
 
-            # Download the sublime-package or zip file
-            try:
-                with downloader(url, self.settings) as manager:
-                    package_bytes = manager.fetch(url, 'Error downloading package.')
-            except (DownloaderException) as e:
-                console_write(e, True)
-                show_error(u'Unable to download %s. Please view the console for more details.' % package_name)
+            if package_file:
+                shutil.move(package_file, tmp_package_path)
+            elif not self.download_package(package_name, packages, tmp_package_path):
                 return False
 
-            with open_compat(tmp_package_path, "wb") as package_file:
-                package_file.write(package_bytes)
-
             # Try to open it as a zip file
             try:
                 package_zip = zipfile.ZipFile(tmp_package_path, 'r')
@@ -519,10 +604,14 @@ class PackageManager():
                 show_error(u'An error occurred while trying to unzip the package file for %s. Please try installing the package again.' % package_name)
                 return False
 
-            # Scan through the root level of the zip file to gather some info
+            # Scan through the zip file entries once to gather some info, and
+            # keep the decoded names for extracting
             root_level_paths = []
             last_path = None
-            for path in package_zip.namelist():
+            zip_entries = []
+            zip_paths = set()
+            for info in package_zip.infolist():
+                path = info.filename
                 try:
                     if not isinstance(path, str_cls):
                         path = path.decode('utf-8', 'strict')
@@ -531,6 +620,8 @@ class PackageManager():
                     return False
 
                 last_path = path
+                zip_entries.append((info, path))
+                zip_paths.add(path)
 
                 if path.find('/') in [len(path) - 1, -1]:
                     root_level_paths.append(path)
@@ -561,11 +652,8 @@ class PackageManager():
                 unpack = False
 
             # If the package maintainer doesn't want a .sublime-package
-            try:
-                package_zip.getinfo(no_package_file_zip_path)
+            if no_package_file_zip_path in zip_paths:
                 unpack = True
-            except (KeyError):
-                pass
 
             # If we already have a package-metadata.json file in
             # Packages/{package_name}/, the only way to successfully upgrade
@@ -599,16 +687,9 @@ class PackageManager():
             # Here we don't use .extractall() since it was having issues on OS X
             overwrite_failed = False
             extracted_paths = []
-            for path in package_zip.namelist():
+            for info, path in zip_entries:
                 dest = path
 
-                try:
-                    if not isinstance(dest, str_cls):
-                        dest = dest.decode('utf-8', 'strict')
-                except (UnicodeDecodeError):
-                    console_write(u'One or more of the zip file entries in %s is not encoded using UTF-8, aborting' % package_name, True)
-                    return False
-
                 if os.name == 'nt':
                     regex = ':|\*|\?|"|<|>|\|'
                     if re.search(regex, dest) != None:
@@ -645,7 +726,14 @@ class PackageManager():
                     add_extracted_dirs(dest_dir)
                     extracted_paths.append(dest)
                     try:
-                        open_compat(dest, 'wb').write(package_zip.read(path))
+                        # Copy the entry a chunk at a time instead of reading
+                        # it into memory
+                        source = package_zip.open(info)
+                        try:
+                            with open_compat(dest, 'wb') as dest_file:
+                                shutil.copyfileobj(source, dest_file, 65536)
+                        finally:
+                            source.close()
                     except (IOError) as e:
                         message = unicode_from_os(e)
                         if re.search('[Ee]rrno 13', message):
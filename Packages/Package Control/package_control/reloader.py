@@ -1,4 +1,8 @@
 import sys
+import os
+import time
+import traceback
+import types
 
 import sublime
 
@@ -15,116 +19,206 @@ if sublime.version() == '' or int(sublime.version()) > 3000:
 # The only caveat to this is that you have to reload in the dependency order.
 #
 # Thus is module A depends on B and we don't reload B before A, when A is reloaded
-# it will still have a reference to the old B. Thus we hard-code the dependency
-# order of the various Package Control modules so they get reloaded properly.
+# it will still have a reference to the old B. The dependencies of each loaded
+# Package Control module are found by looking for modules, classes and functions
+# of other Package Control modules in its globals, and modules are reloaded after
+# the modules they depend on.
 #
-# There are solutions for doing this all programatically, but this is much easier
-# to understand.
-
-reload_mods = []
-for mod in sys.modules:
-    if mod[0:15].lower().replace(' ', '_') == 'package_control' and sys.modules[mod] != None:
-        reload_mods.append(mod)
+# Only the modules whose source changed since they were loaded are reloaded,
+# along with the modules that depend on them, since those hold references to
+# the old classes and functions.
 
 mod_prefix = 'package_control'
 if st_version == 3:
     mod_prefix = 'Package Control.' + mod_prefix
 
-mods_load_order = [
-    '',
-
-    '.sys_path',
-    '.cache',
-    '.http_cache',
-    '.ca_certs',
-    '.clear_directory',
-    '.cmd',
-    '.console_write',
-    '.preferences_filename',
-    '.show_error',
-    '.unicode',
-    '.thread_progress',
-    '.package_io',
-    '.semver',
-    '.versions',
-
-    '.http',
-    '.http.invalid_certificate_exception',
-    '.http.debuggable_http_response',
-    '.http.debuggable_https_response',
-    '.http.debuggable_http_connection',
-    '.http.persistent_handler',
-    '.http.debuggable_http_handler',
-    '.http.validating_https_connection',
-    '.http.validating_https_handler',
-
-    '.clients',
-    '.clients.client_exception',
-    '.clients.bitbucket_client',
-    '.clients.github_client',
-    '.clients.readme_client',
-    '.clients.json_api_client',
-
-    '.providers',
-    '.providers.provider_exception',
-    '.providers.bitbucket_repository_provider',
-    '.providers.channel_provider',
-    '.providers.github_repository_provider',
-    '.providers.github_user_provider',
-    '.providers.repository_provider',
-    '.providers.release_selector',
-
-    '.download_manager',
-
-    '.downloaders',
-    '.downloaders.downloader_exception',
-    '.downloaders.rate_limit_exception',
-    '.downloaders.binary_not_found_error',
-    '.downloaders.non_clean_exit_error',
-    '.downloaders.non_http_error',
-    '.downloaders.caching_downloader',
-    '.downloaders.decoding_downloader',
-    '.downloaders.limiting_downloader',
-    '.downloaders.cert_provider',
-    '.downloaders.urllib_downloader',
-    '.downloaders.cli_downloader',
-    '.downloaders.curl_downloader',
-    '.downloaders.wget_downloader',
-    '.downloaders.wininet_downloader',
-    '.downloaders.background_downloader',
-
-    '.upgraders',
-    '.upgraders.vcs_upgrader',
-    '.upgraders.git_upgrader',
-    '.upgraders.hg_upgrader',
-
-    '.package_manager',
-    '.package_creator',
-    '.package_installer',
-    '.package_renamer',
-
-    '.commands',
-    '.commands.add_channel_command',
-    '.commands.add_repository_command',
-    '.commands.create_binary_package_command',
-    '.commands.create_package_command',
-    '.commands.disable_package_command',
-    '.commands.discover_packages_command',
-    '.commands.enable_package_command',
-    '.commands.existing_packages_command',
-    '.commands.grab_certs_command',
-    '.commands.install_package_command',
-    '.commands.list_packages_command',
-    '.commands.package_message_command',
-    '.commands.remove_package_command',
-    '.commands.upgrade_all_packages_command',
-    '.commands.upgrade_package_command',
-
-    '.package_cleanup',
-    '.automatic_upgrader'
-]
-
-for suffix in mods_load_order:
-    mod = mod_prefix + suffix
-    if mod in reload_mods:
+# This module is reloaded before it runs on an upgrade, and reloading keeps
+# the globals of the previous version, so the load times survive.
+try:
+    _loaded_at
+except (NameError):
+    # Modules loaded before this one have sources older than this time
+    _loaded_at = time.time()
+    _load_mtimes = {}
+
+
+def source_file(module):
+    """
+    Finds the file the source of a module is in, which is the
+    .sublime-package file if the module was loaded from one
+
+    :param module:
+        The module object
+
+    :return:
+        The path, or None if the module has no source file or it was deleted
+    """
+
+    path = getattr(module, '__file__', None)
+    if not path:
+        return None
+    if path[-4:] in ('.pyc', '.pyo'):
+        path = path[:-1]
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+    # A folder means the module was deleted from an unpacked package
+    if os.path.isdir(path):
+        return None
+    return path
+
+
+def is_removed(module):
+    """
+    Checks if the source of a module was deleted, i.e. by an upgrade
+
+    :param module:
+        The module object
+
+    :return:
+        If the module had a source file that no longer exists
+    """
+
+    return bool(getattr(module, '__file__', None)) and source_file(module) is None
+
+
+def source_mtime(module):
+    """
+    Returns the modification time of the source of a module. If the module
+    was loaded from a .sublime-package file, the time of that file is used.
+
+    :param module:
+        The module object
+
+    :return:
+        The float modification time, or None if it can not be determined
+    """
+
+    path = source_file(module)
+    if path is None:
+        return None
+    return os.path.getmtime(path)
+
+
+def is_package_control_mod(name):
+    return name == mod_prefix or name.startswith(mod_prefix + '.')
+
+
+def dependencies(name, module):
+    """
+    Finds the Package Control modules a module uses
+
+    :param name:
+        The name of the module
+
+    :param module:
+        The module object
+
+    :return:
+        A set of module names
+    """
+
+    deps = set()
+    for value in list(vars(module).values()):
+        if isinstance(value, types.ModuleType):
+            dep = value.__name__
+        else:
+            dep = getattr(value, '__module__', None)
+            if not isinstance(dep, str):
+                continue
+        # Packages have their submodules set as attributes when they are
+        # imported, which doesn't make the package use them
+        if dep == name or dep.startswith(name + '.'):
+            continue
+        if is_package_control_mod(dep):
+            deps.add(dep)
+    return deps
+
+
+def reload_order(mods, graph):
+    """
+    Sorts modules so each comes after the modules it depends on. Import
+    cycles are broken by the order the modules are visited in.
+
+    :param mods:
+        A set of module names to sort
+
+    :param graph:
+        A dict of module name to the set of names it depends on
+
+    :return:
+        A list of module names
+    """
+
+    order = []
+    visited = set()
+
+    def visit(name):
+        if name in visited:
+            return
+        visited.add(name)
+        for dep in sorted(graph.get(name, ())):
+            if dep in mods:
+                visit(dep)
+        order.append(name)
+
+    for name in sorted(mods):
+        visit(name)
+    return order
+
+
+loaded_mods = {}
+for mod in list(sys.modules):
+    if is_package_control_mod(mod) and sys.modules[mod] != None and mod != __name__:
+        loaded_mods[mod] = sys.modules[mod]
+
+graph = {}
+dependents = {}
+for name, module in loaded_mods.items():
+    graph[name] = dependencies(name, module)
+    for dep in graph[name]:
+        dependents.setdefault(dep, set()).add(name)
+
+# Modules deleted by an upgrade can't be reloaded, so they are dropped and
+# the modules using them reloaded, which imports them again if still needed
+removed_mods = set()
+for name, module in loaded_mods.items():
+    if is_removed(module):
+        removed_mods.add(name)
+        del sys.modules[name]
+        _load_mtimes.pop(name, None)
+
+changed_mods = set(removed_mods)
+for name, module in loaded_mods.items():
+    if name in removed_mods:
+        continue
+    mtime = source_mtime(module)
+    if mtime is None or mtime > _load_mtimes.get(name, _loaded_at):
+        changed_mods.add(name)
+
+# Everything depending on a changed module has to be reloaded too
+reload_mods = set()
+pending = list(changed_mods)
+while pending:
+    name = pending.pop()
+    if name in reload_mods:
+        continue
+    reload_mods.add(name)
+    pending.extend(dependents.get(name, ()))
+
+for mod in reload_order(reload_mods - removed_mods, graph):
+    # One module failing to reload shouldn't stop the others
+    try:
         reload(sys.modules[mod])
+    except (Exception):
+        print(u'Package Control: Error reloading %s' % mod)
+        traceback.print_exc()
+
+for name, module in loaded_mods.items():
+    if name in removed_mods:
+        continue
+    mtime = source_mtime(sys.modules.get(name, module))
+    if mtime is not None:
+        _load_mtimes[name] = max(mtime, _load_mtimes.get(name, _loaded_at))